@@ -0,0 +1,116 @@
+"""Measure the import and startup time of the package and the CLI
+
+Usage:
+    python -m benchmarks.import_time --runs 5 --history benchmarks/import_time.jsonl
+
+Each scenario runs in a fresh interpreter, so no module is cached between runs. The
+median time of the runs is compared with the budget of the scenario and the script
+exits with status 1 if any budget is exceeded. With `--history`, the results are
+appended to a JSON lines file together with the package version, so the startup
+time can be tracked over releases. Use `python -X importtime` to find the module
+that exceeds a budget.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from insightvault import __version__
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CONFIG = """
+database:
+    path: "./data/db"
+splitter:
+    chunk_size: 1024
+    chunk_overlap: 256
+llm:
+    model: "llama3"
+embedding:
+    model: "all-MiniLM-L6-v2"
+"""
+
+# Code run by each scenario and its budget in seconds
+SCENARIOS: dict[str, tuple[str, float]] = {
+    "import insightvault": ("import insightvault", 0.2),
+    "insightvault --version": (
+        "from insightvault.app.cli import cli\n"
+        "cli(['--version'], standalone_mode=False)",
+        0.6,
+    ),
+    "manage list": (
+        "from insightvault.app.cli import cli\n"
+        "cli(['manage', 'list'], standalone_mode=False)",
+        2.5,
+    ),
+}
+
+# Modules that no scenario may import
+HEAVY_MODULES = ("torch", "sentence_transformers", "llama_index", "ollama", "fastapi")
+
+TIMER = """
+import sys, time
+start = time.perf_counter()
+exec(compile({code!r}, "<scenario>", "exec"))
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print("RESULT", elapsed, ",".join(heavy))
+"""
+
+
+def run_scenario(code: str, directory: str) -> tuple[float, list[str]]:
+    """Runs the code in a fresh interpreter and returns its seconds and heavy modules"""
+    result = subprocess.run(
+        [sys.executable, "-c", TIMER.format(code=code, heavy=HEAVY_MODULES)],
+        cwd=directory,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    _, elapsed, heavy = result.stdout.splitlines()[-1].split(" ")
+    return float(elapsed), [name for name in heavy.split(",") if name]
+
+
+def main(args: argparse.Namespace) -> int:
+    results: dict[str, float] = {}
+    over_budget = False
+    print(f"{'scenario':<26}{'median (s)':>12}{'budget (s)':>12}  heavy imports")
+    with tempfile.TemporaryDirectory() as directory:
+        (Path(directory) / "config.yaml").write_text(CONFIG)
+        for name, (code, budget) in SCENARIOS.items():
+            runs = [run_scenario(code, directory) for _ in range(args.runs)]
+            median = statistics.median(seconds for seconds, _ in runs)
+            heavy = sorted({module for _, modules in runs for module in modules})
+            results[name] = round(median, 4)
+            over_budget |= median > budget or bool(heavy)
+            flag = "" if median <= budget else "  over budget"
+            print(
+                f"{name:<26}{median:>12.3f}{budget:>12.1f}  "
+                f"{', '.join(heavy) or '-'}{flag}"
+            )
+
+    if args.history:
+        record = {
+            "version": __version__,
+            "date": datetime.date.today().isoformat(),
+            "python": sys.version.split()[0],
+            "results": results,
+        }
+        with open(args.history, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--history", help="JSON lines file the results are added to")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,182 @@
+"""Compare query latency and recall of the database backends
+
+Usage:
+    python -m benchmarks.vector_index --num-vectors 100000 --dim 384
+
+Random clustered unit vectors are added to a Chroma database and to the NumPy
+database in flat and IVF mode, and with int8 and binary quantization. Each backend
+is then queried with the same vectors. Recall@k is measured against exact
+brute-force search. The scanned size is the size of the matrix a NumPy query scans,
+the quantized codes or the float32 vectors.
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from insightvault.constants import DEFAULT_COLLECTION_NAME
+from insightvault.models.config import DatabaseConfig
+from insightvault.models.document import Document
+from insightvault.services.database import (
+    AbstractDatabaseService,
+    ChromaDatabaseService,
+)
+from insightvault.services.numpy_database import NumpyDatabaseService
+from insightvault.services.vector_index import VectorIndex, normalize
+
+ADD_BATCH_SIZE = 5000
+
+
+def make_vectors(
+    num_vectors: int, dim: int, num_clusters: int, seed: int = 0
+) -> npt.NDArray[np.float32]:
+    """Returns unit vectors grouped around random directions"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_clusters, dim))
+    labels = rng.integers(0, num_clusters, size=num_vectors)
+    return normalize(centers[labels] + 0.5 * rng.normal(size=(num_vectors, dim)))
+
+
+async def fill(
+    service: AbstractDatabaseService, vectors: npt.NDArray[np.float32]
+) -> float:
+    """Adds the vectors as documents and returns the seconds it took"""
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), ADD_BATCH_SIZE):
+        batch = vectors[offset : offset + ADD_BATCH_SIZE]
+        await service.add_documents(
+            [
+                Document(
+                    id=str(offset + i),
+                    title=str(offset + i),
+                    content=f"Document {offset + i}",
+                    metadata={"title": str(offset + i)},
+                    embedding=vector,
+                )
+                for i, vector in enumerate(batch)
+            ]
+        )
+    return time.perf_counter() - start
+
+
+async def measure(
+    query: Callable[[npt.NDArray[np.float32]], Coroutine[Any, Any, list[Document]]],
+    queries: npt.NDArray[np.float32],
+    truth: list[set[str]],
+) -> tuple[float, float, float]:
+    """Returns the mean and p95 latency in milliseconds and the mean recall"""
+    latencies = []
+    recalls = []
+    for vector, expected in zip(queries, truth, strict=True):
+        start = time.perf_counter()
+        results = await query(vector)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len({doc.id for doc in results} & expected) / len(expected))
+    return (
+        float(np.mean(latencies)),
+        float(np.percentile(latencies, 95)),
+        float(np.mean(recalls)),
+    )
+
+
+def scanned_megabytes(service: AbstractDatabaseService) -> str:
+    """Returns the size of the files a NumPy query scans, `-` for Chroma"""
+    if not isinstance(service, NumpyDatabaseService):
+        return "-"
+    files = service._collections[DEFAULT_COLLECTION_NAME].header["files"]
+    scanned = [files[key] for key in ("codes", "scales") if key in files] or [
+        files["vectors"]
+    ]
+    directory = service.path / DEFAULT_COLLECTION_NAME
+    size = sum((directory / name).stat().st_size for name in scanned)
+    return f"{size / 1e6:.1f}"
+
+
+async def main(args: argparse.Namespace) -> None:
+    vectors = make_vectors(args.num_vectors, args.dim, args.num_clusters)
+    rng = np.random.default_rng(1)
+    queries = normalize(
+        vectors[rng.choice(len(vectors), args.num_queries)]
+        + 0.1 * rng.normal(size=(args.num_queries, args.dim))
+    )
+    exact = VectorIndex(vectors)
+    truth = [
+        {str(row) for row in exact.search(query, k=args.k)[0].tolist()}
+        for query in queries
+    ]
+
+    print(
+        f"{'backend':<14}{'add (s)':>10}{'scanned (MB)':>14}{'mean (ms)':>12}"
+        f"{'p95 (ms)':>12}{'recall':>10}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        backends: dict[str, AbstractDatabaseService] = {}
+        if not args.skip_chroma:
+            backends["chroma"] = ChromaDatabaseService(
+                config=DatabaseConfig(
+                    path=f"{directory}/chroma",
+                    max_num_results=args.k,
+                    query_cache_size=0,
+                )
+            )
+        backends["numpy"] = NumpyDatabaseService(
+            config=DatabaseConfig(
+                backend="numpy", path=f"{directory}/numpy", max_num_results=args.k
+            )
+        )
+        backends["numpy-ivf"] = NumpyDatabaseService(
+            config=DatabaseConfig(
+                backend="numpy",
+                path=f"{directory}/numpy-ivf",
+                max_num_results=args.k,
+                index="ivf",
+                ivf_min_size=0,
+                ivf_num_probes=args.num_probes,
+            )
+        )
+        for quantization in ("int8", "binary"):
+            backends[f"numpy-{quantization}"] = NumpyDatabaseService(
+                config=DatabaseConfig(
+                    backend="numpy",
+                    path=f"{directory}/numpy-{quantization}",
+                    max_num_results=args.k,
+                    quantization=quantization,
+                    rerank_factor=args.rerank_factor,
+                )
+            )
+
+        for name, service in backends.items():
+            add_seconds = await fill(service, vectors)
+
+            async def query(
+                vector: npt.NDArray[np.float32],
+                service: AbstractDatabaseService = service,
+            ) -> list[Document]:
+                return await service.query(vector, filter_docs=False)
+
+            # The first query loads the collection and builds the IVF index
+            await query(queries[0])
+            mean, p95, recall = await measure(query, queries, truth)
+            print(
+                f"{name:<14}{add_seconds:>10.1f}{scanned_megabytes(service):>14}"
+                f"{mean:>12.2f}{p95:>12.2f}{recall:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--num-vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--num-clusters", type=int, default=100)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--num-probes", type=int, default=8)
+    parser.add_argument("--rerank-factor", type=int, default=10)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--skip-chroma", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -1,8 +1,24 @@
 __version__ = "0.0.3"
 
-from insightvault.app.rag import RAGApp
-from insightvault.app.search import SearchApp
-from insightvault.app.summarizer import SummarizerApp
-from insightvault.models.document import Document
+from typing import TYPE_CHECKING
+
+from insightvault.utils.lazy import lazy_attributes
+
+if TYPE_CHECKING:
+    from insightvault.app.rag import RAGApp
+    from insightvault.app.search import SearchApp
+    from insightvault.app.summarizer import SummarizerApp
+    from insightvault.models.document import Document
+
+# The apps are imported on first access, so `import insightvault` stays cheap
+__getattr__ = lazy_attributes(
+    __name__,
+    {
+        "Document": "insightvault.models.document",
+        "RAGApp": "insightvault.app.rag",
+        "SearchApp": "insightvault.app.search",
+        "SummarizerApp": "insightvault.app.summarizer",
+    },
+)
 
 __all__ = ["Document", "RAGApp", "SearchApp", "SummarizerApp"]
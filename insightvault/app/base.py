@@ -1,86 +1,576 @@
 import asyncio
+import contextlib
+import os
+import time
+from collections import Counter, deque
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    Sequence,
+)
+from pathlib import Path
 
 import yaml
 
+from ..constants import DEFAULT_COLLECTION_NAME
 from ..models.config import AppConfig
+from ..models.database import DocumentField
 from ..models.document import Document
-from ..services.database import ChromaDatabaseService
+from ..models.ingestion import IngestionProgress, ManifestEntry, SourceUpdate
+from ..services.database import AbstractDatabaseService, ChromaDatabaseService
 from ..services.embedding import EmbeddingService
+from ..services.keyword_index import KeywordIndexService, fts5_available
+from ..services.manifest import ManifestService
+from ..services.numpy_database import NumpyDatabaseService
 from ..services.splitter import SplitterService
+from ..utils.hashing import content_hash
 from ..utils.logging import get_logger
 
 
 class BaseApp:
+    """Base application
+
+    Services are created in the constructor and loaded once by `init()`. The
+    loaded services are shared across all subsequent queries and coroutines.
+
+    Documents are stored in named collections, `DEFAULT_COLLECTION_NAME` unless a
+    `collection_name` is given. Each collection can override the distance
+    function and thresholds in `config.database.collections`.
+
+    Attributes:
+        init_duration: Seconds spent loading the services, `None` before `init()`
+    """
+
     def __init__(
         self, name: str = "insightvault.app.base", config_path: str = "./config.yaml"
     ) -> None:
         self.name = name
         self.logger = get_logger(name)
         self.config = self._get_config(path=config_path)
-        self.db_service = ChromaDatabaseService(config=self.config.database)
+        self.db_service: AbstractDatabaseService = (
+            NumpyDatabaseService(config=self.config.database)
+            if self.config.database.backend == "numpy"
+            else ChromaDatabaseService(config=self.config.database)
+        )
         self.splitter_service = SplitterService(config=self.config.splitter)
         self.embedder_service = EmbeddingService(config=self.config.embedding)
+        self.manifest_service = ManifestService(config=self.config.database)
+        keyword_index = self.config.database.keyword_index
+        if keyword_index and not fts5_available():
+            self.logger.warning(
+                "SQLite was built without FTS5, the keyword index is disabled"
+            )
+            keyword_index = False
+        self.keyword_service: KeywordIndexService | None = (
+            KeywordIndexService(config=self.config.database) if keyword_index else None
+        )
+        self._keyword_checked: set[str] = set()
+        self.init_duration: float | None = None
+        self._initialized = False
+        self._init_lock = asyncio.Lock()
+        self._ingest_lock = asyncio.Lock()
+
+    @property
+    def is_initialized(self) -> bool:
+        """Whether the services have been loaded"""
+        return self._initialized
 
     async def init(self) -> None:
-        """Initialize the app"""
+        """Initialize the app
+
+        Safe to call repeatedly and from concurrent coroutines, the services are
+        only loaded on the first call.
+        """
+        if self._initialized:
+            return
+        async with self._init_lock:
+            if self._initialized:
+                return
+            start = time.perf_counter()
+            await self._init_services()
+            self.init_duration = time.perf_counter() - start
+            self._initialized = True
+        self.logger.debug(
+            f"App `{self.name}` initialized in {self.init_duration:.2f}s!"
+        )
+
+    async def _init_services(self) -> None:
+        """Load the services of the app. Subclasses extend this, not `init()`."""
         await self.embedder_service.init()
-        self.logger.debug(f"BaseApp `{self.name}` initialized!")
+        self.logger.debug(f"BaseApp `{self.name}` services loaded!")
 
-    def add_documents(self, documents: list[Document]) -> None:
-        """Add documents to the database"""
+    def add_documents(
+        self,
+        documents: Iterable[Document],
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> IngestionProgress:
+        """Add documents to a collection of the database"""
         self.logger.debug("Adding document(s)")
-        return asyncio.run(self.async_add_documents(documents))
+        return asyncio.run(self.async_add_documents(documents, collection_name))
 
-    async def async_add_documents(self, documents: list[Document]) -> None:
+    async def async_add_documents(
+        self,
+        documents: Iterable[Document],
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> IngestionProgress:
         """Async version of add_document"""
         self.logger.debug("Async adding document(s)")
 
+        async def stream() -> AsyncIterator[Document]:
+            for doc in documents:
+                yield doc
+
+        return await self._ingest(stream(), collection_name=collection_name)
+
+    def add_directory(
+        self,
+        directory: str | Path,
+        include: Sequence[str] = ("*",),
+        exclude: Sequence[str] = (),
+        on_progress: Callable[[IngestionProgress], None] | None = None,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> IngestionProgress:
+        """Add all text files below a directory to a collection of the database"""
+        self.logger.debug(f"Adding directory `{directory}`")
+        return asyncio.run(
+            self.async_add_directory(
+                directory,
+                include=include,
+                exclude=exclude,
+                on_progress=on_progress,
+                collection_name=collection_name,
+            )
+        )
+
+    async def async_add_directory(
+        self,
+        directory: str | Path,
+        include: Sequence[str] = ("*",),
+        exclude: Sequence[str] = (),
+        on_progress: Callable[[IngestionProgress], None] | None = None,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> IngestionProgress:
+        """Async version of add_directory
+
+        Files are matched against the `include` and `exclude` glob patterns relative
+        to `directory`. Directories whose files are all excluded, for example by
+        `node_modules/*`, are not walked. Files are read in a background task into
+        a queue of at most `config.ingestion.queue_size` documents, so memory use
+        does not depend on the size of the tree. Files that are not valid UTF-8
+        text are skipped.
+
+        Args:
+            directory: Root of the tree to ingest
+            include: Patterns of the files to add
+            exclude: Patterns of the files to skip
+            on_progress: Called with the current progress after each flush
+            collection_name: The collection to add the files to
+
+        Returns:
+            The final ingestion progress
+        """
+        self.logger.debug(f"Async adding directory `{directory}`")
+        await self.init()
+
+        root = Path(directory)
+        queue: asyncio.Queue[Document | None] = asyncio.Queue(
+            maxsize=self.config.ingestion.queue_size
+        )
+
+        async def produce() -> None:
+            documents = self._iter_documents(root, include, exclude)
+            try:
+                # Walking the tree and reading the files block, each step of the
+                # walk runs in a thread
+                while (
+                    doc := await asyncio.to_thread(next, documents, None)
+                ) is not None:
+                    await queue.put(doc)
+            except Exception:
+                await queue.put(None)
+                raise
+            await queue.put(None)
+
+        async def consume() -> AsyncIterator[Document]:
+            while (doc := await queue.get()) is not None:
+                yield doc
+
+        producer = asyncio.create_task(produce())
+        try:
+            progress = await self._ingest(
+                consume(), on_progress=on_progress, collection_name=collection_name
+            )
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await producer
+        return progress
+
+    async def _ingest(
+        self,
+        documents: AsyncIterable[Document],
+        on_progress: Callable[[IngestionProgress], None] | None = None,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> IngestionProgress:
+        """Split, embed and store a stream of documents in a collection
+
+        Chunks from consecutive documents are collected into batches of
+        `config.ingestion.batch_size`. Each batch is embedded with a single encoder
+        call and written to the database in one flush.
+
+        Documents with a `source` in their metadata are tracked in the manifest.
+        Unchanged sources are skipped, and only the new chunks of a changed source
+        are embedded. Chunks that disappeared from the source are deleted.
+
+        If `config.database.keyword_index` is set, the chunks are also added to the
+        keyword index, and deleted chunks are removed from it.
+
+        Ingestions run one at a time, so concurrent requests do not interleave
+        their manifest and database updates.
+        """
+        if not self.embedder_service:
+            raise RuntimeError("Embedding service is not loaded!")
+        await self.init()
+        async with self._ingest_lock:
+            await self._backfill_keyword_index(collection_name)
+
+            batch_size = self.config.ingestion.batch_size
+            progress = IngestionProgress()
+            start = time.perf_counter()
+            # Source updates wait for the flush that stores their last chunk, keyed
+            # by the number of chunks queued up to and including that chunk
+            updates: deque[tuple[int, SourceUpdate]] = deque()
+            num_queued = 0
+
+            async def apply_stored() -> None:
+                while updates and updates[0][0] <= progress.chunks:
+                    _, update = updates.popleft()
+                    await self._apply_source_update(update, collection_name)
+
+            async def flush(chunks: list[Document]) -> None:
+                await self._embed_and_store(chunks, collection_name)
+                progress.chunks += len(chunks)
+                progress.elapsed = time.perf_counter() - start
+                await apply_stored()
+                if on_progress:
+                    on_progress(progress)
+
+            pending: list[Document] = []
+            try:
+                async for doc in documents:
+                    changed = await self._split_changed(doc, collection_name)
+                    if changed is None:
+                        progress.skipped += 1
+                        continue
+                    chunks, update = changed
+                    pending.extend(chunks)
+                    num_queued += len(chunks)
+                    progress.documents += 1
+                    if update is not None:
+                        updates.append((num_queued, update))
+                        await apply_stored()
+
+                    while len(pending) >= batch_size:
+                        await flush(pending[:batch_size])
+                        pending = pending[batch_size:]
+
+                if pending:
+                    await flush(pending)
+            finally:
+                # Only the updates of stored sources were applied
+                await asyncio.to_thread(self.manifest_service.save)
+
+            progress.elapsed = time.perf_counter() - start
+            return progress
+
+    async def _split_changed(
+        self, document: Document, collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> tuple[list[Document], SourceUpdate | None] | None:
+        """Split a document and return the chunks that have to be embedded
+
+        Returns None if the document source is unchanged since the last ingestion.
+        Otherwise returns the chunks and, for documents with a source, the update
+        of the source to apply once the chunks are stored. Chunks stored with
+        another embedding model or splitter settings are all embedded again.
+        """
+        # Split document into chunks
+        source = document.metadata.get("source")
+        if source is None:
+            return self.splitter_service.split(document), None
+
+        settings = content_hash(
+            self.config.embedding.model,
+            str(self.config.splitter.chunk_size),
+            str(self.config.splitter.chunk_overlap),
+        )
+        fingerprint = content_hash(document.content, settings)
+        entry = self.manifest_service.get(str(source), collection_name)
+        if entry and entry.fingerprint == fingerprint:
+            self.logger.debug(f"Skipping unchanged source `{source}`")
+            return None
+
+        chunks = self.splitter_service.split(document)
+        chunk_ids = [chunk.id for chunk in chunks]
+        previous_ids = entry.chunk_ids if entry else []
+        # Vectors of other settings may come from another model, none are reused
+        reusable_ids = previous_ids if entry and entry.settings == settings else []
+        previous_rows = {chunk_id: row for row, chunk_id in enumerate(reusable_ids)}
+        update = SourceUpdate(
+            source=str(source),
+            entry=ManifestEntry(
+                fingerprint=fingerprint, settings=settings, chunk_ids=chunk_ids
+            ),
+            # Chunks that are embedded again are replaced, not deleted
+            stale_ids=sorted(set(previous_ids).difference(chunk_ids)),
+            moved={
+                chunk.id: dict(chunk.metadata)
+                for row, chunk in enumerate(chunks)
+                if chunk.id in previous_rows
+                and (
+                    previous_rows[chunk.id] != row
+                    or len(reusable_ids) != len(chunk_ids)
+                )
+            },
+        )
+        return [chunk for chunk in chunks if chunk.id not in previous_rows], update
+
+    async def _apply_source_update(
+        self, update: SourceUpdate, collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
+        """Delete the stale chunks of a stored source, update the position of its
+        moved chunks and record it in the manifest
+        """
+        if update.stale_ids:
+            self.logger.debug(
+                f"Deleting {len(update.stale_ids)} stale chunks of `{update.source}`"
+            )
+            await self.db_service.delete_documents(
+                update.stale_ids, collection_name=collection_name
+            )
+            if self.keyword_service:
+                await asyncio.to_thread(
+                    self.keyword_service.delete_documents,
+                    update.stale_ids,
+                    collection_name,
+                )
+        if update.moved:
+            self.logger.debug(f"Updating the position of {len(update.moved)} chunks")
+            await self.db_service.update_metadata(update.moved, collection_name)
+        self.manifest_service.set(update.source, update.entry, collection_name)
+
+    async def _backfill_keyword_index(
+        self, collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
+        """Index the stored documents if the keyword index of a collection is empty
+
+        Sources ingested before the keyword index was enabled are skipped as
+        unchanged, so their chunks are indexed from the database instead. Each
+        collection is checked once per app.
+        """
+        keyword_service = self.keyword_service
+        if keyword_service is None or collection_name in self._keyword_checked:
+            return
+        self._keyword_checked.add(collection_name)
+        if not await asyncio.to_thread(keyword_service.is_empty, collection_name):
+            return
+
+        batch_size = self.config.ingestion.batch_size
+        batch: list[Document] = []
+        num_indexed = 0
+        async for document in self.db_service.iter_documents(
+            collection_name, include=("documents",)
+        ):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                await asyncio.to_thread(
+                    keyword_service.add_documents, batch, collection_name
+                )
+                num_indexed += len(batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(
+                keyword_service.add_documents, batch, collection_name
+            )
+            num_indexed += len(batch)
+        if num_indexed:
+            self.logger.info(
+                f"Added {num_indexed} stored chunks of `{collection_name}` to the "
+                "keyword index"
+            )
+
+    async def _embed_and_store(
+        self, chunks: list[Document], collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
+        """Embed a batch of chunks and add them to a collection of the database"""
         if not self.embedder_service:
             raise RuntimeError("Embedding service is not loaded!")
 
-        processed_documents = []
-        for doc in documents:
-            # Split document into chunks
-            chunks: list[Document] = self.splitter_service.split(doc)
+        # Identical chunks share an id, only store them once per batch
+        chunks = list({chunk.id: chunk for chunk in chunks}.values())
 
-            # Get embeddings for the chunk contents
-            chunk_contents = [chunk.content for chunk in chunks]
-            embeddings = await self.embedder_service.embed(chunk_contents)
+        # Get embeddings for the chunk contents as a single float32 batch
+        chunk_contents = [chunk.content for chunk in chunks]
+        embeddings = await self.embedder_service.embed_array(chunk_contents)
 
-            # Add embeddings to chunks
-            for chunk, embedding in zip(chunks, embeddings, strict=True):
-                chunk.embedding = embedding
-                processed_documents.append(chunk)
+        # Add embeddings to chunks, each chunk holds a row view of the batch
+        for chunk, embedding in zip(chunks, embeddings, strict=True):
+            chunk.embedding = embedding
 
         # Add processed documents to db
-        return await self.db_service.add_documents(processed_documents)
+        await self.db_service.add_documents(chunks, collection_name=collection_name)
+        if self.keyword_service:
+            await asyncio.to_thread(
+                self.keyword_service.add_documents, chunks, collection_name
+            )
 
-    def delete_all_documents(self) -> None:
-        """Delete all documents from the database"""
+    def delete_all_documents(
+        self, collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
+        """Delete all documents from a collection of the database"""
         self.logger.debug("Deleting all documents ...")
-        return asyncio.run(self.async_delete_all_documents())
+        return asyncio.run(self.async_delete_all_documents(collection_name))
 
-    async def async_delete_all_documents(self) -> None:
+    async def async_delete_all_documents(
+        self, collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
         """Async version of delete_all_documents"""
         self.logger.debug("Async deleting all documents ...")
-        return await self.db_service.delete_all_documents()
+        async with self._ingest_lock:
+            await self.db_service.delete_all_documents(collection_name=collection_name)
+            await asyncio.to_thread(
+                self.manifest_service.delete_collection, collection_name
+            )
+            if self.keyword_service:
+                await asyncio.to_thread(
+                    self.keyword_service.delete_collection, collection_name
+                )
 
-    def list_documents(self) -> list[Document] | None:
-        """List all documents in the database"""
+    def list_documents(
+        self,
+        limit: int | None = None,
+        offset: int = 0,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> list[Document] | None:
+        """List the documents in a collection of the database, all by default"""
         self.logger.debug("Listing all documents ...")
-        return asyncio.run(self.async_list_documents())
+        return asyncio.run(
+            self.async_list_documents(
+                limit=limit, offset=offset, collection_name=collection_name
+            )
+        )
 
-    async def async_list_documents(self) -> list[Document] | None:
+    async def async_list_documents(
+        self,
+        limit: int | None = None,
+        offset: int = 0,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> list[Document] | None:
         """Async version of list_documents"""
         self.logger.debug("Async listing all documents ...")
-        return await self.db_service.get_documents()
+        return await self.db_service.get_documents(
+            collection_name=collection_name, limit=limit, offset=offset
+        )
+
+    async def aiter_documents(
+        self,
+        limit: int | None = None,
+        offset: int = 0,
+        include: Sequence[DocumentField] = ("documents", "metadatas"),
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> AsyncIterator[Document]:
+        """Lazily yield the documents in a collection, one page at a time
+
+        Leave `documents` out of `include` to skip loading the contents.
+        """
+        async for document in self.db_service.iter_documents(
+            collection_name=collection_name, limit=limit, offset=offset, include=include
+        ):
+            yield document
+
+    def count_documents_by_source(
+        self, collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> dict[str, int]:
+        """Count the chunks in a collection per document source"""
+        return asyncio.run(self.async_count_documents_by_source(collection_name))
+
+    async def async_count_documents_by_source(
+        self, collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> dict[str, int]:
+        """Async version of count_documents_by_source
+
+        Only the metadatas are loaded, one page at a time.
+        """
+        counts: Counter[str] = Counter()
+        async for document in self.aiter_documents(
+            include=("metadatas",), collection_name=collection_name
+        ):
+            counts[str(document.metadata.get("source", document.title))] += 1
+        return dict(counts)
+
+    def _iter_documents(
+        self, root: Path, include: Sequence[str], exclude: Sequence[str]
+    ) -> Iterator[Document]:
+        """Lazily reads the text files below root that match the glob patterns"""
+        for path in self._iter_files(root, include, exclude):
+            doc = self._read_file(path)
+            if doc is not None:
+                yield doc
+
+    def _iter_files(
+        self, root: Path, include: Sequence[str], exclude: Sequence[str]
+    ) -> Iterator[Path]:
+        """Lazily yields the files below root that match the glob patterns
+
+        Directories whose files are all matched by an exclude pattern are not
+        walked.
+        """
+        for dirpath, dirnames, filenames in os.walk(root):
+            relative_dir = Path(dirpath).relative_to(root)
+            dirnames[:] = sorted(
+                name
+                for name in dirnames
+                if not any(
+                    (relative_dir / name / "*").match(pattern) for pattern in exclude
+                )
+            )
+            for filename in sorted(filenames):
+                relative = relative_dir / filename
+                if not any(relative.match(pattern) for pattern in include):
+                    continue
+                if any(relative.match(pattern) for pattern in exclude):
+                    continue
+                yield Path(dirpath) / filename
+
+    def _read_file(self, path: Path) -> Document | None:
+        """Reads a text file into a document, returns None if it is not text"""
+        try:
+            content = path.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError) as e:
+            self.logger.warning(f"Skipping file `{path}`: {e}")
+            return None
+
+        return Document(
+            title=path.name,
+            content=content,
+            metadata={"title": path.name, "source": str(path)},
+        )
 
     def _get_config(self, path: str = "./config.yaml") -> AppConfig:
         """Reads the configuration file from the path"""
-        with open(path) as file:
-            config_data = yaml.safe_load(file)
-        try:
-            return AppConfig(**config_data)
-        except Exception as e:
-            print(f"Config validation error: {e}")
-            raise
+        return read_config(path)
+
+
+def read_config(path: str = "./config.yaml") -> AppConfig:
+    """Reads the configuration file from the path"""
+    with open(path) as file:
+        config_data = yaml.safe_load(file)
+    try:
+        return AppConfig(**config_data)
+    except Exception as e:
+        print(f"Config validation error: {e}")
+        raise
@@ -1,16 +1,141 @@
 import asyncio
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 import click
 
 from insightvault import __version__
 
+from ..constants import DEFAULT_COLLECTION_NAME
+from ..models.database import QueryFilter, validate_collection_name
 from ..models.document import Document
-from .base import BaseApp
+from ..models.ingestion import IngestionProgress
+from ..models.server import (
+    AddDirectoryRequest,
+    AddDocumentsRequest,
+    ChatRequest,
+    DocumentInfo,
+    DocumentInput,
+    ListDocumentsResponse,
+    SearchRequest,
+    SearchResponse,
+    SourcesResponse,
+    SummarizeRequest,
+)
+from ..utils.lazy import LazyImport
+from .base import BaseApp, read_config
 from .rag import RAGApp
 from .search import SearchApp
 from .summarizer import SummarizerApp
 
+CHAT_EXIT_COMMANDS = ("/exit", "/quit")
+CHAT_CLEAR_COMMAND = "/clear"
+NO_RESPONSE_MESSAGE = "No response from the LLM."
+
+# The server and its dependencies are only imported by `serve`
+if TYPE_CHECKING:
+    import uvicorn
+
+    from .server import create_app
+else:
+    uvicorn = LazyImport("uvicorn")
+    create_app = LazyImport("insightvault.app.server", "create_app")
+
+# The daemon relies on fcntl, which Windows lacks, so it is only imported once a
+# command uses the daemon
+if TYPE_CHECKING:
+    from . import daemon as daemon_module
+    from .daemon import DaemonClient
+else:
+    daemon_module = LazyImport("insightvault.app.daemon")
+
+
+def filter_options(command: Callable[..., Any]) -> Callable[..., Any]:
+    """Adds the options that restrict a query to matching documents"""
+    options = [
+        click.option("--source", help="Only use documents from this source."),
+        click.option("--title", help="Only use documents with this title."),
+        click.option("--type", "doc_type", help="Only use documents of this type."),
+        click.option("--contains", help="Only use documents containing this text."),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def _check_collection_names(
+    ctx: click.Context, param: click.Parameter, value: str | tuple[str, ...]
+) -> str | tuple[str, ...]:
+    """Rejects collection names that break the naming rules"""
+    for name in (value,) if isinstance(value, str) else value:
+        try:
+            validate_collection_name(name)
+        except ValueError as e:
+            raise click.BadParameter(str(e), ctx=ctx, param=param) from e
+    return value
+
+
+collection_option = click.option(
+    "--collection",
+    "-c",
+    "collection_name",
+    default=DEFAULT_COLLECTION_NAME,
+    show_default=True,
+    callback=_check_collection_names,
+    help="Collection of the documents.",
+)
+
+collections_option = click.option(
+    "--collection",
+    "-c",
+    "collection_names",
+    multiple=True,
+    default=(DEFAULT_COLLECTION_NAME,),
+    show_default=True,
+    callback=_check_collection_names,
+    help="Collection to search. Can be repeated to search several collections.",
+)
+
+
+config_option = click.option(
+    "--config",
+    "config_path",
+    default="./config.yaml",
+    show_default=True,
+    help="Path of the configuration file",
+)
+
+
+def _query_filter(
+    source: str | None,
+    title: str | None,
+    doc_type: str | None,
+    contains: str | None,
+) -> QueryFilter | None:
+    """Returns the query filter of the filter options, None if none is set"""
+    if source is None and title is None and doc_type is None and contains is None:
+        return None
+    return QueryFilter(source=source, title=title, type=doc_type, contains=contains)
+
+
+def _daemon(config_path: str = "./config.yaml") -> "DaemonClient | None":
+    """Returns a client of the daemon if `daemon.enabled`, starting the daemon
+
+    Returns None if the daemon is disabled, so the command runs in process.
+    """
+    if not Path(config_path).exists():
+        return None
+    config = read_config(config_path).daemon
+    if not config.enabled:
+        return None
+    client = daemon_module.DaemonClient(config, config_path=config_path)
+    try:
+        client.ensure_running()
+    except daemon_module.DaemonError as e:
+        raise click.ClickException(str(e)) from e
+    return client
+
 
 @click.group()
 @click.version_option(__version__)
@@ -27,68 +152,194 @@ def manage() -> None:
 
 @manage.command(name="add-file")
 @click.argument("filepath", type=click.Path(exists=True))
-def manage_add_file(filepath: str) -> None:
+@collection_option
+def manage_add_file(filepath: str, collection_name: str) -> None:
     """Add a document from a file to the specified database"""
-    app = BaseApp(name="insightvault.base")
-    asyncio.run(app.init())
-
     path = Path(filepath)
     with open(path, encoding="utf-8") as f:
         content = f.read()
+    metadata = {"title": path.name, "source": str(path)}
+
+    client = _daemon()
+    if client is not None:
+        _add_with_daemon(
+            client,
+            DocumentInput(title=path.name, content=content, metadata=metadata),
+            collection_name,
+        )
+        return
 
-    doc = Document(
-        title=path.name,
-        content=content,
-        metadata={"title": path.name, "source": str(path)},
-    )
+    app = BaseApp(name="insightvault.base")
+    asyncio.run(app.init())
+    doc = Document(title=path.name, content=content, metadata=metadata)
+    app.add_documents([doc], collection_name=collection_name)
+
+
+@manage.command(name="add-dir")
+@click.argument(
+    "directory", type=click.Path(exists=True, file_okay=False, dir_okay=True)
+)
+@click.option(
+    "--include",
+    "-i",
+    multiple=True,
+    default=("*",),
+    show_default=True,
+    help="Glob pattern of files to add. Can be repeated.",
+)
+@click.option(
+    "--exclude",
+    "-e",
+    multiple=True,
+    help="Glob pattern of files to skip. Can be repeated.",
+)
+@collection_option
+def manage_add_directory(
+    directory: str,
+    include: tuple[str, ...],
+    exclude: tuple[str, ...],
+    collection_name: str,
+) -> None:
+    """Add all text files in a directory tree to the specified database"""
+    client = _daemon()
+    if client is not None:
+        request = AddDirectoryRequest(
+            path=str(Path(directory).resolve()),
+            include=list(include),
+            exclude=list(exclude),
+            collection=collection_name,
+        )
+        _echo_added(
+            IngestionProgress(
+                **client.request("POST", "/directories", request.model_dump())
+            )
+        )
+        return
 
-    app.add_documents([doc])
+    app = BaseApp(name="insightvault.base")
+
+    def echo_progress(progress: IngestionProgress) -> None:
+        click.echo(
+            f"{progress.documents} files, {progress.chunks} chunks "
+            f"({progress.documents_per_second:.1f} files/s, "
+            f"{progress.chunks_per_second:.1f} chunks/s)"
+        )
+
+    progress = app.add_directory(
+        directory,
+        include=include,
+        exclude=exclude,
+        on_progress=echo_progress,
+        collection_name=collection_name,
+    )
+    _echo_added(progress)
 
 
 @manage.command(name="add-text")
 @click.argument("text")
-def manage_add_text(text: str) -> None:
+@collection_option
+def manage_add_text(text: str, collection_name: str) -> None:
     """Add text to the specified database"""
+    metadata = {"title": "Direct Input", "type": "direct_input"}
+    client = _daemon()
+    if client is not None:
+        _add_with_daemon(
+            client,
+            DocumentInput(title="Direct Input", content=text, metadata=metadata),
+            collection_name,
+        )
+        return
+
     app = BaseApp(name="insightvault.base")
     asyncio.run(app.init())
-    doc = Document(
-        title="Direct Input",
-        content=text,
-        metadata={"title": "Direct Input", "type": "direct_input"},
-    )
-    app.add_documents([doc])
+    doc = Document(title="Direct Input", content=text, metadata=metadata)
+    app.add_documents([doc], collection_name=collection_name)
 
 
 @manage.command(name="list")
-def manage_list_documents() -> None:
-    """List all documents in the specified database"""
+@click.option("--limit", type=int, help="Maximum number of chunks to list.")
+@click.option(
+    "--offset", type=int, default=0, show_default=True, help="Chunks to skip."
+)
+@click.option(
+    "--group-by-source",
+    is_flag=True,
+    help="Print the number of chunks per source instead of the chunks.",
+)
+@collection_option
+def manage_list_documents(
+    limit: int | None, offset: int, group_by_source: bool, collection_name: str
+) -> None:
+    """List the documents in the specified database"""
+    client = _daemon()
+    if client is not None:
+        query = {"collection": collection_name}
+        if group_by_source:
+            response = client.request("GET", "/sources", query=query)
+            _echo_counts(SourcesResponse(**response).sources)
+            return
+        response = client.request(
+            "GET", "/documents", query={**query, "limit": limit, "offset": offset}
+        )
+        listing = ListDocumentsResponse(**response).documents
+        asyncio.run(_echo_documents(_aiter(listing), offset=offset))
+        return
+
     app = BaseApp(name="insightvault.base")
-    documents: list[Document] | None = app.list_documents()
 
-    if not documents:
-        click.echo("No documents found in database.")
+    if group_by_source:
+        _echo_counts(app.count_documents_by_source(collection_name=collection_name))
         return
 
-    click.echo("\nDocuments in database:")
-    for i, doc in enumerate(documents, 1):
-        click.echo(f"{i}. {doc.metadata.get('title', 'Untitled')} (ID: {doc.id})")
+    documents = app.aiter_documents(
+        limit=limit,
+        offset=offset,
+        include=("metadatas",),
+        collection_name=collection_name,
+    )
+    asyncio.run(_echo_documents(documents, offset=offset))
 
 
 @manage.command(name="delete-all")
-def manage_delete_all() -> None:
+@collection_option
+def manage_delete_all(collection_name: str) -> None:
     """Delete all documents from the specified database"""
-    app = BaseApp(name="insightvault.base")
-    app.delete_all_documents()
+    client = _daemon()
+    if client is not None:
+        client.request("DELETE", "/documents", query={"collection": collection_name})
+    else:
+        app = BaseApp(name="insightvault.base")
+        app.delete_all_documents(collection_name=collection_name)
     click.echo("All documents deleted from the database!")
 
 
 @cli.command(name="search")
 @click.argument("query_text")
-def search_documents(query_text: str) -> None:
+@filter_options
+@collections_option
+def search_documents(
+    query_text: str,
+    source: str | None,
+    title: str | None,
+    doc_type: str | None,
+    contains: str | None,
+    collection_names: tuple[str, ...],
+) -> None:
     """Search documents in the database"""
-    app = SearchApp(name="insightvault.search")
-    asyncio.run(app.init())
-    results: list[str] = app.query(query_text)
+    query_filter = _query_filter(source, title, doc_type, contains)
+    client = _daemon()
+    if client is not None:
+        request = SearchRequest(
+            query=query_text, filter=query_filter, collections=list(collection_names)
+        )
+        response = client.request("POST", "/search", request.model_dump())
+        results = SearchResponse(**response).results
+    else:
+        app = SearchApp(name="insightvault.search")
+        asyncio.run(app.init())
+        results = app.query(
+            query_text, query_filter=query_filter, collection_names=collection_names
+        )
 
     if not results:
         click.echo("No results found.")
@@ -100,20 +351,57 @@ def search_documents(query_text: str) -> None:
 
 
 @cli.command(name="chat")
-@click.argument("query_text")
-def chat_search_documents(query_text: str) -> None:
-    """Search documents in the database and return a chat response"""
-    app = RAGApp(name="insightvault.rag")
-    asyncio.run(app.init())
-
-    results: list[str] = app.query(query_text)
-
-    if not results:
-        click.echo("No results found.")
+@click.argument("query_text", required=False)
+@click.option(
+    "--interactive",
+    "-i",
+    is_flag=True,
+    help="Keep asking questions in a session that remembers the chat history.",
+)
+@filter_options
+@collections_option
+def chat_search_documents(
+    query_text: str | None,
+    interactive: bool,
+    source: str | None,
+    title: str | None,
+    doc_type: str | None,
+    contains: str | None,
+    collection_names: tuple[str, ...],
+) -> None:
+    """Search documents in the database and return a chat response
+
+    With --interactive, questions are read until `/exit`. The models stay loaded
+    between questions and the chat history is sent along with each question.
+    """
+    query_filter = _query_filter(source, title, doc_type, contains)
+    if interactive:
+        app = RAGApp(name="insightvault.rag")
+        asyncio.run(_chat_session(app, query_text, query_filter, collection_names))
+        return
+    if query_text is None:
+        raise click.UsageError("Missing argument 'QUERY_TEXT'.")
+
+    client = _daemon()
+    if client is not None:
+        request = ChatRequest(
+            query=query_text, filter=query_filter, collections=list(collection_names)
+        )
+        click.echo("\nChat response:")
+        _echo_tokens(client.stream("/chat/stream", request.model_dump()))
         return
 
+    app = RAGApp(name="insightvault.rag")
     click.echo("\nChat response:")
-    click.echo(results[0])
+    asyncio.run(
+        _echo_stream(
+            app.astream_query(
+                query_text,
+                query_filter=query_filter,
+                collection_names=collection_names,
+            )
+        )
+    )
 
 
 @cli.command(name="summarize")
@@ -125,8 +413,6 @@ def summarize(input_text: str, file: bool = False) -> None:
     If --file flag is used, input_text is treated as a file path.
     Otherwise, input_text is treated as the text to summarize.
     """
-    app = SummarizerApp(name="insightvault.summarizer")
-    asyncio.run(app.init())
     if file:
         try:
             path = Path(input_text)
@@ -141,9 +427,213 @@ def summarize(input_text: str, file: bool = False) -> None:
     else:
         content = input_text
 
-    summary = app.summarize(content)
+    client = _daemon()
+    if client is not None:
+        request = SummarizeRequest(text=content)
+        click.echo("\nSummary:")
+        _echo_tokens(client.stream("/summarize/stream", request.model_dump()))
+        return
+
+    app = SummarizerApp(name="insightvault.summarizer")
     click.echo("\nSummary:")
-    click.echo(summary)
+    asyncio.run(_echo_stream(app.astream_summarize(content)))
+
+
+@cli.command(name="serve")
+@click.option("--host", help="Host to bind to. Defaults to `server.host`.")
+@click.option("--port", type=int, help="Port to bind to. Defaults to `server.port`.")
+@config_option
+def serve(host: str | None, port: int | None, config_path: str) -> None:
+    """Serve search, chat, summarize and ingestion over HTTP"""
+    app = create_app(config_path=config_path)
+    server_config = app.state.config.server
+    uvicorn.run(app, host=host or server_config.host, port=port or server_config.port)
+
+
+@cli.group()
+def daemon() -> None:
+    """Manage the background process that keeps the models loaded"""
+    pass
+
+
+@daemon.command(name="run")
+@config_option
+def daemon_run(config_path: str) -> None:
+    """Run the daemon in the foreground"""
+    try:
+        daemon_module.run_daemon(config_path=config_path)
+    except daemon_module.DaemonError as e:
+        raise click.ClickException(str(e)) from e
+
+
+@daemon.command(name="start")
+@config_option
+def daemon_start(config_path: str) -> None:
+    """Start the daemon in the background"""
+    client = daemon_module.DaemonClient(
+        read_config(config_path).daemon, config_path=config_path
+    )
+    if client.is_running():
+        click.echo(f"The daemon is already running on {client.socket_path}")
+        return
+    try:
+        client.start()
+    except daemon_module.DaemonError as e:
+        raise click.ClickException(str(e)) from e
+    click.echo(f"The daemon is running on {client.socket_path}")
+
+
+@daemon.command(name="stop")
+@config_option
+def daemon_stop(config_path: str) -> None:
+    """Stop the daemon"""
+    client = daemon_module.DaemonClient(
+        read_config(config_path).daemon, config_path=config_path
+    )
+    if client.stop():
+        click.echo("The daemon was stopped.")
+    else:
+        click.echo("The daemon is not running.")
+
+
+@daemon.command(name="status")
+@config_option
+def daemon_status(config_path: str) -> None:
+    """Print whether the daemon is running"""
+    client = daemon_module.DaemonClient(
+        read_config(config_path).daemon, config_path=config_path
+    )
+    pid = client.pid()
+    if pid is None:
+        click.echo("The daemon is not running.")
+    else:
+        click.echo(f"The daemon is running on {client.socket_path} (PID: {pid})")
+
+
+def _add_with_daemon(
+    client: "DaemonClient", document: DocumentInput, collection_name: str
+) -> None:
+    """Add the document through the daemon"""
+    request = AddDocumentsRequest(documents=[document], collection=collection_name)
+    client.request("POST", "/documents", request.model_dump())
+
+
+def _echo_added(progress: IngestionProgress) -> None:
+    """Print the result of an ingestion"""
+    click.echo(
+        f"Added {progress.documents} files ({progress.chunks} chunks) "
+        f"in {progress.elapsed:.1f}s"
+    )
+
+
+def _echo_counts(counts: dict[str, int]) -> None:
+    """Print the number of chunks per source"""
+    if not counts:
+        click.echo("No documents found in database.")
+        return
+    click.echo("\nChunks per source:")
+    for source, count in sorted(counts.items()):
+        click.echo(f"{source}: {count}")
+
+
+async def _aiter(documents: Iterable[DocumentInfo]) -> AsyncIterator[DocumentInfo]:
+    """Yields the documents of a listing"""
+    for document in documents:
+        yield document
+
+
+async def _echo_documents(
+    documents: AsyncIterable[Document | DocumentInfo], offset: int
+) -> None:
+    """Print the documents page by page, without loading their contents"""
+    number = offset
+    async for doc in documents:
+        if number == offset:
+            click.echo("\nDocuments in database:")
+        number += 1
+        click.echo(f"{number}. {doc.metadata.get('title', 'Untitled')} (ID: {doc.id})")
+
+    if number == offset:
+        click.echo("No documents found in database.")
+
+
+async def _echo_stream(tokens: AsyncIterator[str]) -> None:
+    """Print the tokens of a response as they arrive
+
+    A notice is printed instead if the response is empty.
+    """
+    received = False
+    async for token in tokens:
+        received = received or bool(token)
+        click.echo(token, nl=False)
+    if received:
+        click.echo()
+    else:
+        click.echo(NO_RESPONSE_MESSAGE)
+
+
+async def _chat_session(
+    app: RAGApp,
+    query_text: str | None,
+    query_filter: QueryFilter | None,
+    collection_names: tuple[str, ...],
+) -> None:
+    """Answer questions with the app until `/exit` or the end of the input
+
+    `query_text` is the first question, if given. `/clear` forgets the history.
+    """
+    click.echo(
+        f"Chat session, type `{CHAT_CLEAR_COMMAND}` to forget the history and "
+        f"`{CHAT_EXIT_COMMANDS[0]}` to quit."
+    )
+    question = query_text
+    while True:
+        if question is None:
+            question = _read_question()
+            if question is None:
+                return
+        question = question.strip()
+        if question in CHAT_EXIT_COMMANDS:
+            return
+        if question == CHAT_CLEAR_COMMAND:
+            await app.async_clear()
+            click.echo("The chat history was cleared.")
+        elif question:
+            click.echo("\nChat response:")
+            await _echo_stream(
+                app.astream_chat(
+                    question,
+                    query_filter=query_filter,
+                    collection_names=collection_names,
+                )
+            )
+        question = None
+
+
+def _read_question() -> str | None:
+    """Prompt for the next question, None at the end of the input"""
+    try:
+        question: str = click.prompt(
+            "\nYou", default="", show_default=False, prompt_suffix="> "
+        )
+    except click.Abort:
+        return None
+    return question
+
+
+def _echo_tokens(tokens: Iterable[str]) -> None:
+    """Print the tokens of a response from the daemon as they arrive
+
+    A notice is printed instead if the response is empty.
+    """
+    received = False
+    for token in tokens:
+        received = received or bool(token)
+        click.echo(token, nl=False)
+    if received:
+        click.echo()
+    else:
+        click.echo(NO_RESPONSE_MESSAGE)
 
 
 def main() -> None:
@@ -0,0 +1,278 @@
+import codecs
+import contextlib
+import fcntl
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from types import FrameType
+from typing import IO, TYPE_CHECKING, Any
+from urllib.parse import urlencode
+
+from ..models.config import DaemonConfig
+from ..utils.lazy import LazyImport
+from ..utils.logging import get_logger
+
+if TYPE_CHECKING:
+    import uvicorn
+
+    from .server import create_app
+else:
+    uvicorn = LazyImport("uvicorn")
+    create_app = LazyImport("insightvault.app.server", "create_app")
+
+HEALTH_TIMEOUT = 1.0
+START_POLL_INTERVAL = 0.1
+STREAM_CHUNK_SIZE = 1024
+
+
+class DaemonError(RuntimeError):
+    """Raised when the daemon cannot be started or a request to it fails"""
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix domain socket"""
+
+    def __init__(self, socket_path: str, timeout: float | None = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DaemonClient:
+    """Thin client of the background daemon
+
+    The daemon is the HTTP server of `insightvault serve`, listening on a Unix
+    domain socket instead of a TCP port. It keeps the database client, the embedding
+    model and the LLM client loaded, so CLI commands sent to it skip the startup.
+
+    A daemon holds an exclusive lock on `<socket_path>.lock` from before it loads
+    the models until it exits, so a daemon that is still starting is not started
+    a second time.
+
+    Attributes:
+        config: The daemon configuration
+        config_path: The configuration file the daemon is started with
+        socket_path: The absolute path of the socket
+        lock_path: The absolute path of the lock file
+    """
+
+    def __init__(self, config: DaemonConfig, config_path: str = "./config.yaml"):
+        self.logger = get_logger("insightvault.app.daemon")
+        self.config = config
+        self.config_path = str(Path(config_path).resolve())
+        self.socket_path = str(Path(config.socket_path).resolve())
+        self.lock_path = f"{self.socket_path}.lock"
+
+    def is_running(self) -> bool:
+        """Whether a daemon answers on the socket"""
+        return self.pid() is not None
+
+    def pid(self) -> int | None:
+        """Returns the process id of the running daemon, None if none is running"""
+        try:
+            health = self.request("GET", "/health", timeout=HEALTH_TIMEOUT)
+        except (OSError, DaemonError):
+            return None
+        pid = health.get("pid")
+        return pid if isinstance(pid, int) else None
+
+    def is_starting(self) -> bool:
+        """Whether a daemon holds the lock but does not answer yet"""
+        if not Path(self.lock_path).exists():
+            return False
+        with open(self.lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return not self.is_running()
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return False
+
+    def ensure_running(self) -> None:
+        """Start the daemon unless it is running, and wait until it answers"""
+        if self.is_running():
+            return
+        if self.is_starting():
+            self._wait(process=None)
+        else:
+            self.start()
+
+    def start(self) -> None:
+        """Start the daemon in a new session and wait until it answers
+
+        The output of the daemon is appended to `config.log_path`.
+
+        Raises:
+            DaemonError: If the daemon exits or does not answer within
+                `config.start_timeout` seconds
+        """
+        log_path = Path(self.config.log_path)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, "ab") as log:
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "insightvault.app.cli",
+                    "daemon",
+                    "run",
+                    "--config",
+                    self.config_path,
+                ],
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+        self.logger.debug(f"Started daemon process {process.pid}")
+        self._wait(process)
+
+    def _wait(self, process: subprocess.Popen[bytes] | None) -> None:
+        """Wait until the daemon answers, or the process started for it exits"""
+        deadline = time.monotonic() + self.config.start_timeout
+        while time.monotonic() < deadline:
+            if self.is_running():
+                return
+            if process is not None and process.poll() is not None:
+                raise DaemonError(f"The daemon exited, see `{self.config.log_path}`")
+            time.sleep(START_POLL_INTERVAL)
+        raise DaemonError(
+            f"The daemon did not start within {self.config.start_timeout}s, "
+            f"see `{self.config.log_path}`"
+        )
+
+    def stop(self) -> bool:
+        """Stop the running daemon. Returns False if none is running."""
+        pid = self.pid()
+        if pid is None:
+            return False
+        os.kill(pid, signal.SIGTERM)
+        return True
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Mapping[str, Any] | None = None,
+        query: Mapping[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> Any:
+        """Send a request to the daemon and return the decoded JSON response
+
+        Query parameters that are None are left out.
+        """
+        connection = self._send(method, path, body, query, timeout)
+        try:
+            response = connection.getresponse()
+            data = response.read()
+            self._check(response, data)
+            return json.loads(data) if data else None
+        finally:
+            connection.close()
+
+    def stream(self, path: str, body: Mapping[str, Any]) -> Iterator[str]:
+        """Send a request to the daemon and yield the text response as it arrives"""
+        connection = self._send("POST", path, body, None, None)
+        try:
+            response = connection.getresponse()
+            if response.status >= http.HTTPStatus.BAD_REQUEST:
+                self._check(response, response.read())
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            while chunk := response.read1(STREAM_CHUNK_SIZE):
+                if text := decoder.decode(chunk):
+                    yield text
+            if text := decoder.decode(b"", final=True):
+                yield text
+        finally:
+            connection.close()
+
+    def _send(
+        self,
+        method: str,
+        path: str,
+        body: Mapping[str, Any] | None,
+        query: Mapping[str, Any] | None,
+        timeout: float | None,
+    ) -> UnixHTTPConnection:
+        """Open a connection to the daemon and send the request on it"""
+        if query:
+            params = {key: value for key, value in query.items() if value is not None}
+            path = f"{path}?{urlencode(params)}"
+        connection = UnixHTTPConnection(self.socket_path, timeout=timeout)
+        payload = None if body is None else json.dumps(body).encode()
+        headers = {} if payload is None else {"Content-Type": "application/json"}
+        connection.request(method, path, body=payload, headers=headers)
+        return connection
+
+    def _check(self, response: http.client.HTTPResponse, data: bytes) -> None:
+        """Raise a `DaemonError` for error responses"""
+        if response.status >= http.HTTPStatus.BAD_REQUEST:
+            raise DaemonError(
+                f"Daemon request failed with {response.status}: {data.decode()}"
+            )
+
+
+def run_daemon(config_path: str = "./config.yaml") -> None:
+    """Serve the apps on the Unix domain socket of the configuration until stopped
+
+    The socket is only accessible to the current user. A stale socket of a daemon
+    that is no longer running is replaced, the socket is removed on shutdown.
+
+    Raises:
+        DaemonError: If a daemon is already running on the socket
+    """
+    app = create_app(config_path=config_path, daemon=True)
+    config: DaemonConfig = app.state.config.daemon
+    client = DaemonClient(config, config_path=config_path)
+    socket_path = Path(client.socket_path)
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    with _lock(client.lock_path):
+        socket_path.unlink(missing_ok=True)
+        _serve(app, socket_path)
+
+
+@contextlib.contextmanager
+def _lock(path: str) -> Iterator[IO[str]]:
+    """Hold an exclusive lock on the file while the daemon runs"""
+    with open(path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError as e:
+            raise DaemonError(f"A daemon is already running on `{path}`") from e
+        yield lock_file
+
+
+def _serve(app: Any, socket_path: Path) -> None:
+    """Serve the app on a new socket at the path until the server stops"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+        sock.bind(str(socket_path))
+    finally:
+        os.umask(umask)
+
+    # uvicorn raises the signal it stopped on again after the shutdown, exit through
+    # Python so that the socket is removed
+    signal.signal(signal.SIGTERM, _exit)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    try:
+        server.run(sockets=[sock])
+    finally:
+        sock.close()
+        socket_path.unlink(missing_ok=True)
+
+
+def _exit(signum: int, frame: FrameType | None) -> None:
+    """Exit on SIGTERM by raising `SystemExit`"""
+    raise SystemExit(0)
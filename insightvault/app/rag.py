@@ -1,6 +1,11 @@
 import asyncio
+from collections.abc import AsyncIterator, Sequence
 
+from ..constants import DEFAULT_COLLECTION_NAME
+from ..models.context import PackedContext
+from ..models.database import QueryFilter
 from ..models.document import Document
+from ..services.context_packer import ContextPackerService
 from ..services.llm import OllamaLLMService
 from ..services.prompt import PromptService
 from .search import SearchApp
@@ -12,34 +17,132 @@ class RAGApp(SearchApp):
     This application extends the SearchApp with RAG-specific query functionality.
     All other methods (add_documents, delete_documents, etc.) are inherited from
     SearchApp.
+
+    Queries are one-off, chats send the chat history along with each question. The
+    history is trimmed to `config.llm.history_max_tokens`.
+
+    The retrieved chunks are packed into a context of at most
+    `config.llm.context_max_tokens`, without the text adjacent chunks share. The
+    instructions are sent as a fixed system message, followed by the context and
+    the question, so the model can reuse the cached start of the prompt.
+
+    Attributes:
+        last_context: The context of the latest prompt, `None` before the first
     """
 
-    def __init__(self, name: str = "insightvault.app.rag") -> None:
-        super().__init__(name)
+    def __init__(
+        self,
+        name: str = "insightvault.app.rag",
+        config_path: str = "./config.yaml",
+    ) -> None:
+        super().__init__(name, config_path=config_path)
         self.prompt_service = PromptService()
-        self.llm_service = OllamaLLMService()
-
-    async def init(self) -> None:
-        """Initialize the RAG app"""
-        # TODO: Use asyncio.gather() here, make it work with asyncio.run()
-        # asyncio.gather(
-        #     super().init(),
-        #     self.llm_service.init(),
-        # )
-        await self.llm_service.init()
-        await super().init()
-        self.logger.debug(f"RAGApp `{self.name}` initialized!")
-
-    def query(self, query: str) -> list[str]:
+        self.context_packer_service = ContextPackerService(config=self.config.llm)
+        self.last_context: PackedContext | None = None
+        self.llm_service = OllamaLLMService(config=self.config.llm)
+        self.system_prompt = self.prompt_service.get_system_prompt("rag_context")
+
+    async def _init_services(self) -> None:
+        """Load the services of the RAG app concurrently"""
+        await asyncio.gather(
+            super()._init_services(),
+            self.llm_service.init(),
+        )
+        self.logger.debug(f"RAGApp `{self.name}` services loaded!")
+
+    def query(
+        self,
+        query: str,
+        query_filter: QueryFilter | None = None,
+        collection_names: Sequence[str] = (DEFAULT_COLLECTION_NAME,),
+    ) -> list[str]:
         """Query the database for documents similar to the query
 
         This RAG-specific implementation returns Document objects instead of strings.
+        Only documents matching `query_filter` from the given collections are used
+        as context.
         """
-        return asyncio.run(self.async_query(query))
+        return asyncio.run(
+            self.async_query(
+                query, query_filter=query_filter, collection_names=collection_names
+            )
+        )
 
-    async def async_query(self, query: str) -> list[str]:
+    async def async_query(
+        self,
+        query: str,
+        query_filter: QueryFilter | None = None,
+        collection_names: Sequence[str] = (DEFAULT_COLLECTION_NAME,),
+    ) -> list[str]:
         """Async version of query"""
         self.logger.debug(f"RAG async querying the database for: `{query}` ...")
+        prompt = await self._build_prompt(query, query_filter, collection_names)
+        if prompt is None:
+            return ["No documents found in the database."]
+
+        response = await self.llm_service.query(
+            prompt=prompt, system=self.system_prompt
+        )
+        if not response:
+            return ["No response from the LLM."]
+        return [response]
+
+    async def astream_query(
+        self,
+        query: str,
+        query_filter: QueryFilter | None = None,
+        collection_names: Sequence[str] = (DEFAULT_COLLECTION_NAME,),
+    ) -> AsyncIterator[str]:
+        """Stream the response to the query as it is generated
+
+        The time to the first token is logged and stored in
+        `llm_service.time_to_first_token`.
+        """
+        self.logger.debug(f"RAG streaming the response for: `{query}` ...")
+        prompt = await self._build_prompt(query, query_filter, collection_names)
+        if prompt is None:
+            yield "No documents found in the database."
+            return
+
+        async for token in self.llm_service.stream_query(
+            prompt=prompt, system=self.system_prompt
+        ):
+            yield token
+
+    async def astream_chat(
+        self,
+        query: str,
+        query_filter: QueryFilter | None = None,
+        collection_names: Sequence[str] = (DEFAULT_COLLECTION_NAME,),
+    ) -> AsyncIterator[str]:
+        """Stream the response to the query of a chat as it is generated
+
+        Context is retrieved for the query alone. The previous turns of the chat
+        are sent with the prompt and the query is added to the history without
+        its context, so the history does not fill up with retrieved chunks.
+        """
+        self.logger.debug(f"RAG chat streaming the response for: `{query}` ...")
+        prompt = await self._build_prompt(query, query_filter, collection_names)
+        if prompt is None:
+            yield "No documents found in the database."
+            return
+
+        async for token in self.llm_service.stream_chat(
+            prompt=prompt, history_prompt=query, system=self.system_prompt
+        ):
+            yield token
+
+    async def _build_prompt(
+        self,
+        query: str,
+        query_filter: QueryFilter | None = None,
+        collection_names: Sequence[str] = (DEFAULT_COLLECTION_NAME,),
+    ) -> str | None:
+        """Retrieve the context for the query and build the prompt from it
+
+        Returns None if no documents were found.
+        """
+        await self.init()
 
         if not self.splitter_service:
             raise RuntimeError("Splitter service is not loaded!")
@@ -48,27 +151,27 @@ class RAGApp(SearchApp):
         if not self.db_service:
             raise RuntimeError("Database service is not loaded!")
 
-        query_embeddings: list[list[float]] = await self.embedder_service.embed([query])
-        query_response: list[Document] | None = await self.db_service.query(
-            query_embeddings[0]
+        query_response: list[Document] = await self._retrieve(
+            query, query_filter=query_filter, collection_names=collection_names
         )
 
         # Create context from the response
         if not query_response:
-            return ["No documents found in the database."]
+            return None
 
-        context = "\n".join([doc.content for doc in query_response])
+        context = self.context_packer_service.pack(query_response)
+        self.last_context = context
+        self.logger.info(
+            f"Context of {context.tokens} tokens from {len(context.document_ids)} "
+            f"chunks, {context.tokens_saved} tokens saved"
+        )
 
         # Create prompt from the context
-        prompt: str = self.prompt_service.get_prompt(
-            prompt_type="rag_context", context={"question": query, "context": context}
+        return self.prompt_service.get_prompt(
+            prompt_type="rag_context",
+            context={"question": query, "context": context.text},
         )
 
-        response = await self.llm_service.query(prompt=prompt)
-        if not response:
-            return ["No response from the LLM."]
-        return [response]
-
     def clear(self) -> None:
         """Clears the chat history"""
         return asyncio.run(self.async_clear())
@@ -1,6 +1,13 @@
 import asyncio
+import heapq
+import itertools
+import re
+from collections.abc import Iterator, Sequence
 
+from ..constants import DEFAULT_COLLECTION_NAME
+from ..models.database import QueryFilter
 from ..models.document import Document
+from ..services.keyword_index import reciprocal_rank_fusion
 from .base import BaseApp
 
 
@@ -9,31 +16,286 @@ class SearchApp(BaseApp):
 
     This application is used to query the database and add documents to the database.
 
+    Queries are hybrid if the keyword index is enabled: the vector search results
+    are fused with the BM25 keyword results by reciprocal rank fusion. Queries that
+    look like a single identifier, see `config.database.keyword_pattern`, are
+    answered from the keyword index alone when it has matches.
+
+    Queries can fan out to several collections. They are searched in parallel and
+    the results are merged by cosine distance.
+
     Attributes:
         db (Database): The database service.
     """
 
-    def __init__(self, name: str = "insightvault.app.search") -> None:
-        super().__init__(name)
+    def __init__(
+        self,
+        name: str = "insightvault.app.search",
+        config_path: str = "./config.yaml",
+    ) -> None:
+        super().__init__(name, config_path=config_path)
 
-    async def init(self) -> None:
-        """Initialize the search app"""
-        await super().init()
-        self.logger.debug(f"SearchApp `{self.name}` initialized!")
+    async def _init_services(self) -> None:
+        """Load the services of the search app"""
+        await super()._init_services()
+        self.logger.debug(f"SearchApp `{self.name}` services loaded!")
 
-    def query(self, query: str) -> list[str]:
+    def query(
+        self,
+        query: str,
+        query_filter: QueryFilter | None = None,
+        collection_names: Sequence[str] = (DEFAULT_COLLECTION_NAME,),
+    ) -> list[str]:
         """Query the database for documents similar to the query.
 
-        Returns an alphabetically sorted list of document titles.
+        Only documents matching `query_filter` are searched, if it is given. The
+        collections are searched in parallel and their results are merged by
+        distance. Returns an alphabetically sorted list of document titles.
         """
-        return asyncio.run(self.async_query(query))
+        return asyncio.run(
+            self.async_query(
+                query, query_filter=query_filter, collection_names=collection_names
+            )
+        )
 
-    async def async_query(self, query: str) -> list[str]:
+    async def async_query(
+        self,
+        query: str,
+        query_filter: QueryFilter | None = None,
+        collection_names: Sequence[str] = (DEFAULT_COLLECTION_NAME,),
+    ) -> list[str]:
         """Async version of query"""
         self.logger.debug(f"Querying the database for: {query}")
+        response = await self._retrieve(
+            query, query_filter=query_filter, collection_names=collection_names
+        )
+        return sorted(set(doc.title for doc in response))
+
+    def query_many(
+        self,
+        queries: list[str],
+        query_filter: QueryFilter | None = None,
+        collection_names: Sequence[str] = (DEFAULT_COLLECTION_NAME,),
+    ) -> list[list[str]]:
+        """Query the database for documents similar to each of the queries.
+
+        The queries are embedded in one encoder batch and searched with a single
+        database query per collection. Returns an alphabetically sorted list of
+        document titles per query, in the order of the queries.
+        """
+        return asyncio.run(
+            self.async_query_many(
+                queries, query_filter=query_filter, collection_names=collection_names
+            )
+        )
+
+    async def async_query_many(
+        self,
+        queries: list[str],
+        query_filter: QueryFilter | None = None,
+        collection_names: Sequence[str] = (DEFAULT_COLLECTION_NAME,),
+    ) -> list[list[str]]:
+        """Async version of query_many"""
+        self.logger.debug(f"Querying the database for {len(queries)} queries")
+        if not queries:
+            return []
         await self.init()
         if not self.embedder_service:
             raise RuntimeError("Embedding service is not loaded!")
-        query_embeddings: list[list[float]] = await self.embedder_service.embed([query])
-        response: list[Document] = await self.db_service.query(query_embeddings[0])
-        return sorted(set(doc.title for doc in response))
+        query_embeddings = await self.embedder_service.embed_array(queries)
+
+        async def query_collection(collection_name: str) -> list[list[Document]]:
+            responses: list[list[Document]] = await self.db_service.query_many(
+                query_embeddings,
+                collection_name=collection_name,
+                query_filter=query_filter,
+            )
+            return await self._fuse(
+                responses,
+                await self._keyword_search(queries, collection_name),
+                query_filter,
+                collection_name,
+            )
+
+        per_collection = await asyncio.gather(
+            *(query_collection(name) for name in collection_names)
+        )
+        limit = self._max_num_results(collection_names)
+        return [
+            sorted(set(doc.title for doc in self._merge(list(responses), limit)))
+            for responses in zip(*per_collection, strict=True)
+        ]
+
+    async def _retrieve(
+        self,
+        query: str,
+        query_filter: QueryFilter | None = None,
+        collection_names: Sequence[str] = (DEFAULT_COLLECTION_NAME,),
+    ) -> list[Document]:
+        """Returns the documents for the query from all collections, best first
+
+        Identifier-like queries with keyword matches skip the embedder.
+        """
+        limit = self._max_num_results(collection_names)
+        keyword_ids = [
+            ids
+            for [ids] in await asyncio.gather(
+                *(self._keyword_search([query], name) for name in collection_names)
+            )
+        ]
+        if any(keyword_ids) and self._is_identifier(query):
+            matches = await asyncio.gather(
+                *(
+                    self._get_matching(ids, query_filter, name)
+                    for name, ids in zip(collection_names, keyword_ids, strict=True)
+                )
+            )
+            documents = self._merge(matches, limit)
+            if documents:
+                self.logger.debug(f"Answered `{query}` from the keyword index")
+                return documents
+
+        await self.init()
+        if not self.embedder_service:
+            raise RuntimeError("Embedding service is not loaded!")
+        query_embedding = await self.embedder_service.embed_query(query)
+
+        async def query_collection(
+            collection_name: str, ids: list[str]
+        ) -> list[Document]:
+            response: list[Document] = (
+                await self.db_service.query(
+                    query_embedding,
+                    collection_name=collection_name,
+                    query_filter=query_filter,
+                )
+                or []
+            )
+            [documents] = await self._fuse(
+                [response], [ids], query_filter, collection_name
+            )
+            return documents
+
+        results = await asyncio.gather(
+            *(
+                query_collection(name, ids)
+                for name, ids in zip(collection_names, keyword_ids, strict=True)
+            )
+        )
+        return self._merge(results, limit)
+
+    async def _keyword_search(
+        self, queries: list[str], collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> list[list[str]]:
+        """Returns the ids of the keyword matches of each query, best first"""
+        if not self.keyword_service:
+            return [[] for _ in queries]
+
+        keyword_service = self.keyword_service
+        await self._backfill_keyword_index(collection_name)
+        settings = self.config.database.for_collection(collection_name)
+        limit = settings.max_num_results * settings.query_overfetch
+        return await asyncio.to_thread(
+            lambda: [
+                keyword_service.search(query, limit, collection_name)
+                for query in queries
+            ]
+        )
+
+    async def _fuse(
+        self,
+        responses: list[list[Document]],
+        keyword_ids: list[list[str]],
+        query_filter: QueryFilter | None,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> list[list[Document]]:
+        """Fuses the vector search results with the keyword matches of each query
+
+        Keyword matches that are not among the vector results are fetched from the
+        database with a single call. Results without keyword matches are returned
+        unchanged.
+        """
+        found = {doc.id: doc for response in responses for doc in response}
+        missing = list(
+            dict.fromkeys(
+                doc_id for ids in keyword_ids for doc_id in ids if doc_id not in found
+            )
+        )
+        if missing:
+            found.update(
+                (doc.id, doc)
+                for doc in await self._get_matching(
+                    missing, query_filter, collection_name
+                )
+            )
+
+        max_num_results = self.config.database.for_collection(
+            collection_name
+        ).max_num_results
+        fused = []
+        for response, ids in zip(responses, keyword_ids, strict=True):
+            if not ids:
+                fused.append(response)
+                continue
+            ranking = reciprocal_rank_fusion(
+                [[doc.id for doc in response], ids], k=self.config.database.fusion_k
+            )
+            fused.append(
+                [found[doc_id] for doc_id in ranking if doc_id in found][
+                    :max_num_results
+                ]
+            )
+        return fused
+
+    async def _get_matching(
+        self,
+        ids: list[str],
+        query_filter: QueryFilter | None,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> list[Document]:
+        """Returns the documents with the given ids that match the query filter"""
+        if not ids:
+            return []
+        documents = await self.db_service.get_documents_by_ids(
+            ids, collection_name=collection_name
+        )
+        if query_filter is None:
+            return documents
+        return [
+            doc for doc in documents if query_filter.matches(doc.metadata, doc.content)
+        ]
+
+    def _merge(self, results: Sequence[list[Document]], limit: int) -> list[Document]:
+        """Merges the results of several collections into the `limit` best
+
+        Each result list keeps its order. Lists are merged by cosine distance, a
+        document without a distance, such as a keyword match, ranks like the
+        document before it.
+        """
+        if len(results) == 1:
+            return results[0][:limit]
+
+        def ranked(documents: list[Document]) -> Iterator[tuple[float, Document]]:
+            key = 0.0
+            for document in documents:
+                if document.distance is not None:
+                    key = max(key, document.distance)
+                yield key, document
+
+        merged = heapq.merge(*(ranked(docs) for docs in results), key=lambda x: x[0])
+        return [document for _, document in itertools.islice(merged, limit)]
+
+    def _max_num_results(self, collection_names: Sequence[str]) -> int:
+        """Returns the largest number of results of the collections"""
+        return max(
+            (
+                self.config.database.for_collection(name).max_num_results
+                for name in collection_names
+            ),
+            default=self.config.database.max_num_results,
+        )
+
+    def _is_identifier(self, query: str) -> bool:
+        """Whether the query matches `config.database.keyword_pattern`"""
+        pattern = self.config.database.keyword_pattern
+        return pattern is not None and re.fullmatch(pattern, query.strip()) is not None
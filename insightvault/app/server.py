@@ -0,0 +1,209 @@
+import asyncio
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..constants import DEFAULT_COLLECTION_NAME
+from ..models.database import CollectionName
+from ..models.document import Document
+from ..models.ingestion import IngestionProgress
+from ..models.server import (
+    AddDirectoryRequest,
+    AddDocumentsRequest,
+    ChatRequest,
+    ChatResponse,
+    DocumentInfo,
+    HealthResponse,
+    ListDocumentsResponse,
+    SearchRequest,
+    SearchResponse,
+    SourcesResponse,
+    SummarizeRequest,
+    SummarizeResponse,
+)
+from .rag import RAGApp
+from .search import SearchApp
+from .summarizer import SummarizerApp
+
+
+def create_app(config_path: str = "./config.yaml", daemon: bool = False) -> FastAPI:
+    """Create the HTTP server application
+
+    The search, RAG and summarizer apps share one database client, one embedding
+    model and one LLM client. They are loaded once at startup and stay warm for all
+    requests. At most `server.max_concurrent_requests` requests are processed at the
+    same time, further requests wait for a free slot. Streamed responses hold their
+    slot until the stream has finished.
+
+    Concurrent query embeddings are coalesced into batches within
+    `server.coalesce_window` seconds.
+
+    Ingesting a directory of the server and deleting all documents are only
+    available with `daemon`, whose socket is only accessible to the current user.
+
+    Args:
+        config_path: Path of the configuration file
+        daemon: Whether to add the routes of the daemon
+
+    Returns:
+        The FastAPI application
+    """
+    search_app = SearchApp(name="insightvault.server.search", config_path=config_path)
+    rag_app = RAGApp(name="insightvault.server.rag", config_path=config_path)
+    summarizer_app = SummarizerApp(
+        name="insightvault.server.summarizer", config_path=config_path
+    )
+    _share_services(search_app, rag_app, summarizer_app)
+    search_app.embedder_service.config.coalesce_window = (
+        search_app.config.server.coalesce_window
+    )
+    limiter = asyncio.Semaphore(search_app.config.server.max_concurrent_requests)
+
+    @asynccontextmanager
+    async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+        await asyncio.gather(search_app.init(), rag_app.init(), summarizer_app.init())
+        yield
+
+    app = FastAPI(title="InsightVault", lifespan=lifespan)
+    app.state.config = search_app.config
+
+    app.add_middleware(_ConcurrencyLimit, limiter=limiter)
+
+    @app.get("/health")
+    async def health() -> HealthResponse:
+        return HealthResponse(
+            status="ok", init_duration=rag_app.init_duration, pid=os.getpid()
+        )
+
+    @app.post("/search")
+    async def search(request: SearchRequest) -> SearchResponse:
+        results = await search_app.async_query(
+            request.query,
+            query_filter=request.filter,
+            collection_names=request.collections,
+        )
+        return SearchResponse(results=results)
+
+    @app.post("/chat")
+    async def chat(request: ChatRequest) -> ChatResponse:
+        responses = await rag_app.async_query(
+            request.query,
+            query_filter=request.filter,
+            collection_names=request.collections,
+        )
+        return ChatResponse(response=responses[0])
+
+    @app.post("/chat/stream")
+    async def chat_stream(request: ChatRequest) -> StreamingResponse:
+        tokens = rag_app.astream_query(
+            request.query,
+            query_filter=request.filter,
+            collection_names=request.collections,
+        )
+        return StreamingResponse(tokens, media_type="text/plain")
+
+    @app.post("/summarize")
+    async def summarize(request: SummarizeRequest) -> SummarizeResponse:
+        summary = await summarizer_app.async_summarize(request.text)
+        return SummarizeResponse(summary=summary)
+
+    @app.post("/summarize/stream")
+    async def summarize_stream(request: SummarizeRequest) -> StreamingResponse:
+        tokens = summarizer_app.astream_summarize(request.text)
+        return StreamingResponse(tokens, media_type="text/plain")
+
+    @app.post("/documents")
+    async def add_documents(request: AddDocumentsRequest) -> IngestionProgress:
+        documents = [
+            Document(title=doc.title, content=doc.content, metadata=doc.metadata)
+            for doc in request.documents
+        ]
+        return await search_app.async_add_documents(
+            documents, collection_name=request.collection
+        )
+
+    @app.get("/documents")
+    async def list_documents(
+        limit: int | None = None,
+        offset: int = 0,
+        collection: CollectionName = DEFAULT_COLLECTION_NAME,
+    ) -> ListDocumentsResponse:
+        documents = [
+            DocumentInfo(id=doc.id, metadata=doc.metadata)
+            async for doc in search_app.aiter_documents(
+                limit=limit,
+                offset=offset,
+                include=("metadatas",),
+                collection_name=collection,
+            )
+        ]
+        return ListDocumentsResponse(documents=documents)
+
+    @app.get("/sources")
+    async def count_sources(
+        collection: CollectionName = DEFAULT_COLLECTION_NAME,
+    ) -> SourcesResponse:
+        counts = await search_app.async_count_documents_by_source(
+            collection_name=collection
+        )
+        return SourcesResponse(sources=counts)
+
+    if daemon:
+        _add_daemon_routes(app, search_app)
+    return app
+
+
+def _add_daemon_routes(app: FastAPI, search_app: SearchApp) -> None:
+    """Add the routes that read files of the server or delete documents"""
+
+    @app.post("/directories")
+    async def add_directory(request: AddDirectoryRequest) -> IngestionProgress:
+        return await search_app.async_add_directory(
+            request.path,
+            include=request.include,
+            exclude=request.exclude,
+            collection_name=request.collection,
+        )
+
+    @app.delete("/documents")
+    async def delete_all_documents(
+        collection: CollectionName = DEFAULT_COLLECTION_NAME,
+    ) -> None:
+        await search_app.async_delete_all_documents(collection_name=collection)
+
+
+class _ConcurrencyLimit:
+    """ASGI middleware that processes requests while the limiter has a free slot
+
+    A request holds its slot until its whole response is sent, including the body
+    of a streamed response.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: asyncio.Semaphore) -> None:
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        async with self.limiter:
+            await self.app(scope, receive, send)
+
+
+def _share_services(
+    search_app: SearchApp, rag_app: RAGApp, summarizer_app: SummarizerApp
+) -> None:
+    """Let the apps use the services of the search app and the LLM of the RAG app"""
+    for app in (rag_app, summarizer_app):
+        app.db_service = search_app.db_service
+        app.splitter_service = search_app.splitter_service
+        app.embedder_service = search_app.embedder_service
+        app.manifest_service = search_app.manifest_service
+        app.keyword_service = search_app.keyword_service
+        app._ingest_lock = search_app._ingest_lock
+    summarizer_app.llm_service = rag_app.llm_service
@@ -1,32 +1,45 @@
 import asyncio
+from collections.abc import AsyncIterator
 
+from ..models.config import SplitterConfig
+from ..models.document import Document
 from ..services.llm import OllamaLLMService
 from ..services.prompt import PromptService
+from ..services.splitter import SplitterService
 from .base import BaseApp
 
 
 class SummarizerApp(BaseApp):
     """Summarizer application
 
-    This application is used to summarize documents.
+    This application is used to summarize documents. Texts that do not fit into
+    one `summarizer.chunk_size` chunk are summarized with map-reduce: the chunks
+    are summarized concurrently and the partial summaries are merged.
     """
 
-    def __init__(self, name: str = "insightvault.app.summarizer") -> None:
-        super().__init__(name)
+    def __init__(
+        self,
+        name: str = "insightvault.app.summarizer",
+        config_path: str = "./config.yaml",
+    ) -> None:
+        super().__init__(name, config_path=config_path)
         self.name = name
         self.prompt_service = PromptService()
-        self.llm_service = OllamaLLMService()
-
-    async def init(self) -> None:
-        """Initialize the summarizer app"""
-        # TODO: Use asyncio.gather() here, make it work with asyncio.run()
-        # asyncio.gather(
-        #     super().init(),
-        #     self.llm_service.init(),
-        # )
-        await super().init()
-        await self.llm_service.init()
-        self.logger.debug(f"SummarizerApp `{self.name}` initialized!")
+        self.llm_service = OllamaLLMService(config=self.config.llm)
+        self.summary_splitter_service = SplitterService(
+            config=SplitterConfig(
+                chunk_size=self.config.summarizer.chunk_size,
+                chunk_overlap=self.config.summarizer.chunk_overlap,
+            )
+        )
+
+    async def _init_services(self) -> None:
+        """Load the services of the summarizer app concurrently"""
+        await asyncio.gather(
+            super()._init_services(),
+            self.llm_service.init(),
+        )
+        self.logger.debug(f"SummarizerApp `{self.name}` services loaded!")
 
     def summarize(self, text: str) -> str | None:
         """Summarize a list of documents"""
@@ -35,10 +48,72 @@ class SummarizerApp(BaseApp):
     async def async_summarize(self, text: str) -> str | None:
         """Async version of summarize"""
         self.logger.info("Summarizing document(s) ...")
+        await self.init()
+
+        prompt = await self._build_prompt(text)
+        response = await self.llm_service.query(prompt=prompt)
+        return response
+
+    async def astream_summarize(self, text: str) -> AsyncIterator[str]:
+        """Stream the summary of the text as it is generated
+
+        With map-reduce, the partial summaries are generated first and only the
+        final merge is streamed.
+        """
+        self.logger.info("Streaming the summary of document(s) ...")
+        await self.init()
+
+        prompt = await self._build_prompt(text)
+        async for token in self.llm_service.stream_query(prompt=prompt):
+            yield token
 
+    async def _build_prompt(self, text: str) -> str:
+        """Build the prompt of the final summary
+
+        Long texts are reduced to partial summaries first, which are summarized
+        again until they fit into one chunk or `summarizer.max_depth` is reached.
+        """
+        chunks = self._split(text)
+        if len(chunks) <= 1:
+            return self.prompt_service.get_prompt(
+                prompt_type="summarize_text", context={"text": text}
+            )
+
+        semaphore = asyncio.Semaphore(self.config.summarizer.max_concurrency)
+        for depth in range(1, self.config.summarizer.max_depth + 1):
+            self.logger.debug(f"Summarizing {len(chunks)} chunks at depth {depth}")
+            summaries = await asyncio.gather(
+                *(self._summarize_chunk(chunk, semaphore) for chunk in chunks)
+            )
+            merged = "\n\n".join(summary for summary in summaries if summary)
+            chunks = self._split(merged)
+            if len(chunks) <= 1:
+                break
+        else:
+            self.logger.warning(
+                f"Partial summaries still span {len(chunks)} chunks after "
+                f"{self.config.summarizer.max_depth} rounds, merging them anyway"
+            )
+
+        return self.prompt_service.get_prompt(
+            prompt_type="merge_summaries", context={"summaries": merged}
+        )
+
+    async def _summarize_chunk(
+        self, chunk: str, semaphore: asyncio.Semaphore
+    ) -> str | None:
+        """Summarize one chunk, limiting the number of concurrent LLM calls"""
         prompt = self.prompt_service.get_prompt(
-            prompt_type="summarize_text", context={"text": text}
+            prompt_type="summarize_text", context={"text": chunk}
         )
+        async with semaphore:
+            return await self.llm_service.query(prompt=prompt)
 
-        response = await self.llm_service.query(prompt=prompt)
-        return response
+    def _split(self, text: str) -> list[str]:
+        """Split the text into chunks that are summarized in one call"""
+        if not self.config.summarizer.map_reduce or not text:
+            return [text]
+        chunks = self.summary_splitter_service.split(
+            Document(title="Summary input", content=text)
+        )
+        return [chunk.content for chunk in chunks]
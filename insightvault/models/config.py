@@ -1,10 +1,45 @@
-from pydantic import BaseModel
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field
+
+
+class CollectionConfig(BaseModel):
+    """Overrides of the database config for a single collection"""
+
+    distance: Literal["cosine", "l2", "ip"] | None = None
+    result_threshold: float | None = None
+    max_num_results: int | None = None
 
 
 class DatabaseConfig(BaseModel):
+    backend: Literal["chroma", "numpy"] = "chroma"
+    distance: Literal["cosine", "l2", "ip"] = "cosine"
     path: str = "./data/db"
     result_threshold: float = 0.9
     max_num_results: int = 5
+    query_overfetch: int = 2
+    page_size: int = 1000
+    query_cache_size: int = 256
+    query_cache_ttl: float | None = 300.0
+    max_workers: int = 4
+    timeout: float | None = None
+    index: Literal["flat", "ivf"] = "flat"
+    ivf_min_size: int = 10_000
+    ivf_num_lists: int | None = None
+    ivf_num_probes: int = 8
+    quantization: Literal["none", "int8", "binary"] = "none"
+    rerank_factor: int = 10
+    keyword_index: bool = True
+    keyword_pattern: str | None = r"(?=[\w\-.:/#]*[\d_])[\w\-.:/#]+"
+    fusion_k: int = 60
+    collections: dict[str, CollectionConfig] = {}
+
+    def for_collection(self, collection_name: str) -> "DatabaseConfig":
+        """Returns the config with the overrides of a collection applied"""
+        overrides = self.collections.get(collection_name)
+        if overrides is None:
+            return self
+        return self.model_copy(update=overrides.model_dump(exclude_none=True))
 
 
 class SplitterConfig(BaseModel):
@@ -14,10 +49,59 @@ class SplitterConfig(BaseModel):
 
 class LlmConfig(BaseModel):
     model: str = "llama3"
+    history_max_tokens: int = 2048
+    context_max_tokens: int = 3072
+    keep_alive: float | str | None = "30m"
+    num_ctx: int | None = 8192
+    options: dict[str, Any] = {}
 
 
 class EmbeddingConfig(BaseModel):
     model: str = "all-MiniLM-L6-v2"
+    batch_size: int = 32
+    cache_enabled: bool = False
+    cache_path: str = "./data/embedding_cache"
+    cache_max_entries: int = 100_000
+    max_workers: int = 1
+    timeout: float | None = None
+    # Only worth it with concurrent queries, `server.coalesce_window` enables it
+    coalesce_window: float = 0.0
+    coalesce_max_batch_size: int = 64
+
+
+class IngestionConfig(BaseModel):
+    batch_size: int = 512
+    queue_size: int = 64
+
+
+class SummarizerConfig(BaseModel):
+    map_reduce: bool = True
+    chunk_size: int = 2048
+    chunk_overlap: int = 128
+    max_concurrency: int = 4
+    # At least one round, the final prompt merges partial summaries
+    max_depth: int = Field(default=3, ge=1)
+
+
+class ServerConfig(BaseModel):
+    host: str = "127.0.0.1"
+    port: int = 8000
+    max_concurrent_requests: int = 16
+    # Replaces `embedding.coalesce_window` in the server and the daemon
+    coalesce_window: float = 0.002
+
+
+class DaemonConfig(BaseModel):
+    """Background daemon that keeps the apps loaded between CLI commands
+
+    With `enabled`, the first CLI command starts the daemon and every command is
+    sent to it over the Unix domain socket at `socket_path`.
+    """
+
+    enabled: bool = False
+    socket_path: str = "./data/insightvault.sock"
+    log_path: str = "./data/insightvault-daemon.log"
+    start_timeout: float = 120.0
 
 
 class AppConfig(BaseModel):
@@ -27,3 +111,7 @@ class AppConfig(BaseModel):
     splitter: SplitterConfig
     llm: LlmConfig
     embedding: EmbeddingConfig
+    ingestion: IngestionConfig = IngestionConfig()
+    summarizer: SummarizerConfig = SummarizerConfig()
+    server: ServerConfig = ServerConfig()
+    daemon: DaemonConfig = DaemonConfig()
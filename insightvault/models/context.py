@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+
+
+class PackedContext(BaseModel):
+    """Context of a prompt packed from retrieved chunks
+
+    Attributes:
+        text: The context text
+        document_ids: Ids of the chunks in the context, best first
+        tokens: Estimated number of tokens of the context
+        input_tokens: Estimated number of tokens of all retrieved chunks joined
+        dropped: Number of chunks left out as repeated or over the budget
+    """
+
+    text: str = ""
+    document_ids: list[str] = []
+    tokens: int = 0
+    input_tokens: int = 0
+    dropped: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.input_tokens - self.tokens
@@ -1,6 +1,72 @@
+import re
+from collections.abc import Mapping
 from enum import Enum
+from typing import Annotated, Any, Literal
+
+from pydantic import AfterValidator, BaseModel, ConfigDict
+
+DocumentField = Literal["documents", "metadatas"]
+
+# Chroma's naming rules: 3 to 63 characters from [a-zA-Z0-9._-], starting and
+# ending with a letter or digit. Names are also directory names of the NumPy
+# backend, so they must not contain path separators or `..`.
+COLLECTION_NAME_PATTERN = re.compile(r"[a-zA-Z0-9][a-zA-Z0-9._-]{1,61}[a-zA-Z0-9]")
+
+
+def validate_collection_name(name: str) -> str:
+    """Returns the name if it is a valid collection name
+
+    Raises:
+        ValueError: If the name breaks the naming rules
+    """
+    if not COLLECTION_NAME_PATTERN.fullmatch(name) or ".." in name:
+        raise ValueError(
+            f"Invalid collection name `{name}`: use 3 to 63 letters, digits, `.`, "
+            "`_` or `-`, starting and ending with a letter or digit, without `..`"
+        )
+    return name
+
+
+CollectionName = Annotated[str, AfterValidator(validate_collection_name)]
 
 
 class DistanceFunction(Enum):
     COSINE = "cosine"
     L2 = "l2"
+    INNER_PRODUCT = "ip"
+
+
+class QueryFilter(BaseModel):
+    """Restricts a query to documents that match all given fields
+
+    Attributes:
+        source: The `source` metadata of the documents
+        title: The `title` metadata of the documents
+        type: The `type` metadata of the documents
+        contains: Text the content of the documents must contain
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    source: str | None = None
+    title: str | None = None
+    type: str | None = None
+    contains: str | None = None
+
+    def metadata(self) -> dict[str, str]:
+        """Returns the metadata fields that are set"""
+        return {
+            key: value
+            for key, value in (
+                ("source", self.source),
+                ("title", self.title),
+                ("type", self.type),
+            )
+            if value is not None
+        }
+
+    def matches(self, metadata: Mapping[str, Any], content: str) -> bool:
+        """Whether a document with the metadata and content passes the filter"""
+        if any(metadata.get(key) != value for key, value in self.metadata().items()):
+            return False
+        return self.contains is None or self.contains in content
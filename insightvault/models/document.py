@@ -3,7 +3,11 @@ from collections.abc import Mapping, Sequence
 from datetime import UTC, datetime
 from typing import Any
 
-from pydantic import BaseModel, Field
+import numpy as np
+import numpy.typing as npt
+from pydantic import BaseModel, ConfigDict, Field, field_serializer
+
+Embedding = npt.NDArray[np.float32] | Sequence[float]
 
 
 class Document(BaseModel):
@@ -14,15 +18,27 @@ class Document(BaseModel):
         title: str
         content: str
         metadata: dict[str, Any]
-        embedding: list[float] | None
+        embedding: list[float] | np.ndarray | None
+        distance: Cosine distance to the query, set on query results
         created_at: datetime
         updated_at: datetime
     """
 
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
     content: str
     metadata: Mapping[str, Any] = Field(default_factory=dict)
-    embedding: Sequence[float] | None = None
+    embedding: np.ndarray | Sequence[float] | None = None
+    distance: float | None = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+    @field_serializer("embedding")
+    def _serialize_embedding(
+        self, embedding: np.ndarray | Sequence[float] | None
+    ) -> Sequence[float] | None:
+        if isinstance(embedding, np.ndarray):
+            return embedding.tolist()  # type: ignore[no-any-return]
+        return embedding
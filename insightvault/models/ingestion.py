@@ -0,0 +1,58 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class IngestionProgress(BaseModel):
+    """Progress of a running ingestion
+
+    Attributes:
+        documents: Number of documents that were split so far
+        chunks: Number of chunks that were embedded and stored so far
+        skipped: Number of documents that were unchanged since the last ingestion
+        elapsed: Seconds since the ingestion started
+    """
+
+    documents: int = 0
+    chunks: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.documents / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+
+class ManifestEntry(BaseModel):
+    """Manifest entry of an ingested document source
+
+    Attributes:
+        fingerprint: Hash of the document content and the ingestion settings
+        settings: Hash of the embedding model and splitter settings the chunks were
+            stored with
+        chunk_ids: Ids of the chunks stored for the source, in document order
+    """
+
+    fingerprint: str
+    settings: str = ""
+    chunk_ids: list[str] = []
+
+
+class SourceUpdate(BaseModel):
+    """Changes of an ingested source, applied once its new chunks are stored
+
+    Attributes:
+        source: The source of the document
+        entry: The new manifest entry of the source
+        stale_ids: Ids of the stored chunks that are no longer part of the source
+        moved: The new metadata of kept chunks whose position changed, by id
+    """
+
+    source: str
+    entry: ManifestEntry
+    stale_ids: list[str] = []
+    moved: dict[str, dict[str, Any]] = {}
@@ -0,0 +1,87 @@
+from collections.abc import Mapping
+from typing import Any
+
+from pydantic import BaseModel
+
+from ..constants import DEFAULT_COLLECTION_NAME
+from .database import CollectionName, QueryFilter
+
+
+class SearchRequest(BaseModel):
+    query: str
+    filter: QueryFilter | None = None
+    collections: list[CollectionName] = [DEFAULT_COLLECTION_NAME]
+
+
+class SearchResponse(BaseModel):
+    results: list[str]
+
+
+class ChatRequest(BaseModel):
+    query: str
+    filter: QueryFilter | None = None
+    collections: list[CollectionName] = [DEFAULT_COLLECTION_NAME]
+
+
+class ChatResponse(BaseModel):
+    response: str
+
+
+class SummarizeRequest(BaseModel):
+    text: str
+
+
+class SummarizeResponse(BaseModel):
+    summary: str | None
+
+
+class DocumentInput(BaseModel):
+    """Document sent to the ingestion endpoint
+
+    Attributes:
+        title: str
+        content: str
+        metadata: dict[str, Any]
+    """
+
+    title: str
+    content: str
+    metadata: Mapping[str, Any] = {}
+
+
+class AddDocumentsRequest(BaseModel):
+    documents: list[DocumentInput]
+    collection: CollectionName = DEFAULT_COLLECTION_NAME
+
+
+class AddDirectoryRequest(BaseModel):
+    path: str
+    include: list[str] = ["*"]
+    exclude: list[str] = []
+    collection: CollectionName = DEFAULT_COLLECTION_NAME
+
+
+class DocumentInfo(BaseModel):
+    """Listed document, without its content
+
+    Attributes:
+        id: str
+        metadata: dict[str, Any]
+    """
+
+    id: str
+    metadata: Mapping[str, Any] = {}
+
+
+class ListDocumentsResponse(BaseModel):
+    documents: list[DocumentInfo]
+
+
+class SourcesResponse(BaseModel):
+    sources: dict[str, int]
+
+
+class HealthResponse(BaseModel):
+    status: str
+    init_duration: float | None
+    pid: int | None = None
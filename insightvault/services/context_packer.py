@@ -0,0 +1,157 @@
+from collections.abc import Sequence
+
+from ..models.config import LlmConfig
+from ..models.context import PackedContext
+from ..models.document import Document
+from ..utils.logging import get_logger
+from ..utils.tokens import (
+    CHARS_PER_TOKEN,
+    estimate_tokens,
+    estimate_tokens_of_length,
+)
+
+# Shorter matches between adjacent chunks are not treated as overlap
+MIN_OVERLAP_CHARS = 16
+
+
+class ContextPackerService:
+    """Packs retrieved chunks into the context of a prompt
+
+    Chunks are taken in the order they were retrieved, best first, as long as the
+    context stays within `config.context_max_tokens`. Chunks that do not fit are
+    skipped, smaller ones after them may still be taken. Repeated chunks are left
+    out.
+
+    Adjacent chunks of the same source share the text of the splitter's
+    `chunk_overlap`. They are joined into one passage that contains the shared
+    text once, placed at the rank of its best chunk. Chunks are only joined if
+    their texts overlap, so a stale `chunk_index` cannot join unrelated chunks.
+
+    Each chunk only changes the size of the context by its own length minus the
+    text it shares with its neighbours, so the context is sized as it grows
+    instead of being rendered again for every candidate.
+
+    Attributes:
+        config: The LLM configuration with the context budget
+    """
+
+    def __init__(self, config: LlmConfig) -> None:
+        self.logger = get_logger("insightvault.services.context_packer")
+        self.config = config
+
+    def pack(self, documents: Sequence[Document]) -> PackedContext:
+        """Returns the context of the documents that fits the token budget"""
+        budget = self.config.context_max_tokens
+        selected: list[Document] = []
+        # Rows of the selected chunks by position, their joined next chunk and the
+        # length of the text each joined chunk shares with its previous one
+        rows: dict[tuple[str, int], int] = {}
+        following: dict[int, int] = {}
+        shared: dict[int, int] = {}
+        contents = set()
+        num_chars = 0
+        num_passages = 0
+        for document in documents:
+            if document.content in contents:
+                continue
+            contents.add(document.content)
+
+            position = _position(document)
+            if position in rows:
+                # Another chunk claims the same position, this one stands alone
+                position = None
+            before = after = None
+            shared_before = shared_after = 0
+            if position is not None:
+                source, index = position
+                before = rows.get((source, index - 1))
+                after = rows.get((source, index + 1))
+                if before is not None:
+                    shared_before = overlap(selected[before].content, document.content)
+                if after is not None:
+                    shared_after = overlap(document.content, selected[after].content)
+
+            chars = num_chars + len(document.content) - shared_before - shared_after
+            passages = num_passages + 1 - bool(shared_before) - bool(shared_after)
+            # Passages are separated by a newline
+            if estimate_tokens_of_length(chars + passages - 1) > budget:
+                continue
+
+            row = len(selected)
+            selected.append(document)
+            num_chars, num_passages = chars, passages
+            if position is not None:
+                rows[position] = row
+            if before is not None and shared_before:
+                following[before] = row
+                shared[row] = shared_before
+            if after is not None and shared_after:
+                following[row] = after
+                shared[after] = shared_after
+
+        text = _render(selected, following, shared)
+        if not selected and documents:
+            # Not even the best chunk fits, it is cut to the budget
+            selected = [documents[0]]
+            text = documents[0].content[: budget * CHARS_PER_TOKEN]
+
+        packed = PackedContext(
+            text=text,
+            document_ids=[document.id for document in selected],
+            tokens=estimate_tokens(text),
+            input_tokens=estimate_tokens(
+                "\n".join(document.content for document in documents)
+            ),
+            dropped=len(documents) - len(selected),
+        )
+        self.logger.debug(
+            f"Packed {len(selected)} of {len(documents)} chunks into "
+            f"{packed.tokens} tokens, saved {packed.tokens_saved} tokens"
+        )
+        return packed
+
+
+def overlap(first: str, second: str) -> int:
+    """Returns the length of the longest end of `first` that starts `second`
+
+    Matches shorter than `MIN_OVERLAP_CHARS` are not counted.
+    """
+    start = first.find(second[:MIN_OVERLAP_CHARS])
+    while start != -1:
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(second[:MIN_OVERLAP_CHARS], start + 1)
+    return 0
+
+
+def _render(
+    selected: list[Document], following: dict[int, int], shared: dict[int, int]
+) -> str:
+    """Join the chunks into passages, in order of the best chunk of each passage
+
+    Args:
+        selected: The chunks, best first
+        following: The row of the chunk joined after a row
+        shared: The length of the text a joined row shares with its previous row
+    """
+    passages: list[tuple[int, str]] = []
+    for first in range(len(selected)):
+        if first in shared:
+            continue
+        passage = [first]
+        while passage[-1] in following:
+            passage.append(following[passage[-1]])
+        text = selected[first].content + "".join(
+            selected[row].content[shared[row] :] for row in passage[1:]
+        )
+        passages.append((min(passage), text))
+    return "\n".join(text for _, text in sorted(passages))
+
+
+def _position(document: Document) -> tuple[str, int] | None:
+    """The source and index of a chunk, None without a chunk index"""
+    try:
+        index = int(document.metadata["chunk_index"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return str(document.metadata.get("source", document.title)), index
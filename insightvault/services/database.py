@@ -1,41 +1,114 @@
 from abc import ABC, abstractmethod
-from collections.abc import Sequence
-from typing import Any
+from collections.abc import AsyncIterator, Hashable, Mapping, Sequence
+from typing import TYPE_CHECKING, Any
 
-import chromadb
-from chromadb.config import Settings
+import numpy as np
+import numpy.typing as npt
 
 from ..constants import (
     DEFAULT_COLLECTION_NAME,
 )
 from ..models.config import DatabaseConfig
-from ..models.database import DistanceFunction
-from ..models.document import Document
+from ..models.database import DistanceFunction, DocumentField, QueryFilter
+from ..models.document import Document, Embedding
+from ..utils.cache import TTLCache
+from ..utils.executor import BlockingExecutor
+from ..utils.lazy import LazyImport
 from ..utils.logging import get_logger
 
+if TYPE_CHECKING:
+    import chromadb
+    from chromadb.api.models.Collection import Collection
+    from chromadb.api.types import Where, WhereDocument
+    from chromadb.config import Settings
+else:
+    chromadb = LazyImport("chromadb")
+    Settings = LazyImport("chromadb.config", "Settings")
+
+QUERY_RESULT_KEYS = (
+    "ids",
+    "documents",
+    "metadatas",
+    "distances",
+    "embeddings",
+    "uris",
+    "data",
+)
+
 
 class AbstractDatabaseService(ABC):
     """Abstract database service"""
 
     @abstractmethod
-    async def add_documents(self, documents: list[Document]) -> None:
+    async def add_documents(
+        self, documents: list[Document], collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
         """Add a list of documents to the database"""
 
     @abstractmethod
     async def query(
         self,
-        query_embedding: Sequence[float],
+        query_embedding: Embedding,
         collection_name: str = DEFAULT_COLLECTION_NAME,
         filter_docs: bool = True,
+        query_filter: QueryFilter | None = None,
     ) -> list[Document]:
         """Query the database for documents similar to the query embedding"""
 
     @abstractmethod
-    async def get_documents(self) -> list[Document] | None:
-        """Get all documents from the database"""
+    async def query_many(
+        self,
+        query_embeddings: Sequence[Embedding] | npt.NDArray[np.float32],
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+        filter_docs: bool = True,
+        query_filter: QueryFilter | None = None,
+    ) -> list[list[Document]]:
+        """Query the database for each of the query embeddings"""
+
+    @abstractmethod
+    async def get_documents(
+        self,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+        limit: int | None = None,
+        offset: int = 0,
+        include: Sequence[DocumentField] = ("documents", "metadatas"),
+    ) -> list[Document] | None:
+        """Get the documents from the database, all of them by default"""
 
     @abstractmethod
-    async def delete_all_documents(self) -> None:
+    def iter_documents(
+        self,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+        limit: int | None = None,
+        offset: int = 0,
+        include: Sequence[DocumentField] = ("documents", "metadatas"),
+    ) -> AsyncIterator[Document]:
+        """Lazily yield the documents in the database, one page at a time"""
+
+    @abstractmethod
+    async def get_documents_by_ids(
+        self, ids: list[str], collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> list[Document]:
+        """Get the documents with the given ids, in the order of the ids"""
+
+    @abstractmethod
+    async def update_metadata(
+        self,
+        metadatas: Mapping[str, Mapping[str, Any]],
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> None:
+        """Replace the metadata of the documents, keyed by id"""
+
+    @abstractmethod
+    async def delete_documents(
+        self, ids: list[str], collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
+        """Delete the documents with the given ids from the database"""
+
+    @abstractmethod
+    async def delete_all_documents(
+        self, collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
         """Delete all documents from the database"""
 
     @abstractmethod
@@ -49,6 +122,14 @@ class ChromaDatabaseService(AbstractDatabaseService):
     This service is used to interact with the Chroma database.
 
     Embedding functions are not provided here, so the caller must provide them.
+
+    Query results are kept in an in-process LRU cache with a time-to-live. The cache
+    is cleared whenever this service writes to the database. Writes by other
+    processes are only picked up once the cached entries expire.
+
+    Blocking Chroma calls run on a dedicated thread pool of `config.max_workers`
+    threads, so concurrent queries do not stall the event loop. Each call is
+    aborted with a `TimeoutError` after `config.timeout` seconds.
     """
 
     def __init__(
@@ -61,150 +142,471 @@ class ChromaDatabaseService(AbstractDatabaseService):
             settings=Settings(anonymized_telemetry=False, allow_reset=True),
         )
         self.config = config
-        self.similarity_function = self._get_db_value(DistanceFunction.COSINE)
+        self.similarity_function = self._get_db_value(DistanceFunction(config.distance))
+        self.query_cache: TTLCache[Hashable, tuple[Document, ...]] = TTLCache(
+            max_size=config.query_cache_size, ttl=config.query_cache_ttl
+        )
+        self.executor = BlockingExecutor(
+            max_workers=config.max_workers,
+            timeout=config.timeout,
+            name="insightvault-database",
+        )
         self.logger.debug("Database initialized")
 
     async def add_documents(
         self, documents: list[Document], collection_name: str = DEFAULT_COLLECTION_NAME
     ) -> None:
         """Add a list of documents to the database. The documents must have
-        embeddings.
+        embeddings. Documents with an id that already exists are replaced.
+
+        The embeddings are passed to Chroma as one float32 array, so no Python
+        float objects are created for NumPy embeddings.
         """
         if not documents:
             self.logger.warning("No documents to add to the database")
 
-        collection = self.client.get_or_create_collection(
-            name=collection_name, metadata={"hnsw:space": self.similarity_function}
+        distance = DistanceFunction(
+            self.config.for_collection(collection_name).distance
+        )
+        collection = await self.executor.run(
+            self.client.get_or_create_collection,
+            name=collection_name,
+            metadata={"hnsw:space": self._get_db_value(distance)},
         )
 
-        collection.add(
+        await self.executor.run(
+            collection.upsert,
             ids=[doc.id for doc in documents],
             documents=[doc.content for doc in documents],
             metadatas=[doc.metadata for doc in documents],
-            embeddings=[doc.embedding for doc in documents],  # type: ignore
+            embeddings=np.array(
+                [np.asarray(doc.embedding, dtype=np.float32) for doc in documents],
+                dtype=np.float32,
+            ),
         )
+        self.query_cache.clear()
         self.logger.debug(f"Added {len(documents)} documents to the database")
 
     async def query(
         self,
-        query_embedding: Sequence[float],
+        query_embedding: Embedding,
         collection_name: str = DEFAULT_COLLECTION_NAME,
         filter_docs: bool = True,
+        query_filter: QueryFilter | None = None,
     ) -> list[Document]:
-        """Query the database for documents similar to the query embedding"""
-
-        try:
-            collection = self.client.get_collection(name=collection_name)
-        except Exception as e:
-            self.logger.error(f"Error getting collection: {e}")
-            return []
+        """Query the database for documents similar to the query embedding
+
+        The `query_filter` is passed to Chroma as `where` and `where_document`
+        filters. With `filter_docs`, the query first fetches only the ids and
+        distances of `max_num_results * query_overfetch` candidates. The larger
+        candidate list improves the recall of the approximate search at little
+        cost. Contents and metadatas are then fetched only for the best candidates
+        within `result_threshold`.
+        """
 
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            include=["documents", "metadatas", "distances"],  # type: ignore[list-item]
-            n_results=self.config.max_num_results,
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        settings = self.config.for_collection(collection_name)
+        cache_key = (
+            collection_name,
+            query_vector.tobytes(),
+            settings.max_num_results,
+            settings.result_threshold,
+            filter_docs,
+            query_filter,
+        )
+        cached = self.query_cache.get(cache_key)
+        if cached is not None:
+            self.logger.debug(f"Found {len(cached)} cached documents")
+            return [doc.model_copy(deep=True) for doc in cached]
+
+        [documents] = await self.query_many(
+            query_vector[np.newaxis],
+            collection_name=collection_name,
+            filter_docs=filter_docs,
+            query_filter=query_filter,
+        )
+        # Callers get their own copies, so changing them cannot alter the cache
+        self.query_cache.set(
+            cache_key, tuple(doc.model_copy(deep=True) for doc in documents)
         )
+        return documents
+
+    async def query_many(
+        self,
+        query_embeddings: Sequence[Embedding] | npt.NDArray[np.float32],
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+        filter_docs: bool = True,
+        query_filter: QueryFilter | None = None,
+    ) -> list[list[Document]]:
+        """Query the database for each of the query embeddings
+
+        All embeddings are sent to Chroma in a single query. With `filter_docs`,
+        the contents and metadatas of the kept candidates of all queries are then
+        fetched with a single `get`. Results are not cached, use `query()` for
+        repeated single queries.
 
-        # Filter the documents based on the distance
-        if filter_docs:
+        The number of results and the threshold can be overridden per collection in
+        `config.collections`. The `distance` of the returned documents is their
+        cosine distance to the query.
+
+        Returns:
+            The documents of each query, in the order of the query embeddings
+        """
+        query_vectors = np.asarray(query_embeddings, dtype=np.float32)
+        if len(query_vectors) == 0:
+            return []
+
+        collection = await self._get_collection(collection_name)
+        if collection is None:
+            return [[] for _ in range(len(query_vectors))]
+
+        settings = self.config.for_collection(collection_name)
+        distance = self._distance(collection)
+        if not filter_docs:
+            results = await self.executor.run(
+                collection.query,
+                query_embeddings=query_vectors,
+                include=["documents", "metadatas", "distances"],
+                n_results=settings.max_num_results,
+                where=self._where(query_filter),
+                where_document=self._where_document(query_filter),
+            )
+            documents = [
+                self._to_documents(
+                    ids,
+                    contents,
+                    metadatas,
+                    self._cosine_distances(
+                        np.asarray(distances, dtype=np.float32), distance
+                    ).tolist(),
+                )
+                for ids, contents, metadatas, distances in zip(
+                    results["ids"],
+                    results["documents"] or [[] for _ in results["ids"]],
+                    results["metadatas"] or [[] for _ in results["ids"]],
+                    results["distances"] or [[] for _ in results["ids"]],
+                    strict=True,
+                )
+            ]
+        else:
+            results = await self.executor.run(
+                collection.query,
+                query_embeddings=query_vectors,
+                include=["distances"],
+                n_results=settings.max_num_results * settings.query_overfetch,
+                where=self._where(query_filter),
+                where_document=self._where_document(query_filter),
+            )
             self.logger.debug(
-                f"Filtering documents with threshold: {self.config.result_threshold}"
+                f"Filtering documents with threshold: {settings.result_threshold}"
             )
             results = self._filter_docs(
-                results=results, threshold=self.config.result_threshold
+                results=results, threshold=settings.result_threshold, distance=distance
             )
-
-        documents = []
-        if results and results["documents"]:
-            for i, content in enumerate(results["documents"][0]):
-                metadata = results["metadatas"][0][i]  # type: ignore
-                doc_id = results["ids"][0][i]
-                documents.append(
-                    Document(
-                        id=doc_id,
-                        title=str(metadata.get("title", "Unknown")),
-                        content=content,
-                        metadata=metadata,
+            kept = [
+                list(
+                    zip(
+                        ids,
+                        self._cosine_distances(
+                            np.asarray(distances, dtype=np.float32), distance
+                        ).tolist(),
+                        strict=True,
                     )
+                )[: settings.max_num_results]
+                for ids, distances in zip(
+                    results["ids"], results["distances"], strict=True
                 )
-
-        self.logger.debug(f"Found {len(documents)} documents in the database")
+            ]
+            found = {
+                document.id: document
+                for document in await self._get_by_ids(
+                    collection,
+                    list(dict.fromkeys(doc_id for hits in kept for doc_id, _ in hits)),
+                )
+            }
+            # Queries can share documents, each gets its own copy with a distance
+            documents = [
+                [
+                    found[doc_id].model_copy(update={"distance": cosine_distance})
+                    for doc_id, cosine_distance in hits
+                    if doc_id in found
+                ]
+                for hits in kept
+            ]
+
+        self.logger.debug(
+            f"Found {sum(len(docs) for docs in documents)} documents in the database "
+            f"for {len(documents)} queries"
+        )
         return documents
 
     async def get_documents(
-        self, collection_name: str = DEFAULT_COLLECTION_NAME
+        self,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+        limit: int | None = None,
+        offset: int = 0,
+        include: Sequence[DocumentField] = ("documents", "metadatas"),
     ) -> list[Document] | None:
-        """List all documents in the database"""
+        """List the documents in the database
 
-        try:
-            collection = self.client.get_collection(name=collection_name)
-        except Exception as e:
-            self.logger.error(f"Error getting collection: {e}")
+        Prefer `iter_documents()` for large collections, this loads all requested
+        documents into memory.
+        """
+        documents = [
+            document
+            async for document in self.iter_documents(
+                collection_name, limit=limit, offset=offset, include=include
+            )
+        ]
+        self.logger.debug(f"Found {len(documents)} documents in the database")
+        return documents
+
+    async def iter_documents(
+        self,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+        limit: int | None = None,
+        offset: int = 0,
+        include: Sequence[DocumentField] = ("documents", "metadatas"),
+    ) -> AsyncIterator[Document]:
+        """Lazily yield the documents in the database, one page at a time
+
+        Documents are fetched in pages of `config.page_size`, so only one page is
+        held in memory. Without `documents` in `include`, the contents are not
+        fetched and left empty.
+
+        Args:
+            collection_name: The collection to list
+            limit: Maximum number of documents, None for all
+            offset: Number of documents to skip
+            include: The fields to fetch, `documents` and/or `metadatas`
+        """
+        collection = await self._get_collection(collection_name)
+        if collection is None:
+            return
+
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_size = (
+                self.config.page_size
+                if remaining is None
+                else min(self.config.page_size, remaining)
+            )
+            response = await self.executor.run(
+                collection.get, limit=page_size, offset=offset, include=list(include)
+            )
+            ids = response["ids"]
+            if not ids:
+                return
+
+            for document in self._to_documents(
+                ids,
+                response.get("documents") or [""] * len(ids),
+                response.get("metadatas") or [{}] * len(ids),
+            ):
+                yield document
+
+            offset += len(ids)
+            if remaining is not None:
+                remaining -= len(ids)
+            if len(ids) < page_size:
+                return
+
+    async def get_documents_by_ids(
+        self, ids: list[str], collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> list[Document]:
+        """Get the documents with the given ids, in the order of the ids
+
+        Ids that are not in the database are skipped.
+        """
+        if not ids:
             return []
 
-        response = collection.get()
+        collection = await self._get_collection(collection_name)
+        if collection is None:
+            return []
 
-        documents = []
-        response_ids = response.get("ids")
-        response_contents = response.get("documents")
-        response_metadatas = response.get("metadatas")
+        return await self._get_by_ids(collection, ids)
 
-        if response_ids and response_contents and response_metadatas:
-            for doc_id, content, metadata in zip(
-                response_ids, response_contents, response_metadatas, strict=False
-            ):
-                documents.append(
-                    Document(
-                        id=doc_id,
-                        title=str(metadata.get("title", "Unknown")),
-                        content=content,
-                        metadata=metadata,
-                    )
-                )
+    async def update_metadata(
+        self,
+        metadatas: Mapping[str, Mapping[str, Any]],
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> None:
+        """Replace the metadata of the documents, keyed by id
 
-        self.logger.debug(f"Found {len(documents)} documents in the database")
-        return documents
+        Contents and embeddings are kept. Ids that are not in the database are
+        ignored.
+        """
+        if not metadatas:
+            return
+
+        collection = await self._get_collection(collection_name)
+        if collection is None:
+            return
+
+        await self.executor.run(
+            collection.update,
+            ids=list(metadatas),
+            metadatas=[dict(metadata) for metadata in metadatas.values()],
+        )
+        self.query_cache.clear()
+        self.logger.debug(f"Updated the metadata of {len(metadatas)} documents")
+
+    async def delete_documents(
+        self, ids: list[str], collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
+        """Delete the documents with the given ids from the database"""
+        if not ids:
+            return
+
+        collection = await self._get_collection(collection_name)
+        if collection is None:
+            return
+
+        await self.executor.run(collection.delete, ids=ids)
+        self.query_cache.clear()
+        self.logger.debug(f"Deleted {len(ids)} documents from the database")
 
     async def delete_all_documents(
         self, collection_name: str = DEFAULT_COLLECTION_NAME
     ) -> None:
         """Delete all documents in the database"""
 
-        self.client.delete_collection(name=collection_name)
+        await self.executor.run(self.client.delete_collection, name=collection_name)
+        self.query_cache.clear()
         self.logger.debug("Deleted all documents in the database")
 
-    def _filter_docs(self, results: Any, threshold: float = 0.9) -> Any:
-        """Filter the documents based on the distance"""
-        ids_to_keep = []
-        embeddings_to_keep = []
-        documents_to_keep = []
-        data_to_keep = []
-        metadatas_to_keep = []
-
-        # We don't need the distances after filtering
-        for i in range(len(results["documents"][0])):
-            if results["distances"][0][i] < threshold:
-                continue
-            documents_to_keep.append(results["documents"][0][i])
-            embeddings_to_keep.append(results["embeddings"][0][i]) if results[
-                "embeddings"
-            ] else None
-            metadatas_to_keep.append(results["metadatas"][0][i]) if results[
-                "metadatas"
-            ] else None
-            ids_to_keep.append(results["ids"][0][i]) if results["ids"] else None
-            data_to_keep.append(results["data"][0][i]) if results["data"] else None
-
-        return {
-            "ids": [ids_to_keep],
-            "documents": [documents_to_keep],
-            "metadatas": [metadatas_to_keep],
-            "embeddings": [embeddings_to_keep],
-            "data": [data_to_keep],
+    async def _get_collection(self, collection_name: str) -> "Collection | None":
+        """Returns the collection, or None if it cannot be loaded"""
+        try:
+            return await self.executor.run(
+                self.client.get_collection, name=collection_name
+            )
+        except TimeoutError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error getting collection: {e}")
+            return None
+
+    async def _get_by_ids(
+        self, collection: "Collection", ids: list[str]
+    ) -> list[Document]:
+        """Fetches the documents with the given ids, in the order of the ids"""
+        if not ids:
+            return []
+
+        response = await self.executor.run(
+            collection.get, ids=ids, include=["documents", "metadatas"]
+        )
+        found = {
+            document.id: document
+            for document in self._to_documents(
+                response["ids"],
+                response["documents"] or [],
+                response["metadatas"] or [],
+            )
         }
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def _to_documents(
+        self,
+        ids: list[str],
+        contents: list[str],
+        metadatas: list[Any],
+        distances: list[float] | None = None,
+    ) -> list[Document]:
+        """Builds documents from parallel lists of Chroma results"""
+        return [
+            Document(
+                id=doc_id,
+                title=str((metadata or {}).get("title", "Unknown")),
+                content=content or "",
+                metadata=metadata or {},
+                distance=distance,
+            )
+            for doc_id, content, metadata, distance in zip(
+                ids,
+                contents,
+                metadatas,
+                distances if distances else [None] * len(ids),
+                strict=True,
+            )
+        ]
+
+    def _where(self, query_filter: QueryFilter | None) -> "Where | None":
+        """Returns the Chroma metadata filter of the query filter"""
+        if query_filter is None:
+            return None
+        conditions: list[Where] = [
+            {key: value} for key, value in query_filter.metadata().items()
+        ]
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
+
+    def _where_document(
+        self, query_filter: QueryFilter | None
+    ) -> "WhereDocument | None":
+        """Returns the Chroma document filter of the query filter"""
+        if query_filter is None or query_filter.contains is None:
+            return None
+        return {"$contains": query_filter.contains}
+
+    def _filter_docs(
+        self, results: Any, threshold: float = 0.9, distance: str | None = None
+    ) -> Any:
+        """Keep the results within `threshold` cosine distance of their query
+
+        The distances of each query are compared as one array and only the kept
+        entries of the result lists are copied, so the work scales with the kept
+        results.
+        """
+        kept = [
+            np.flatnonzero(
+                self._cosine_distances(
+                    np.asarray(distances, dtype=np.float32), distance
+                )
+                <= threshold
+            ).tolist()
+            for distances in results["distances"]
+        ]
+
+        filtered = dict(results)
+        for key in QUERY_RESULT_KEYS:
+            values = results.get(key)
+            if values and values[0] is not None:
+                filtered[key] = [
+                    [row[i] for i in indices]
+                    for row, indices in zip(values, kept, strict=True)
+                ]
+        return filtered
+
+    def _cosine_distances(
+        self, distances: npt.NDArray[np.float32], distance: str | None = None
+    ) -> npt.NDArray[np.float32]:
+        """Converts Chroma distances of unit embeddings to cosine distances
+
+        Chroma returns `1 - cos` for cosine, `1 - dot` for inner product and the
+        squared euclidean distance `2 - 2 cos` for l2. The distance function
+        defaults to `similarity_function`.
+        """
+        if (distance or self.similarity_function) == self._get_db_value(
+            DistanceFunction.L2
+        ):
+            return distances / np.float32(2)
+        return distances
+
+    def _distance(self, collection: "Collection") -> str:
+        """Returns the distance function the collection was created with"""
+        distance = (collection.metadata or {}).get("hnsw:space")
+        return distance if isinstance(distance, str) else self.similarity_function
 
     def _get_db_value(self, distance: DistanceFunction) -> str:
         if distance == DistanceFunction.COSINE:
             return "cosine"
         elif distance == DistanceFunction.L2:
             return "l2"
+        elif distance == DistanceFunction.INNER_PRODUCT:
+            return "ip"
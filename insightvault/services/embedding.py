@@ -1,10 +1,22 @@
 import asyncio
 from logging import Logger
+from typing import TYPE_CHECKING
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
+import numpy.typing as npt
 
 from ..models.config import EmbeddingConfig
+from ..utils.executor import BlockingExecutor
+from ..utils.lazy import LazyImport
 from ..utils.logging import get_logger
+from .embedding_cache import EmbeddingCache
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+else:
+    SentenceTransformer = LazyImport("sentence_transformers", "SentenceTransformer")
+
+PendingQuery = tuple[str, asyncio.Future[npt.NDArray[np.float32]]]
 
 
 class EmbeddingService:
@@ -16,7 +28,8 @@ class EmbeddingService:
     Attributes:
         config: The configuration for the embedding service
         client: The embedding model client
-        loading_task: The task that loads the embedding model
+        cache: The persistent embedding cache, None if it is disabled
+        executor: The thread pool that runs the encoder
         logger: The logger for the embedding service
     """
 
@@ -24,10 +37,31 @@ class EmbeddingService:
         self.logger: Logger = get_logger("insightvault.services.embedding")
         self.config = config
         self.client: SentenceTransformer | None = None
+        self.cache: EmbeddingCache | None = (
+            EmbeddingCache(config=config) if config.cache_enabled else None
+        )
+        self.executor = BlockingExecutor(
+            max_workers=config.max_workers,
+            timeout=config.timeout,
+            name="insightvault-embedding",
+        )
+        self._pending_queries: list[PendingQuery] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._batch_tasks: set[asyncio.Task[None]] = set()
+        self._init_lock = asyncio.Lock()
 
     async def init(self) -> None:
-        """Initialize the embedding service"""
-        self.client = await asyncio.to_thread(SentenceTransformer, self.config.model)
+        """Initialize the embedding service. The model is only loaded once, also
+        when apps sharing the service are initialized concurrently.
+        """
+        if self.client is not None:
+            return
+        async with self._init_lock:
+            if self.client is not None:
+                return
+            self.client = await asyncio.to_thread(
+                SentenceTransformer, self.config.model
+            )
         self.logger.debug(f"Embedding model loaded `{self.config.model}`!")
 
     async def embed(self, texts: list[str]) -> list[list[float]]:
@@ -39,15 +73,133 @@ class EmbeddingService:
         Returns:
             List of embedding vectors (as lists of floats)
         """
+        embeddings = await self._embed(texts)
+
+        # Convert numpy arrays to lists for JSON serialization
+        return [embedding.tolist() for embedding in embeddings]
+
+    async def embed_query(self, query: str) -> npt.NDArray[np.float32]:
+        """Generate the embedding of a single query
+
+        Queries from concurrent callers are coalesced. A batch is encoded once
+        `config.coalesce_window` seconds have passed since its first query, or as
+        soon as it holds `config.coalesce_max_batch_size` queries. Each caller then
+        receives its own row of the batch.
+
+        Args:
+            query: The query text to embed
+
+        Returns:
+            The float32 embedding vector of the query
+        """
+        if self.config.coalesce_window <= 0:
+            embeddings = await self.embed_array([query])
+            embedding: npt.NDArray[np.float32] = embeddings[0]
+            return embedding
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[npt.NDArray[np.float32]] = loop.create_future()
+        self._pending_queries.append((query, future))
+        if len(self._pending_queries) >= self.config.coalesce_max_batch_size:
+            self._flush_queries()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                self.config.coalesce_window, self._flush_queries
+            )
+        return await future
+
+    async def embed_array(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        """Generate embeddings for a list of texts as a single float32 array
+
+        The texts are encoded in batches of `config.batch_size`. The encoder sorts
+        the texts by length before batching, so passing many texts at once gives
+        full batches with little padding. If the cache is enabled, only texts that
+        are not cached are encoded.
 
+        Args:
+            texts: List of text strings to embed
+
+        Returns:
+            C-contiguous float32 array with one embedding vector per row
+        """
+        embeddings = await self._embed(texts)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def _flush_queries(self) -> None:
+        """Start encoding the pending queries as one batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending_queries = self._pending_queries, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._embed_queries(batch))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _embed_queries(self, batch: list[PendingQuery]) -> None:
+        """Encode a batch of queries and resolve the futures of their callers"""
+        self.logger.debug(f"Embedding a coalesced batch of {len(batch)} queries")
+        try:
+            embeddings = await self.embed_array([query for query, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings, strict=True):
+            if not future.done():
+                future.set_result(embedding)
+
+    async def _embed(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        """Generate embeddings, using the cache if it is enabled"""
         self.logger.debug(f"Embedding {len(texts)} texts...")
 
+        if self.cache is None:
+            return await self.executor.run(self._encode, texts)
+
+        cached = await self._embed_cached(texts, self.cache)
+        return np.stack(cached) if cached else np.empty((0, 0), np.float32)
+
+    async def _embed_cached(
+        self, texts: list[str], cache: EmbeddingCache
+    ) -> list[npt.NDArray[np.float32]]:
+        """Embed texts, only encoding the ones that are not in the cache"""
+        # The cache reads and writes memory-mapped files, off the event loop
+        cached = await self.executor.run(cache.get_many, texts)
+        missing = list(
+            dict.fromkeys(
+                text
+                for text, embedding in zip(texts, cached, strict=True)
+                if embedding is None
+            )
+        )
+        encoded: dict[str, npt.NDArray[np.float32]] = {}
+        if missing:
+            embeddings = await self.executor.run(self._encode, missing)
+            await self.executor.run(cache.put_many, missing, embeddings)
+            await self.executor.run(cache.flush)
+            encoded = dict(zip(missing, embeddings, strict=True))
+
+        self.logger.debug(
+            f"Embedding cache: {len(texts) - len(missing)} of {len(texts)} cached "
+            f"({cache.hits} hits, {cache.misses} misses in total)"
+        )
+        return [
+            encoded[text] if embedding is None else embedding
+            for text, embedding in zip(texts, cached, strict=True)
+        ]
+
+    def _encode(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        """Encode texts with the embedding model. This call blocks."""
         if not self.client:
             raise RuntimeError("Embedding model is not loaded! Call `init()` first.")
 
-        embeddings = self.client.encode(
-            texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True
+        return self.client.encode(
+            texts,
+            batch_size=self.config.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
         )
-
-        # Convert numpy arrays to lists for JSON serialization
-        return [embedding.tolist() for embedding in embeddings]
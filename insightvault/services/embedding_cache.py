@@ -0,0 +1,185 @@
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from ..models.config import EmbeddingConfig
+from ..utils.hashing import content_hash
+from ..utils.logging import get_logger
+
+KEY_DTYPE = "S64"
+
+
+class EmbeddingCache:
+    """Persistent, size-bounded cache of embedding vectors
+
+    Vectors are stored per embedding model in a directory below `cache_path`. Each
+    directory holds three memory-mapped arrays with one row per slot:
+
+    - `vectors.npy`: the float32 embedding vectors
+    - `keys.npy`: the SHA-256 of the embedded text
+    - `ticks.npy`: the logical time of the last access, 0 for empty slots
+
+    When all slots are taken, the least recently used entries are evicted. The
+    files may be shared with other processes, so the key of a slot is checked on
+    every hit. The methods are thread-safe and may be called from a thread pool.
+
+    Attributes:
+        path: The directory of the cache for the configured model
+        max_entries: Maximum number of cached vectors
+        hits: Number of texts found in the cache
+        misses: Number of texts not found in the cache
+    """
+
+    def __init__(self, config: EmbeddingConfig) -> None:
+        self.logger = get_logger("insightvault.services.embedding_cache")
+        model_dir = re.sub(r"[^A-Za-z0-9_.-]", "_", config.model)
+        self.path = Path(config.cache_path) / model_dir
+        self.max_entries = config.cache_max_entries
+        self.hits = 0
+        self.misses = 0
+        self._vectors: np.ndarray | None = None
+        self._keys: np.ndarray | None = None
+        self._ticks: np.ndarray | None = None
+        self._slots: dict[bytes, int] = {}
+        self._clock = 0
+        self._lock = threading.Lock()
+        self._open()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def get_many(self, texts: list[str]) -> list[npt.NDArray[np.float32] | None]:
+        """Returns the cached vector of each text, or None if it is not cached"""
+        results: list[npt.NDArray[np.float32] | None] = []
+        with self._lock:
+            for text in texts:
+                slot = self._slot(self._key(text))
+                if slot is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                vectors, _, ticks = self._arrays()
+                self.hits += 1
+                ticks[slot] = self._tick()
+                results.append(np.array(vectors[slot]))
+        return results
+
+    def put_many(self, texts: list[str], vectors: npt.ArrayLike) -> None:
+        """Stores the vectors of the texts, evicting old entries if needed"""
+        if not texts:
+            return
+        array = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self._vectors is None:
+                self._create(dim=array.shape[1])
+            vectors_, keys, ticks = self._arrays()
+
+            entries = {self._key(text): i for i, text in enumerate(texts)}
+            new_keys = [key for key in entries if self._slot(key) is None]
+            free_slots = self._take_slots(len(new_keys))
+            for key, slot in zip(new_keys, free_slots, strict=False):
+                self._slots[key] = slot
+                keys[slot] = key
+            for key, i in entries.items():
+                cached_slot = self._slots.get(key)
+                if cached_slot is None:
+                    continue
+                vectors_[cached_slot] = array[i]
+                ticks[cached_slot] = self._tick()
+
+    def flush(self) -> None:
+        """Writes pending changes of the memory-mapped arrays to disk"""
+        with self._lock:
+            for array in (self._vectors, self._keys, self._ticks):
+                if isinstance(array, np.memmap):
+                    array.flush()
+
+    def _slot(self, key: bytes) -> int | None:
+        """Returns the slot of a key, None if the key is not cached
+
+        Another process may have reused the slot for another key since it was
+        recorded, such a slot is forgotten.
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        _, keys, _ = self._arrays()
+        if keys[slot] != key:
+            del self._slots[key]
+            return None
+        return slot
+
+    def _take_slots(self, count: int) -> list[int]:
+        """Returns up to `count` slots for new entries, evicting the oldest"""
+        _, keys, ticks = self._arrays()
+        count = min(count, self.max_entries)
+        free: list[int] = np.flatnonzero(ticks == 0)[:count].tolist()
+        missing = count - len(free)
+        if missing > 0:
+            used = np.flatnonzero(ticks)
+            oldest = used[np.argpartition(ticks[used], missing - 1)[:missing]]
+            for slot in oldest.tolist():
+                self._slots.pop(bytes(keys[slot]), None)
+                ticks[slot] = 0
+            free.extend(oldest.tolist())
+            self.logger.debug(f"Evicted {missing} entries from the embedding cache")
+        return free
+
+    def _open(self) -> None:
+        """Opens the cache files of the model if they exist"""
+        vectors_path = self.path / "vectors.npy"
+        if not vectors_path.exists():
+            return
+        vectors = np.load(vectors_path, mmap_mode="r+")
+        if vectors.shape[0] != self.max_entries:
+            self.logger.warning(
+                "Embedding cache size changed, discarding the cached vectors"
+            )
+            return
+        self._vectors = vectors
+        self._keys = np.load(self.path / "keys.npy", mmap_mode="r+")
+        self._ticks = np.load(self.path / "ticks.npy", mmap_mode="r+")
+        used = np.flatnonzero(self._ticks)
+        self._slots = {bytes(self._keys[slot]): int(slot) for slot in used}
+        self._clock = int(self._ticks.max(initial=0))
+        self.logger.debug(f"Opened embedding cache with {len(self._slots)} entries")
+
+    def _create(self, dim: int) -> None:
+        """Creates empty cache files for vectors of the given dimension"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        open_memmap = np.lib.format.open_memmap
+        self._vectors = open_memmap(
+            self.path / "vectors.npy",
+            mode="w+",
+            dtype=np.float32,
+            shape=(self.max_entries, dim),
+        )
+        self._keys = open_memmap(
+            self.path / "keys.npy",
+            mode="w+",
+            dtype=KEY_DTYPE,
+            shape=(self.max_entries,),
+        )
+        self._ticks = open_memmap(
+            self.path / "ticks.npy",
+            mode="w+",
+            dtype=np.uint64,
+            shape=(self.max_entries,),
+        )
+        self._slots = {}
+
+    def _arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the vectors, keys and ticks arrays of the cache"""
+        if self._vectors is None or self._keys is None or self._ticks is None:
+            raise RuntimeError("Embedding cache is empty! Store vectors first.")
+        return self._vectors, self._keys, self._ticks
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def _key(self, text: str) -> bytes:
+        return content_hash(text).encode("ascii")
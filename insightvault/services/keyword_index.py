@@ -0,0 +1,224 @@
+import functools
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+
+from ..constants import DEFAULT_COLLECTION_NAME
+from ..models.config import DatabaseConfig
+from ..models.document import Document
+from ..utils.logging import get_logger
+
+TERM_PATTERN = re.compile(r"\w+(?:[\-.:/#]\w+)*")
+SQLITE_MAX_VARIABLES = 500
+
+# Rows of contentless FTS5 tables can only be deleted since SQLite 3.43
+CONTENTLESS_DELETE = sqlite3.sqlite_version_info >= (3, 43, 0)
+
+# The terms table is contentless, the chunk contents are stored by the database
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    UNIQUE (collection, doc_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(
+    content, content=''{", contentless_delete=1" if CONTENTLESS_DELETE else ""}
+);
+"""
+
+
+@functools.cache
+def fts5_available() -> bool:
+    """Whether the SQLite library of Python was built with FTS5"""
+    connection = sqlite3.connect(":memory:")
+    try:
+        connection.execute("CREATE VIRTUAL TABLE probe USING fts5(content)")
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+    return True
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> list[str]:
+    """Fuses rankings of ids by the sum of `1 / (k + rank)` over the rankings
+
+    Ties keep the order in which the ids first appear.
+    """
+    scores: dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+
+
+class KeywordIndexService:
+    """Persistent inverted index of the document contents, searched with BM25
+
+    The index is a SQLite FTS5 table stored next to the database. It maps the terms
+    of each chunk to the chunk id, so exact identifiers, error codes and part
+    numbers that dense retrieval misses can be found by keyword. Queries are split
+    into terms, and terms with separators such as `ERR-1234` are matched as
+    phrases.
+
+    The FTS5 table is contentless, so the chunk contents are not stored twice.
+    Its rows are mapped to the chunk ids by a separate table, and a re-indexed
+    chunk gets a new row. With SQLite before 3.43, the terms of removed rows stay
+    in the FTS5 table until all collections are deleted, but no longer match.
+
+    BM25 statistics are shared by all collections.
+
+    Attributes:
+        path: The path of the SQLite file
+    """
+
+    def __init__(self, config: DatabaseConfig) -> None:
+        self.logger = get_logger("insightvault.services.keyword_index")
+        db_path = Path(config.path)
+        self.path = db_path.with_name(f"{db_path.name}.keywords.sqlite")
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def add_documents(
+        self,
+        documents: Sequence[Document],
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> None:
+        """Index the contents of the documents. Existing ids are re-indexed."""
+        if not documents:
+            return
+
+        unique = {doc.id: doc for doc in documents}
+        with self._lock, self._connect() as connection:
+            self._remove(
+                connection, self._rows(connection, list(unique), collection_name)
+            )
+            connection.executemany(
+                "INSERT INTO documents (collection, doc_id) VALUES (?, ?)",
+                [(collection_name, doc_id) for doc_id in unique],
+            )
+            rows = self._rows(connection, list(unique), collection_name)
+            connection.executemany(
+                "INSERT INTO terms (rowid, content) VALUES (?, ?)",
+                [(rows[doc.id], doc.content) for doc in unique.values()],
+            )
+        self.logger.debug(f"Indexed {len(unique)} documents")
+
+    def delete_documents(
+        self, ids: Sequence[str], collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
+        """Remove the documents with the given ids from the index"""
+        if not ids or not self._exists():
+            return
+
+        with self._lock, self._connect() as connection:
+            self._remove(connection, self._rows(connection, ids, collection_name))
+        self.logger.debug(f"Removed {len(ids)} documents from the index")
+
+    def delete_collection(self, collection_name: str = DEFAULT_COLLECTION_NAME) -> None:
+        """Remove all documents of a collection from the index"""
+        if not self._exists():
+            return
+
+        with self._lock, self._connect() as connection:
+            if CONTENTLESS_DELETE:
+                connection.execute(
+                    "DELETE FROM terms WHERE rowid IN "
+                    "(SELECT id FROM documents WHERE collection = ?)",
+                    (collection_name,),
+                )
+            connection.execute(
+                "DELETE FROM documents WHERE collection = ?", (collection_name,)
+            )
+            if connection.execute("SELECT 1 FROM documents LIMIT 1").fetchone() is None:
+                connection.execute("INSERT INTO terms (terms) VALUES ('delete-all')")
+        self.logger.debug(f"Removed collection `{collection_name}` from the index")
+
+    def is_empty(self, collection_name: str = DEFAULT_COLLECTION_NAME) -> bool:
+        """Whether no document of the collection is indexed"""
+        if not self._exists():
+            return True
+
+        with self._lock:
+            cursor = self._connect().execute(
+                "SELECT 1 FROM documents WHERE collection = ? LIMIT 1",
+                (collection_name,),
+            )
+            return cursor.fetchone() is None
+
+    def search(
+        self, query: str, limit: int, collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> list[str]:
+        """Returns the ids of the documents matching any query term, best first
+
+        Documents are ranked by BM25. Returns an empty list if the query has no
+        terms or nothing was indexed yet.
+        """
+        match = self._match_expression(query)
+        if not match or limit <= 0 or not self._exists():
+            return []
+
+        with self._lock:
+            cursor = self._connect().execute(
+                "SELECT documents.doc_id FROM terms "
+                "JOIN documents ON documents.id = terms.rowid "
+                "WHERE terms MATCH ? AND documents.collection = ? "
+                "ORDER BY bm25(terms) LIMIT ?",
+                (match, collection_name, limit),
+            )
+            return [doc_id for (doc_id,) in cursor]
+
+    def close(self) -> None:
+        """Close the connection to the index"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _match_expression(self, query: str) -> str:
+        """Returns the FTS5 query matching any of the terms of the query"""
+        terms = dict.fromkeys(TERM_PATTERN.findall(query))
+        return " OR ".join(f'"{term}"' for term in terms)
+
+    def _rows(
+        self, connection: sqlite3.Connection, ids: Sequence[str], collection_name: str
+    ) -> dict[str, int]:
+        """Returns the row numbers of the indexed documents among the ids"""
+        rows: dict[str, int] = {}
+        for batch in self._batches(ids):
+            cursor = connection.execute(
+                "SELECT doc_id, id FROM documents WHERE collection = ? AND doc_id IN "
+                f"({', '.join('?' * len(batch))})",
+                (collection_name, *batch),
+            )
+            rows.update(cursor)
+        return rows
+
+    def _remove(self, connection: sqlite3.Connection, rows: dict[str, int]) -> None:
+        """Removes indexed rows, keyed by document id"""
+        params = [(row,) for row in rows.values()]
+        if CONTENTLESS_DELETE:
+            connection.executemany("DELETE FROM terms WHERE rowid = ?", params)
+        connection.executemany("DELETE FROM documents WHERE id = ?", params)
+
+    def _batches(self, ids: Sequence[str]) -> Iterator[Sequence[str]]:
+        """Yields the ids in batches below the SQLite variable limit"""
+        for start in range(0, len(ids), SQLITE_MAX_VARIABLES):
+            yield ids[start : start + SQLITE_MAX_VARIABLES]
+
+    def _exists(self) -> bool:
+        """Whether the index was created"""
+        return self._connection is not None or self.path.exists()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns the connection, creating the index on first use"""
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+            self.logger.debug(f"Opened keyword index `{self.path}`")
+        return self._connection
@@ -1,20 +1,29 @@
 import asyncio
+import time
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
 from logging import Logger
+from typing import TYPE_CHECKING, Any
 
-from ollama import AsyncClient, ChatResponse
-
+from ..models.config import LlmConfig
+from ..utils.lazy import LazyImport
 from ..utils.logging import get_logger
+from ..utils.tokens import estimate_tokens
+
+if TYPE_CHECKING:
+    from ollama import AsyncClient, ChatResponse
+else:
+    AsyncClient = LazyImport("ollama", "AsyncClient")
 
 
 class AbstractLLMService(ABC):
     @abstractmethod
-    def __init__(self, model_name: str) -> None:
+    def __init__(self, config: LlmConfig) -> None:
         """
         Configure the LLM service with the necessary settings.
 
         Args:
-            model_name (str): The name of the model to use.
+            config (LlmConfig): The model and its settings.
         """
 
     @abstractmethod
@@ -24,72 +33,215 @@ class AbstractLLMService(ABC):
         """
 
     @abstractmethod
-    async def query(self, prompt: str) -> str | None:
+    async def query(self, prompt: str, system: str | None = None) -> str | None:
         """Generate a one-off response from the model without chat history."""
 
     @abstractmethod
-    async def chat(self, prompt: str) -> str | None:
+    def stream_query(
+        self, prompt: str, system: str | None = None
+    ) -> AsyncIterator[str]:
+        """Generate a one-off response from the model, yielding it piece by piece."""
+
+    @abstractmethod
+    async def chat(self, prompt: str, system: str | None = None) -> str | None:
         """Generate a response from the model while maintaining chat history."""
 
+    @abstractmethod
+    def stream_chat(
+        self,
+        prompt: str,
+        history_prompt: str | None = None,
+        system: str | None = None,
+    ) -> AsyncIterator[str]:
+        """Generate a response with chat history, yielding it piece by piece."""
+
     @abstractmethod
     async def clear_chat_history(self) -> None:
         """Clear the chat history."""
 
 
 class BaseLLMService(AbstractLLMService):
-    def __init__(self, model_name: str) -> None:
+    def __init__(self, config: LlmConfig) -> None:
         """
         Configure base properties for the LLM service.
 
         Args:
-            model_name (str): The name of the model to use.
+            config (LlmConfig): The model and its settings. The chat history sent
+                with a prompt is trimmed to `config.history_max_tokens`.
         """
         self.logger: Logger = get_logger("insightvault.services.llm")
-        self.model_name: str = model_name
+        self.config = config
+        self.model_name: str = config.model
+        self.history_max_tokens = config.history_max_tokens
         self.chat_history: list[dict[str, str]] = []
+        self.time_to_first_token: float | None = None
+
+    def trimmed_history(self) -> list[dict[str, str]]:
+        """Returns the latest turns of the chat history that fit the token budget
+
+        Turns are dropped from the start as a whole, so the history never begins
+        with an answer.
+        """
+        budget = self.history_max_tokens
+        turns = [
+            self.chat_history[i : i + 2] for i in range(0, len(self.chat_history), 2)
+        ]
+        kept: list[list[dict[str, str]]] = []
+        for turn in reversed(turns):
+            budget -= sum(estimate_tokens(message["content"]) for message in turn)
+            if budget < 0:
+                break
+            kept.append(turn)
+        return [message for turn in reversed(kept) for message in turn]
+
+    def _messages(
+        self,
+        prompt: str,
+        system: str | None,
+        history: list[dict[str, str]] | None = None,
+    ) -> list[dict[str, str]]:
+        """Returns the messages of a request: system, history, then the prompt
+
+        The system message does not change between requests and the history only
+        grows at its end, so the model can reuse the cached start of the prompt.
+        """
+        messages = [] if system is None else [{"role": "system", "content": system}]
+        return [*messages, *(history or []), {"role": "user", "content": prompt}]
+
+    def _record_turn(self, prompt: str, response: str) -> None:
+        """Add a question and its answer to the chat history
+
+        The history is trimmed to the token budget, so it does not grow without
+        bound in long sessions.
+        """
+        self.chat_history.append({"role": "user", "content": prompt})
+        self.chat_history.append({"role": "assistant", "content": response})
+        self.chat_history = self.trimmed_history()
 
 
 class OllamaLLMService(BaseLLMService):
-    """Ollama LLM service"""
+    """Ollama LLM service
+
+    Every request asks Ollama to keep the model loaded for `config.keep_alive` and
+    passes the same options, including the context size `config.num_ctx`. A
+    changed context size makes Ollama reload the model, so it is set once in the
+    configuration. Ollama then reuses the loaded model and the cached start of
+    the prompt across requests.
+    """
 
-    def __init__(self, model_name: str = "llama3") -> None:
-        super().__init__(model_name)
+    def __init__(self, config: LlmConfig | None = None) -> None:
+        super().__init__(config or LlmConfig())
         self.client: AsyncClient | None = None
+        self._init_lock = asyncio.Lock()
+
+    @property
+    def options(self) -> dict[str, Any]:
+        """The model options sent with every request"""
+        options = dict(self.config.options)
+        if self.config.num_ctx is not None:
+            options["num_ctx"] = self.config.num_ctx
+        return options
 
     async def init(self) -> None:
-        """Initialize the LLM service"""
-        self.client = await asyncio.to_thread(AsyncClient)
+        """Initialize the LLM service. The client is only created once, also when
+        apps sharing the service are initialized concurrently.
+        """
+        if self.client is not None:
+            return
+        async with self._init_lock:
+            if self.client is not None:
+                return
+            self.client = await asyncio.to_thread(AsyncClient)
         self.logger.debug(f"LLM loaded `{self.model_name}`!")
 
     async def clear_chat_history(self) -> None:
         """Clear the chat history."""
         self.chat_history = []
 
-    async def query(self, prompt: str) -> str | None:
+    async def query(self, prompt: str, system: str | None = None) -> str | None:
         """Generate a one-off response from the model without chat history."""
         if not self.client:
             raise RuntimeError("LLM client is not loaded! Call `init()` first.")
 
         response: ChatResponse = await self.client.chat(
-            model=self.model_name,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
+            **self._request_args(self._messages(prompt, system))
         )
         return response.message.content
 
-    async def chat(self, prompt: str) -> str | None:
-        """Generate a response from the model while maintaining chat history."""
+    async def stream_query(
+        self, prompt: str, system: str | None = None
+    ) -> AsyncIterator[str]:
+        """Generate a one-off response from the model, yielding it piece by piece.
+
+        The seconds until the first piece arrived are stored in
+        `time_to_first_token`.
+        """
+        async for content in self._stream(self._messages(prompt, system)):
+            yield content
+
+    async def chat(self, prompt: str, system: str | None = None) -> str | None:
+        """Generate a response from the model while maintaining chat history.
+
+        The chat history, trimmed to `history_max_tokens`, is sent along with the
+        prompt.
+        """
         if not self.client:
             raise RuntimeError("LLM client is not loaded! Call `init()` first.")
 
-        self.chat_history.append({"role": "user", "content": prompt})
-
-        response: str | None = await self.query(prompt)
-        if response is None:
+        response: ChatResponse = await self.client.chat(
+            **self._request_args(self._messages(prompt, system, self.trimmed_history()))
+        )
+        content = response.message.content
+        if content is None:
             return "Error: No response from the model."
-        self.chat_history.append({"role": "assistant", "content": response})
-        return response
+        self._record_turn(prompt, content)
+        return content
+
+    async def stream_chat(
+        self,
+        prompt: str,
+        history_prompt: str | None = None,
+        system: str | None = None,
+    ) -> AsyncIterator[str]:
+        """Generate a response with chat history, yielding it piece by piece.
+
+        `history_prompt` is stored in the chat history instead of the prompt, so a
+        prompt with retrieved context can be recorded as the bare question. The
+        turn is recorded once the response is complete.
+        """
+        messages = self._messages(prompt, system, self.trimmed_history())
+        pieces = []
+        async for content in self._stream(messages):
+            pieces.append(content)
+            yield content
+        self._record_turn(
+            prompt if history_prompt is None else history_prompt, "".join(pieces)
+        )
+
+    def _request_args(self, messages: list[dict[str, str]]) -> dict[str, Any]:
+        """Returns the arguments of a chat request with the configured options"""
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "options": self.options or None,
+            "keep_alive": self.config.keep_alive,
+        }
+
+    async def _stream(self, messages: list[dict[str, str]]) -> AsyncIterator[str]:
+        """Stream the response to the messages and record the time to first token"""
+        if not self.client:
+            raise RuntimeError("LLM client is not loaded! Call `init()` first.")
+
+        self.time_to_first_token = None
+        start = time.perf_counter()
+        stream = await self.client.chat(**self._request_args(messages), stream=True)
+        async for part in stream:
+            content = part.message.content
+            if not content:
+                continue
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - start
+                self.logger.debug(
+                    f"Time to first token: {self.time_to_first_token:.3f}s"
+                )
+            yield content
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from ..constants import DEFAULT_COLLECTION_NAME
+from ..models.config import DatabaseConfig
+from ..models.ingestion import ManifestEntry
+from ..utils.logging import get_logger
+
+
+class ManifestService:
+    """Manifest of the ingested document sources
+
+    The manifest is a JSON file stored next to the database. For each collection it
+    maps the source of a document to a fingerprint of its content and the ids of its
+    chunks. It is used to skip unchanged documents and to find stale chunks when a
+    source is ingested again.
+
+    Attributes:
+        path: The path of the manifest file
+    """
+
+    def __init__(self, config: DatabaseConfig) -> None:
+        self.logger = get_logger("insightvault.services.manifest")
+        db_path = Path(config.path)
+        self.path = db_path.with_name(f"{db_path.name}.manifest.json")
+        self._collections: dict[str, dict[str, ManifestEntry]] | None = None
+        self._lock = threading.RLock()
+
+    def get(
+        self, source: str, collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> ManifestEntry | None:
+        """Returns the entry of a source, or None if it was never ingested"""
+        return self._load().get(collection_name, {}).get(source)
+
+    def set(
+        self,
+        source: str,
+        entry: ManifestEntry,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> None:
+        """Sets the entry of a source. Call `save()` to persist it."""
+        with self._lock:
+            self._load().setdefault(collection_name, {})[source] = entry
+
+    def delete_collection(self, collection_name: str = DEFAULT_COLLECTION_NAME) -> None:
+        """Removes all entries of a collection and persists the manifest"""
+        with self._lock:
+            if self._load().pop(collection_name, None) is not None:
+                self.save()
+
+    def save(self) -> None:
+        """Atomically writes the manifest to disk
+
+        Each save writes its own temporary file, which then replaces the manifest.
+        """
+        with self._lock:
+            data = {
+                collection_name: {
+                    source: entry.model_dump() for source, entry in entries.items()
+                }
+                for collection_name, entries in self._load().items()
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w",
+                encoding="utf-8",
+                dir=self.path.parent,
+                prefix=f"{self.path.name}.",
+                suffix=".tmp",
+                delete=False,
+            ) as file:
+                json.dump(data, file)
+            try:
+                os.replace(file.name, self.path)
+            except OSError:
+                os.unlink(file.name)
+                raise
+        self.logger.debug(f"Saved manifest `{self.path}`")
+
+    def _load(self) -> dict[str, dict[str, ManifestEntry]]:
+        """Lazily reads the manifest from disk"""
+        with self._lock:
+            if self._collections is None:
+                collections: dict[str, dict[str, ManifestEntry]] = {}
+                if self.path.exists():
+                    with open(self.path, encoding="utf-8") as file:
+                        data = json.load(file)
+                    collections = {
+                        collection_name: {
+                            source: ManifestEntry(**entry)
+                            for source, entry in entries.items()
+                        }
+                        for collection_name, entries in data.items()
+                    }
+                self._collections = collections
+            return self._collections
@@ -0,0 +1,786 @@
+import json
+import os
+import shutil
+import threading
+from collections.abc import AsyncIterator, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from ..constants import DEFAULT_COLLECTION_NAME
+from ..models.config import DatabaseConfig
+from ..models.database import (
+    DistanceFunction,
+    DocumentField,
+    QueryFilter,
+    validate_collection_name,
+)
+from ..models.document import Document, Embedding
+from ..utils.executor import BlockingExecutor
+from ..utils.logging import get_logger
+from .database import AbstractDatabaseService
+from .vector_index import QuantizedVectors, VectorIndex, normalize
+
+HEADER_FILE = "collection.json"
+# Deleted rows are kept until there are at least this many
+COMPACT_MIN_DELETED = 1024
+# The IVF lists are trained again once the collection has grown by this factor
+IVF_RETRAIN_FACTOR = 2
+MIN_CAPACITY = 1024
+
+
+class NumpyCollection:
+    """Append-only collection of the NumPy database
+
+    Rows are only ever appended. Replaced and deleted rows keep their place and are
+    marked as deleted until the collection is compacted. A query only reads the
+    rows of the index it started with, so concurrent writes never move the rows it
+    sees.
+
+    Attributes:
+        ids: The document id of each row
+        contents: The document content of each row
+        metadatas: The document metadata of each row
+        index: The vector index over the unit length embeddings of all rows
+        rows: The row of each document id that is not deleted
+        num_deleted: The number of deleted rows
+        header: The persisted layout of the collection, see `NumpyDatabaseService`
+    """
+
+    def __init__(self, index: VectorIndex, header: dict[str, Any]) -> None:
+        self.ids: list[str] = []
+        self.contents: list[str] = []
+        self.metadatas: list[dict[str, Any]] = []
+        self.index = index
+        self.rows: dict[str, int] = {}
+        self.num_deleted = 0
+        self.header = header
+        self._live = np.zeros(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def append(self, doc_id: str, content: str, metadata: dict[str, Any]) -> int | None:
+        """Appends a row and returns the row of the replaced document, if any
+
+        The replaced row is not deleted, so it stays visible until `delete()`.
+        """
+        replaced = self.rows.get(doc_id)
+        row = len(self.ids)
+        if row == len(self._live):
+            live = np.zeros(max(MIN_CAPACITY, 2 * row), dtype=bool)
+            live[:row] = self._live
+            self._live = live
+        self.ids.append(doc_id)
+        self.contents.append(content)
+        self.metadatas.append(metadata)
+        self._live[row] = True
+        self.rows[doc_id] = row
+        return replaced
+
+    def delete(self, row: int) -> None:
+        """Marks a row as deleted"""
+        if not self._live[row]:
+            return
+        self._live[row] = False
+        self.num_deleted += 1
+        if self.rows.get(self.ids[row]) == row:
+            del self.rows[self.ids[row]]
+
+    def live(self, num_rows: int) -> npt.NDArray[np.bool_] | None:
+        """Returns which of the first rows are not deleted, None if none is"""
+        if self.num_deleted == 0:
+            return None
+        return self._live[:num_rows].copy()
+
+    def live_rows(self) -> npt.NDArray[np.intp]:
+        """Returns the rows that are not deleted, in insertion order"""
+        return np.flatnonzero(self._live[: len(self.ids)])
+
+    def document(
+        self,
+        row: int,
+        include: Sequence[DocumentField] = ("documents", "metadatas"),
+        distance: float | None = None,
+    ) -> Document:
+        """Returns the document of a row, without its embedding
+
+        Fields missing from `include` are left empty.
+        """
+        metadata = self.metadatas[row]
+        return Document(
+            id=self.ids[row],
+            title=str(metadata.get("title", "Unknown")),
+            content=self.contents[row] if "documents" in include else "",
+            metadata=metadata if "metadatas" in include else {},
+            distance=distance,
+        )
+
+
+class NumpyDatabaseService(AbstractDatabaseService):
+    """In-process vector database backed by NumPy
+
+    Each collection is stored in a directory below `config.path`. Its rows are
+    appended to a raw float32 matrix of unit length embeddings (`vectors-*.f32`)
+    and a JSON lines log of their ids, contents and metadatas (`rows-*.jsonl`).
+    The log also records metadata updates and deleted rows. `collection.json`
+    names the current files and their committed number of rows and log size, it
+    is replaced last, so a write that fails halfway is truncated on the next
+    load. Writes therefore cost the size of the new rows, not of the collection.
+    Deleted rows are dropped by rewriting the files once they outnumber the live
+    rows.
+
+    Queries compute the cosine similarity to all rows with one matrix-vector
+    product. With `config.index` set to `ivf`, collections of at least
+    `config.ivf_min_size` rows are partitioned with k-means and a query only
+    searches the `config.ivf_num_probes` closest partitions. New rows are added
+    to the closest partitions, the partitions are trained again once the
+    collection has doubled.
+
+    With `config.quantization` set to `int8` or `binary`, the rows are also stored
+    as compact codes (`codes-*.bin` and `scales-*.f32`). Queries score the codes
+    and only read the full-precision rows of the best `config.rerank_factor`
+    candidates per result.
+
+    The vectors are normalized, so all distance functions rank alike and
+    `config.distance` is ignored. Thresholds are cosine distances and, like the
+    number of results, can be overridden per collection in `config.collections`.
+
+    Writes are serialized and swap in the extended index last, so queries running
+    concurrently see either the old or the new rows. Blocking work runs on a
+    thread pool of `config.max_workers` threads.
+    """
+
+    def __init__(self, config: DatabaseConfig) -> None:
+        self.logger = get_logger("insightvault.services.numpy_database")
+        self.config = config
+        self.path = Path(config.path) / "numpy"
+        self.similarity_function = self._get_db_value(DistanceFunction.COSINE)
+        self.executor = BlockingExecutor(
+            max_workers=config.max_workers,
+            timeout=config.timeout,
+            name="insightvault-numpy-database",
+        )
+        self._collections: dict[str, NumpyCollection] = {}
+        self._lock = threading.RLock()
+        self.logger.debug("Database initialized")
+
+    async def add_documents(
+        self, documents: list[Document], collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
+        """Add a list of documents to the database. The documents must have
+        embeddings. Documents with an id that already exists are replaced.
+        """
+        if not documents:
+            self.logger.warning("No documents to add to the database")
+            return
+
+        await self.executor.run(self._add, documents, collection_name)
+        self.logger.debug(f"Added {len(documents)} documents to the database")
+
+    async def query(
+        self,
+        query_embedding: Embedding,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+        filter_docs: bool = True,
+        query_filter: QueryFilter | None = None,
+    ) -> list[Document]:
+        """Query the database for documents similar to the query embedding
+
+        With `filter_docs`, documents with a cosine distance above
+        `config.result_threshold` are dropped. With `query_filter`, only matching
+        documents are searched.
+        """
+        [documents] = await self.query_many(
+            np.asarray(query_embedding, dtype=np.float32)[np.newaxis],
+            collection_name=collection_name,
+            filter_docs=filter_docs,
+            query_filter=query_filter,
+        )
+        return documents
+
+    async def query_many(
+        self,
+        query_embeddings: Sequence[Embedding] | npt.NDArray[np.float32],
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+        filter_docs: bool = True,
+        query_filter: QueryFilter | None = None,
+    ) -> list[list[Document]]:
+        """Query the database for each of the query embeddings
+
+        Exact searches score many queries with one matrix product, see
+        `VectorIndex.search_many()`.
+
+        Returns:
+            The documents of each query, in the order of the query embeddings
+        """
+        query_vectors = np.asarray(query_embeddings, dtype=np.float32)
+        if len(query_vectors) == 0:
+            return []
+
+        documents = await self.executor.run(
+            self._search, query_vectors, collection_name, filter_docs, query_filter
+        )
+        self.logger.debug(
+            f"Found {sum(len(docs) for docs in documents)} documents in the database "
+            f"for {len(documents)} queries"
+        )
+        return documents
+
+    async def get_documents(
+        self,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+        limit: int | None = None,
+        offset: int = 0,
+        include: Sequence[DocumentField] = ("documents", "metadatas"),
+    ) -> list[Document] | None:
+        """List the documents in the database
+
+        Prefer `iter_documents()` for large collections, this loads all requested
+        documents into memory.
+        """
+        documents = [
+            document
+            async for document in self.iter_documents(
+                collection_name, limit=limit, offset=offset, include=include
+            )
+        ]
+        self.logger.debug(f"Found {len(documents)} documents in the database")
+        return documents
+
+    async def iter_documents(
+        self,
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+        limit: int | None = None,
+        offset: int = 0,
+        include: Sequence[DocumentField] = ("documents", "metadatas"),
+    ) -> AsyncIterator[Document]:
+        """Lazily yield the documents in the database
+
+        The collection is held in memory, so documents are built one at a time as
+        they are consumed. Fields missing from `include` are left empty.
+
+        Args:
+            collection_name: The collection to list
+            limit: Maximum number of documents, None for all
+            offset: Number of documents to skip
+            include: The fields to return, `documents` and/or `metadatas`
+        """
+        collection = await self.executor.run(self._collection, collection_name)
+        if collection is None:
+            return
+
+        rows = collection.live_rows()
+        end = len(rows) if limit is None else offset + limit
+        for row in rows[offset:end].tolist():
+            yield collection.document(row, include)
+
+    async def get_documents_by_ids(
+        self, ids: list[str], collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> list[Document]:
+        """Get the documents with the given ids, in the order of the ids
+
+        Ids that are not in the database are skipped.
+        """
+        collection = await self.executor.run(self._collection, collection_name)
+        if collection is None:
+            return []
+
+        return [
+            collection.document(collection.rows[doc_id])
+            for doc_id in ids
+            if doc_id in collection.rows
+        ]
+
+    async def update_metadata(
+        self,
+        metadatas: Mapping[str, Mapping[str, Any]],
+        collection_name: str = DEFAULT_COLLECTION_NAME,
+    ) -> None:
+        """Replace the metadata of the documents, keyed by id
+
+        Contents and embeddings are kept. Ids that are not in the database are
+        ignored.
+        """
+        if not metadatas:
+            return
+
+        await self.executor.run(self._update_metadata, metadatas, collection_name)
+        self.logger.debug(f"Updated the metadata of {len(metadatas)} documents")
+
+    async def delete_documents(
+        self, ids: list[str], collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
+        """Delete the documents with the given ids from the database"""
+        if not ids:
+            return
+
+        await self.executor.run(self._delete, ids, collection_name)
+        self.logger.debug(f"Deleted {len(ids)} documents from the database")
+
+    async def delete_all_documents(
+        self, collection_name: str = DEFAULT_COLLECTION_NAME
+    ) -> None:
+        """Delete all documents in the database"""
+        await self.executor.run(self._delete_collection, collection_name)
+        self.logger.debug("Deleted all documents in the database")
+
+    def _search(
+        self,
+        query_vectors: npt.NDArray[np.float32],
+        collection_name: str,
+        filter_docs: bool,
+        query_filter: QueryFilter | None,
+    ) -> list[list[Document]]:
+        """Returns the nearest documents of each query. This call blocks."""
+        collection = self._collection(collection_name)
+        if collection is None:
+            return [[] for _ in range(len(query_vectors))]
+
+        index = collection.index
+        if (
+            self.config.index == "ivf"
+            and index.ivf is None
+            and len(index) >= self.config.ivf_min_size
+        ):
+            with self._lock:
+                index = collection.index
+                if index.ivf is None:
+                    index.build_ivf(num_lists=self.config.ivf_num_lists)
+                    self.logger.debug(
+                        f"Built IVF index for collection `{collection_name}`"
+                    )
+
+        # Rows appended after the index was taken are not searched
+        num_rows = len(index)
+        allowed = collection.live(num_rows)
+        if query_filter is not None:
+            matches = np.fromiter(
+                (
+                    query_filter.matches(metadata, content)
+                    for metadata, content in zip(
+                        collection.metadatas[:num_rows],
+                        collection.contents[:num_rows],
+                        strict=True,
+                    )
+                ),
+                dtype=bool,
+                count=num_rows,
+            )
+            allowed = matches if allowed is None else allowed & matches
+
+        settings = self.config.for_collection(collection_name)
+        documents = []
+        for rows, distances in index.search_many(
+            query_vectors,
+            k=settings.max_num_results,
+            num_probes=self.config.ivf_num_probes,
+            allowed=allowed,
+        ):
+            kept = (
+                distances <= settings.result_threshold
+                if filter_docs
+                else np.ones(len(rows), dtype=bool)
+            )
+            documents.append(
+                [
+                    collection.document(row, distance=distance)
+                    for row, distance in zip(
+                        rows[kept].tolist(), distances[kept].tolist(), strict=True
+                    )
+                ]
+            )
+        return documents
+
+    def _add(self, documents: list[Document], collection_name: str) -> None:
+        """Upsert the documents by appending rows. This call blocks."""
+        vectors = normalize(
+            [np.asarray(doc.embedding, dtype=np.float32) for doc in documents]
+        )
+        with self._lock:
+            collection = self._collection(collection_name)
+            if collection is None:
+                collection = self._create(collection_name, dim=vectors.shape[1])
+            dim = collection.header["dim"]
+            if dim != vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match "
+                    f"collection dimension {dim}"
+                )
+
+            records: list[dict[str, Any]] = [
+                {"id": doc.id, "content": doc.content, "metadata": dict(doc.metadata)}
+                for doc in documents
+            ]
+            self._append(collection_name, collection, records, vectors)
+
+            first_row = len(collection.ids)
+            replaced = [
+                collection.append(record["id"], record["content"], record["metadata"])
+                for record in records
+            ]
+            collection.index = self._extended_index(
+                collection_name, collection, first_row, vectors
+            )
+            for row in replaced:
+                if row is not None:
+                    collection.delete(row)
+            self._compact_if_needed(collection_name, collection)
+
+    def _update_metadata(
+        self, updates: Mapping[str, Mapping[str, Any]], collection_name: str
+    ) -> None:
+        """Replace metadatas by appending to the row log. This call blocks."""
+        with self._lock:
+            collection = self._collection(collection_name)
+            if collection is None:
+                return
+
+            records: list[dict[str, Any]] = [
+                {"update": collection.rows[doc_id], "metadata": dict(metadata)}
+                for doc_id, metadata in updates.items()
+                if doc_id in collection.rows
+            ]
+            if not records:
+                return
+            self._append(collection_name, collection, records)
+            for record in records:
+                collection.metadatas[record["update"]] = record["metadata"]
+
+    def _delete(self, ids: list[str], collection_name: str) -> None:
+        """Mark rows as deleted in the row log. This call blocks."""
+        with self._lock:
+            collection = self._collection(collection_name)
+            if collection is None:
+                return
+
+            rows = [collection.rows[i] for i in ids if i in collection.rows]
+            if not rows:
+                return
+            self._append(collection_name, collection, [{"delete": rows}])
+            for row in rows:
+                collection.delete(row)
+            self._compact_if_needed(collection_name, collection)
+
+    def _delete_collection(self, collection_name: str) -> None:
+        """Remove the files of a collection. This call blocks."""
+        with self._lock:
+            self._collections.pop(collection_name, None)
+            shutil.rmtree(self._directory(collection_name), ignore_errors=True)
+
+    def _collection(self, collection_name: str) -> NumpyCollection | None:
+        """Returns the collection, loading it from disk on first access"""
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            return collection
+
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                collection = self._load(collection_name)
+            return collection
+
+    def _create(self, collection_name: str, dim: int) -> NumpyCollection:
+        """Creates the files of an empty collection"""
+        directory = self._directory(collection_name)
+        directory.mkdir(parents=True, exist_ok=True)
+        header: dict[str, Any] = {
+            "dim": dim,
+            "quantization": self.config.quantization,
+            "generation": 0,
+            "num_rows": 0,
+            "log_size": 0,
+            "files": self._file_names(0, self.config.quantization),
+        }
+        for file_name in header["files"].values():
+            (directory / file_name).touch()
+        self._write_json(directory / HEADER_FILE, header)
+        collection = NumpyCollection(self._index(directory, header), header)
+        self._collections[collection_name] = collection
+        return collection
+
+    def _load(self, collection_name: str) -> NumpyCollection | None:
+        """Reads a collection from disk, called with the lock held
+
+        Bytes beyond the committed sizes, left by a failed write, are truncated and
+        files of other generations are removed. A collection stored with another
+        quantization gets new codes.
+        """
+        directory = self._directory(collection_name)
+        if not (directory / HEADER_FILE).exists():
+            return None
+        with open(directory / HEADER_FILE, encoding="utf-8") as file:
+            header = json.load(file)
+
+        for key, size in self._file_sizes(header).items():
+            with open(directory / header["files"][key], "ab") as file:
+                file.truncate(size)
+        for path in directory.iterdir():
+            if path.name != HEADER_FILE and path.name not in header["files"].values():
+                path.unlink()
+        if header["quantization"] != self.config.quantization:
+            header = self._rewrite_codes(directory, header)
+
+        with open(directory / header["files"]["rows"], "rb") as file:
+            log = file.read(header["log_size"])
+        collection = NumpyCollection(self._index(directory, header), header)
+        for line in log.splitlines():
+            record = json.loads(line)
+            if "delete" in record:
+                for row in record["delete"]:
+                    collection.delete(row)
+            elif "update" in record:
+                collection.metadatas[record["update"]] = record["metadata"]
+            else:
+                replaced = collection.append(
+                    record["id"], record["content"], record["metadata"]
+                )
+                if replaced is not None:
+                    collection.delete(replaced)
+
+        self._collections[collection_name] = collection
+        self.logger.debug(
+            f"Loaded collection `{collection_name}` with {len(collection)} documents"
+        )
+        return collection
+
+    def _append(
+        self,
+        collection_name: str,
+        collection: NumpyCollection,
+        records: list[dict[str, Any]],
+        vectors: npt.NDArray[np.float32] | None = None,
+    ) -> None:
+        """Appends rows and log records to the files and commits the header
+
+        The data files are written first, so the old header stays valid until the
+        new one replaces it.
+        """
+        directory = self._directory(collection_name)
+        header = dict(collection.header)
+        sizes = self._file_sizes(header)
+        log = "".join(json.dumps(record) + "\n" for record in records).encode()
+        chunks = {"rows": log}
+        if vectors is not None:
+            chunks["vectors"] = vectors.tobytes()
+            if header["quantization"] != "none":
+                codes = QuantizedVectors.encode(vectors, header["quantization"])
+                chunks["codes"] = codes.codes.tobytes()
+                if "scales" in header["files"]:
+                    chunks["scales"] = codes.scales.tobytes()
+            header["num_rows"] += len(vectors)
+        header["log_size"] += len(log)
+
+        for key, data in chunks.items():
+            with open(directory / header["files"][key], "ab") as file:
+                # Drops the bytes of an earlier write that failed halfway
+                file.truncate(sizes[key])
+                file.write(data)
+        self._write_json(directory / HEADER_FILE, header)
+        collection.header = header
+
+    def _extended_index(
+        self,
+        collection_name: str,
+        collection: NumpyCollection,
+        first_row: int,
+        vectors: npt.NDArray[np.float32],
+    ) -> VectorIndex:
+        """Returns the index over the appended files
+
+        The IVF lists of the current index are extended with the new rows, or
+        dropped to be trained again once the collection has doubled.
+        """
+        ivf = collection.index.ivf
+        index = self._index(self._directory(collection_name), collection.header)
+        if ivf is not None and len(index) <= IVF_RETRAIN_FACTOR * ivf.trained_size:
+            index.ivf = ivf.extended(vectors, first_row)
+        return index
+
+    def _compact_if_needed(
+        self, collection_name: str, collection: NumpyCollection
+    ) -> None:
+        """Rewrites the collection without its deleted rows once they outnumber the
+        live rows
+        """
+        if (
+            collection.num_deleted < COMPACT_MIN_DELETED
+            or collection.num_deleted <= len(collection)
+        ):
+            return
+
+        directory = self._directory(collection_name)
+        header = collection.header
+        generation = header["generation"] + 1
+        files = self._file_names(generation, header["quantization"])
+        rows = collection.live_rows()
+        index = collection.index
+        arrays: dict[str, npt.NDArray[Any]] = {"vectors": index.vectors[rows]}
+        if index.codes is not None:
+            arrays["codes"] = index.codes.codes[rows]
+        if "scales" in files and index.codes is not None:
+            arrays["scales"] = index.codes.scales[rows]
+        log = "".join(
+            json.dumps(
+                {
+                    "id": collection.ids[row],
+                    "content": collection.contents[row],
+                    "metadata": collection.metadatas[row],
+                }
+            )
+            + "\n"
+            for row in rows.tolist()
+        ).encode()
+
+        for key, array in arrays.items():
+            with open(directory / files[key], "wb") as file:
+                file.write(np.ascontiguousarray(array).tobytes())
+        with open(directory / files["rows"], "wb") as file:
+            file.write(log)
+        self._write_json(
+            directory / HEADER_FILE,
+            {
+                **header,
+                "generation": generation,
+                "num_rows": len(rows),
+                "log_size": len(log),
+                "files": files,
+            },
+        )
+        self.logger.debug(
+            f"Compacted collection `{collection_name}`, dropped "
+            f"{collection.num_deleted} deleted rows"
+        )
+        # Loading removes the files of the previous generation
+        del self._collections[collection_name]
+        self._load(collection_name)
+
+    def _rewrite_codes(self, directory: Path, header: dict[str, Any]) -> dict[str, Any]:
+        """Writes the codes of the configured quantization and returns the new
+        header
+        """
+        generation = header["generation"] + 1
+        files = {
+            key: name
+            for key, name in header["files"].items()
+            if key in ("vectors", "rows")
+        } | {
+            key: name
+            for key, name in self._file_names(
+                generation, self.config.quantization
+            ).items()
+            if key in ("codes", "scales")
+        }
+        if self.config.quantization != "none":
+            vectors = self._map(
+                directory / files["vectors"],
+                np.float32,
+                (header["num_rows"], header["dim"]),
+            )
+            codes = QuantizedVectors.encode(vectors, self.config.quantization)
+            with open(directory / files["codes"], "wb") as file:
+                file.write(codes.codes.tobytes())
+            if "scales" in files:
+                with open(directory / files["scales"], "wb") as file:
+                    file.write(codes.scales.tobytes())
+
+        new_header = {
+            **header,
+            "quantization": self.config.quantization,
+            "generation": generation,
+            "files": files,
+        }
+        self._write_json(directory / HEADER_FILE, new_header)
+        for name in set(header["files"].values()) - set(files.values()):
+            (directory / name).unlink()
+        return new_header
+
+    def _index(self, directory: Path, header: dict[str, Any]) -> VectorIndex:
+        """Returns the index over the memory-mapped vectors and codes"""
+        num_rows, dim = header["num_rows"], header["dim"]
+        files = header["files"]
+        vectors = self._map(directory / files["vectors"], np.float32, (num_rows, dim))
+        if header["quantization"] == "none":
+            return VectorIndex(vectors)
+
+        binary = header["quantization"] == "binary"
+        codes = QuantizedVectors(
+            header["quantization"],
+            self._map(
+                directory / files["codes"],
+                np.uint8 if binary else np.int8,
+                (num_rows, (dim + 7) // 8 if binary else dim),
+            ),
+            np.empty(0, dtype=np.float32)
+            if binary
+            else self._map(directory / files["scales"], np.float32, (num_rows,)),
+            dim=dim,
+        )
+        return VectorIndex(
+            vectors, codes=codes, rerank_factor=self.config.rerank_factor
+        )
+
+    def _directory(self, collection_name: str) -> Path:
+        """Returns the directory of a collection
+
+        Raises:
+            ValueError: If the name is invalid or points outside `self.path`
+        """
+        directory = self.path / validate_collection_name(collection_name)
+        if not directory.resolve().is_relative_to(self.path.resolve()):
+            raise ValueError(f"Collection `{collection_name}` is outside the database")
+        return directory
+
+    def _map(
+        self, path: Path, dtype: type[np.generic], shape: tuple[int, ...]
+    ) -> npt.NDArray[Any]:
+        """Memory-maps the first rows of a raw array file"""
+        if shape[0] == 0:
+            # Empty files cannot be memory-mapped
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+    def _file_names(self, generation: int, quantization: str) -> dict[str, str]:
+        """Returns the names of the files of a collection generation"""
+        names = {
+            "vectors": f"vectors-{generation}.f32",
+            "rows": f"rows-{generation}.jsonl",
+        }
+        if quantization != "none":
+            names["codes"] = f"codes-{generation}.bin"
+        if quantization == "int8":
+            names["scales"] = f"scales-{generation}.f32"
+        return names
+
+    def _file_sizes(self, header: dict[str, Any]) -> dict[str, int]:
+        """Returns the committed size in bytes of each file of a collection"""
+        dim = header["dim"]
+        row_sizes = {
+            "vectors": dim * np.dtype(np.float32).itemsize,
+            "codes": (dim + 7) // 8 if header["quantization"] == "binary" else dim,
+            "scales": np.dtype(np.float32).itemsize,
+        }
+        sizes = {
+            key: header["num_rows"] * row_sizes[key]
+            for key in header["files"]
+            if key != "rows"
+        }
+        sizes["rows"] = header["log_size"]
+        return sizes
+
+    def _write_json(self, path: Path, data: dict[str, Any]) -> None:
+        """Atomically writes a JSON file"""
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, path)
+
+    def _get_db_value(self, distance: DistanceFunction) -> str:
+        if distance == DistanceFunction.COSINE:
+            return "cosine"
+        elif distance == DistanceFunction.L2:
+            return "l2"
+        elif distance == DistanceFunction.INNER_PRODUCT:
+            return "ip"
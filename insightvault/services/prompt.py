@@ -1,8 +1,25 @@
 class PromptService:
-    """Prompt service"""
+    """Prompt service
+
+    Prompts start with their fixed instructions and end with the variable parts,
+    so a model can reuse the cached start of a prompt across requests. The
+    instructions of a prompt type that are sent as a separate system message are
+    in `system_prompts`.
+    """
 
     def __init__(self) -> None:
         """Initialize the prompt service"""
+        self.system_prompts: dict[str, str] = {
+            "rag_context": (
+                "You are a friendly, helpful assistant. "
+                "You are given some context and a question. "
+                "Use the context to answer the question. "
+                "Do not make up information, only use the information in the context. "
+                "If the context does not contain the answer, that is fine. Do not "
+                "use information other than what is in the context. "
+                "If you don't know the answer, say 'I don't know'."
+            ),
+        }
         self.prompts: dict[str, str] = {
             "summarize_text": (
                 "Summarize the text below after the colon at the end. "
@@ -11,17 +28,15 @@ class PromptService:
                 "Make the summary concise. Mirror the style of the input text. "
                 "Text to summarize: {text}"
             ),
-            "rag_context": (
-                "You are a friendly, helpful assistant. "
-                "You are given a question and some context below. "
-                "Use the context to answer the question. "
-                "Do not make up information, only use the information in the context. "
-                "If context below does not contain the answer, that is fine. Do not "
-                "use information other that what is in the context."
-                "If you don't know the answer, say 'I don't know'. "
-                "Question: {question}\n"
-                "Context: {context}"
+            "merge_summaries": (
+                "Combine the partial summaries below after the colon at the end into "
+                "a single summary. They summarize consecutive parts of one text. "
+                "Only use these summaries. "
+                "Do not add any information that is not part of the summaries. "
+                "Make the summary concise and remove repetitions. "
+                "Summaries to combine: {summaries}"
             ),
+            "rag_context": "Context:\n{context}\n\nQuestion: {question}",
         }
 
     def get_prompt(
@@ -46,3 +61,7 @@ class PromptService:
             return base_prompt.format(**context)
 
         return base_prompt
+
+    def get_system_prompt(self, prompt_type: str) -> str | None:
+        """Returns the system prompt of a prompt type, None if it has none"""
+        return self.system_prompts.get(prompt_type)
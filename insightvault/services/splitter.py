@@ -1,13 +1,23 @@
-from llama_index.core.node_parser import SentenceSplitter
+from collections import Counter
+from functools import cached_property
+from typing import TYPE_CHECKING
 
 from ..models.config import SplitterConfig
 from ..models.document import Document
+from ..utils.hashing import content_hash
+from ..utils.lazy import LazyImport
 from ..utils.logging import get_logger
 
+if TYPE_CHECKING:
+    from llama_index.core.node_parser import SentenceSplitter
+else:
+    SentenceSplitter = LazyImport("llama_index.core.node_parser", "SentenceSplitter")
+
 
 class SplitterService:
     """Splitter service
 
+    The sentence splitter, and with it `llama_index`, is loaded on the first split.
 
     Attributes:
         config: The configuration for the splitter
@@ -16,27 +26,46 @@ class SplitterService:
     def __init__(self, config: SplitterConfig):
         self.logger = get_logger("insightvault.splitter")
         self.config = config
-        self.text_splitter = SentenceSplitter(
+
+    @cached_property
+    def text_splitter(self) -> SentenceSplitter:
+        """The sentence splitter, created on first use"""
+        return SentenceSplitter(
             chunk_size=self.config.chunk_size, chunk_overlap=self.config.chunk_overlap
         )
 
     def split(self, document: Document) -> list[Document]:
-        """Split a document into chunks of a given size"""
+        """Split a document into chunks of a given size
+
+        The chunk ids are derived from the document source and the chunk text, so
+        splitting the same content again yields the same ids. A passage repeated
+        within a document is kept, its repetitions get ids that also count the
+        occurrence.
+        """
         self.logger.debug(f"Splitting document: {document.title}")
 
         chunks = self.text_splitter.split_text(document.content)
         num_chunks = len(chunks)
         self.logger.debug(f"Number of chunks: {num_chunks}")
+        source = str(document.metadata.get("source", document.title))
+        occurrences: Counter[str] = Counter()
         split_documents = []
         for i, chunk in enumerate(chunks):
+            occurrence = occurrences[chunk]
+            occurrences[chunk] += 1
+            chunk_id = (
+                content_hash(source, chunk)
+                if occurrence == 0
+                else content_hash(source, chunk, str(occurrence))
+            )
             split_documents.append(
                 Document(
+                    id=chunk_id,
                     title=f"{document.title}",
                     content=chunk,
                     metadata={
                         **document.metadata,
-                        "chunk_index": str(i),
-                        "total_chunks": str(num_chunks),
+                        **chunk_position(i, num_chunks),
                     },
                     embedding=document.embedding,
                     created_at=document.created_at,
@@ -45,3 +74,8 @@ class SplitterService:
             )
 
         return split_documents
+
+
+def chunk_position(index: int, total: int) -> dict[str, str]:
+    """Returns the metadata of the position of a chunk in its document"""
+    return {"chunk_index": str(index), "total_chunks": str(total)}
@@ -0,0 +1,358 @@
+import copy
+from typing import Any, Literal
+
+import numpy as np
+import numpy.typing as npt
+
+ASSIGN_BLOCK_SIZE = 65_536
+SCORE_BLOCK_SIZE = 16_777_216
+# Decoded blocks of codes stay in the CPU cache
+CODE_BLOCK_SIZE = 1024
+TRAINING_SAMPLES_PER_LIST = 256
+INT8_MAX = 127
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+Quantization = Literal["none", "int8", "binary"]
+
+
+def normalize(vectors: npt.ArrayLike) -> npt.NDArray[np.float32]:
+    """Returns the vectors scaled to unit length. Zero vectors stay zero."""
+    array = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    normalized: npt.NDArray[np.float32] = np.divide(
+        array, norms, out=np.zeros_like(array), where=norms > 0
+    )
+    return normalized
+
+
+def top_k(scores: npt.NDArray[np.float32], k: int) -> npt.NDArray[np.intp]:
+    """Returns the indices of the `k` highest scores, highest first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    indices = np.argpartition(-scores, k - 1)[:k]
+    return indices[np.argsort(-scores[indices], kind="stable")]
+
+
+def popcount(bits: npt.NDArray[np.uint8]) -> npt.NDArray[np.intp]:
+    """Returns the number of set bits in each row of packed bits"""
+    counts: npt.NDArray[np.intp]
+    if not hasattr(np, "bitwise_count"):
+        # NumPy < 2.0
+        counts = POPCOUNT[bits].sum(axis=1, dtype=np.intp)
+        return counts
+    if bits.shape[1] % 8 == 0:
+        bits = np.ascontiguousarray(bits).view(np.uint64)
+    counts = np.bitwise_count(bits).sum(axis=1, dtype=np.intp)
+    return counts
+
+
+def kmeans(
+    vectors: npt.NDArray[np.float32],
+    num_clusters: int,
+    iterations: int = 10,
+    seed: int = 0,
+) -> npt.NDArray[np.float32]:
+    """Spherical k-means over unit vectors
+
+    Returns:
+        The unit length centroids, one per row
+    """
+    rng = np.random.default_rng(seed)
+    num_clusters = min(num_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), num_clusters, replace=False)]
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=num_clusters)
+        # Empty clusters keep their previous centroid
+        sums[counts == 0] = centroids[counts == 0]
+        centroids = normalize(sums)
+    return centroids
+
+
+class QuantizedVectors:
+    """Compact codes of unit vectors for approximate scoring
+
+    With `int8` quantization each vector is scaled so its largest component maps
+    to 127 and rounded, a quarter of the float32 size. With `binary` quantization
+    only the sign of each component is kept as one bit, 1/32 of the float32 size.
+
+    Attributes:
+        kind: The quantization, `int8` or `binary`
+        codes: The codes, one row per vector. May be memory-mapped.
+        scales: The float32 scale of each row of int8 codes, empty for binary codes
+        dim: The dimension of the encoded vectors
+    """
+
+    def __init__(
+        self,
+        kind: Quantization,
+        codes: npt.NDArray[np.integer[Any]],
+        scales: npt.NDArray[np.float32],
+        dim: int,
+    ) -> None:
+        if kind not in ("int8", "binary"):
+            raise ValueError(f"Unknown quantization `{kind}`")
+        self.kind = kind
+        self.codes = codes
+        self.scales = scales
+        self.dim = dim
+
+    @classmethod
+    def encode(
+        cls, vectors: npt.NDArray[np.float32], kind: Quantization
+    ) -> "QuantizedVectors":
+        """Quantizes the unit vectors, one block of rows at a time"""
+        dim = vectors.shape[1]
+        code_blocks: list[npt.NDArray[np.integer[Any]]] = []
+        scale_blocks: list[npt.NDArray[np.float32]] = []
+        for start in range(0, len(vectors), ASSIGN_BLOCK_SIZE):
+            block = np.asarray(vectors[start : start + ASSIGN_BLOCK_SIZE])
+            if kind == "binary":
+                code_blocks.append(np.packbits(block > 0, axis=1))
+                continue
+            scales = (np.abs(block).max(axis=1) / INT8_MAX).astype(np.float32)
+            safe_scales = np.where(scales > 0, scales, 1)[:, np.newaxis]
+            code_blocks.append(np.round(block / safe_scales).astype(np.int8))
+            scale_blocks.append(scales)
+
+        if not code_blocks:
+            code_blocks.append(
+                np.empty((0, (dim + 7) // 8), dtype=np.uint8)
+                if kind == "binary"
+                else np.empty((0, dim), dtype=np.int8)
+            )
+        scales = (
+            np.concatenate(scale_blocks)
+            if scale_blocks
+            else np.empty(0, dtype=np.float32)
+        )
+        return cls(kind, np.concatenate(code_blocks), scales, dim)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def scores(
+        self,
+        query: npt.NDArray[np.float32],
+        rows: npt.NDArray[np.intp] | None = None,
+    ) -> npt.NDArray[np.float32]:
+        """Returns the approximate cosine similarities of the rows to the query
+
+        All rows are scored by default. The codes are decoded one block at a time,
+        so no full-precision copy of the matrix is made.
+        """
+        num_rows = len(self.codes) if rows is None else len(rows)
+        block_size = CODE_BLOCK_SIZE
+        query_bits = np.packbits(query > 0)
+        scores = np.empty(num_rows, dtype=np.float32)
+        for start in range(0, num_rows, block_size):
+            block_rows: slice | npt.NDArray[np.intp] = (
+                slice(start, start + block_size)
+                if rows is None
+                else rows[start : start + block_size]
+            )
+            codes = np.asarray(self.codes[block_rows])
+            if self.kind == "binary":
+                # The Hamming distance h of the signs estimates the angle pi * h / dim
+                distances = popcount(codes ^ query_bits)
+                scores[start : start + len(codes)] = np.cos(
+                    np.pi * distances / self.dim
+                )
+            else:
+                scores[start : start + len(codes)] = (
+                    codes.astype(np.float32) @ query
+                ) * self.scales[block_rows]
+        return scores
+
+
+class IVFIndex:
+    """Inverted file index over unit vectors
+
+    The vectors are partitioned by k-means into `num_lists` lists. A query only
+    scores the vectors of the `num_probes` lists with the closest centroids, which
+    trades a little recall for a search cost of roughly `num_probes / num_lists` of
+    an exhaustive search.
+
+    Attributes:
+        centroids: The unit length centroids of the lists
+        lists: The row numbers of the vectors of each list
+        trained_size: The number of vectors the centroids were trained on
+    """
+
+    def __init__(
+        self, vectors: npt.NDArray[np.float32], num_lists: int, seed: int = 0
+    ) -> None:
+        rng = np.random.default_rng(seed)
+        num_samples = min(len(vectors), num_lists * TRAINING_SAMPLES_PER_LIST)
+        samples = np.asarray(
+            vectors[np.sort(rng.choice(len(vectors), num_samples, replace=False))]
+        )
+        self.centroids = kmeans(samples, num_lists, seed=seed)
+        self.trained_size = len(vectors)
+        self.lists = self._assign(vectors, first_row=0)
+
+    def extended(self, vectors: npt.NDArray[np.float32], first_row: int) -> "IVFIndex":
+        """Returns a copy of the index with the vectors added from `first_row` on
+
+        The vectors are assigned to the closest of the existing centroids, the
+        index itself is not changed.
+        """
+        index = copy.copy(self)
+        index.lists = [
+            np.concatenate([rows, new_rows]) if len(new_rows) else rows
+            for rows, new_rows in zip(
+                self.lists, self._assign(vectors, first_row), strict=True
+            )
+        ]
+        return index
+
+    def candidates(
+        self, query: npt.NDArray[np.float32], num_probes: int
+    ) -> npt.NDArray[np.intp]:
+        """Returns the row numbers of the vectors in the lists closest to the query"""
+        lists = top_k(self.centroids @ query, num_probes)
+        return np.concatenate([self.lists[i] for i in lists])
+
+    def _assign(
+        self, vectors: npt.NDArray[np.float32], first_row: int
+    ) -> list[npt.NDArray[np.intp]]:
+        """Returns the row numbers of the vectors per list of the closest centroid"""
+        assignments = np.concatenate(
+            [
+                np.argmax(block @ self.centroids.T, axis=1)
+                for block in (
+                    np.asarray(vectors[start : start + ASSIGN_BLOCK_SIZE])
+                    for start in range(0, len(vectors), ASSIGN_BLOCK_SIZE)
+                )
+            ]
+            or [np.empty(0, dtype=np.intp)]
+        )
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        return np.split(order + first_row, np.cumsum(counts)[:-1])
+
+
+class VectorIndex:
+    """Cosine similarity search over a float32 matrix of unit vectors
+
+    Searches are exact by default. Call `build_ivf()` to partition the vectors and
+    search only the closest lists.
+
+    With quantized `codes`, candidates are scored on the codes and only the best
+    `k * rerank_factor` of them are re-scored with the full-precision vectors. The
+    search then reads the whole code matrix but only a few rows of `vectors`.
+
+    Attributes:
+        vectors: The unit vectors, one per row. May be memory-mapped.
+        codes: The quantized vectors, None to score all candidates exactly
+        rerank_factor: The number of candidates re-scored per result
+        ivf: The inverted file index, None for exact search
+    """
+
+    def __init__(
+        self,
+        vectors: npt.NDArray[np.float32],
+        codes: QuantizedVectors | None = None,
+        rerank_factor: int = 10,
+    ) -> None:
+        self.vectors = vectors
+        self.codes = codes
+        self.rerank_factor = rerank_factor
+        self.ivf: IVFIndex | None = None
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def build_ivf(self, num_lists: int | None = None) -> None:
+        """Partitions the vectors into `num_lists` lists, by default sqrt(n)"""
+        num_lists = num_lists or max(1, int(np.sqrt(len(self.vectors))))
+        self.ivf = IVFIndex(self.vectors, num_lists=num_lists)
+
+    def search(
+        self,
+        query: npt.ArrayLike,
+        k: int,
+        num_probes: int = 8,
+        allowed: npt.NDArray[np.bool_] | None = None,
+    ) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float32]]:
+        """Returns the rows of the `k` nearest vectors and their cosine distances
+
+        The rows are sorted by distance, nearest first. If `allowed` is given, only
+        rows where it is True are returned.
+        """
+        query_vector = normalize(query)
+        if self.ivf is None and self.codes is not None:
+            candidates = None if allowed is None else np.flatnonzero(allowed)
+            return self._rerank(query_vector, self.codes, candidates, k)
+        if self.ivf is None:
+            scores = self.vectors @ query_vector
+            if allowed is not None:
+                scores[~allowed] = -np.inf
+            rows = top_k(scores, k)
+            if allowed is not None:
+                rows = rows[allowed[rows]]
+            return rows, 1 - scores[rows]
+
+        # Sorted rows read the memory-mapped matrix sequentially
+        candidates = np.sort(self.ivf.candidates(query_vector, num_probes))
+        if allowed is not None:
+            candidates = candidates[allowed[candidates]]
+        if self.codes is not None:
+            return self._rerank(query_vector, self.codes, candidates, k)
+        scores = self.vectors[candidates] @ query_vector
+        best = top_k(scores, k)
+        return candidates[best], 1 - scores[best]
+
+    def search_many(
+        self,
+        queries: npt.ArrayLike,
+        k: int,
+        num_probes: int = 8,
+        allowed: npt.NDArray[np.bool_] | None = None,
+    ) -> list[tuple[npt.NDArray[np.intp], npt.NDArray[np.float32]]]:
+        """Returns the rows and cosine distances of the `k` nearest vectors of each
+        query, like `search()`
+
+        Exact searches score blocks of queries with one matrix product each. Blocks
+        are sized to keep the score matrix below `SCORE_BLOCK_SIZE` entries.
+        """
+        query_vectors = normalize(queries)
+        if self.ivf is not None or self.codes is not None:
+            return [
+                self.search(query, k, num_probes=num_probes, allowed=allowed)
+                for query in query_vectors
+            ]
+
+        results = []
+        block_size = max(1, SCORE_BLOCK_SIZE // max(1, len(self.vectors)))
+        for start in range(0, len(query_vectors), block_size):
+            scores = query_vectors[start : start + block_size] @ self.vectors.T
+            if allowed is not None:
+                scores[:, ~allowed] = -np.inf
+            for query_scores in scores:
+                rows = top_k(query_scores, k)
+                if allowed is not None:
+                    rows = rows[allowed[rows]]
+                results.append((rows, 1 - query_scores[rows]))
+        return results
+
+    def _rerank(
+        self,
+        query_vector: npt.NDArray[np.float32],
+        codes: QuantizedVectors,
+        candidates: npt.NDArray[np.intp] | None,
+        k: int,
+    ) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float32]]:
+        """Shortlists the candidates on their codes and re-scores the shortlist
+
+        All rows are candidates if `candidates` is None.
+        """
+        best = top_k(codes.scores(query_vector, candidates), k * self.rerank_factor)
+        # Sorted rows read the memory-mapped matrix sequentially
+        shortlist = np.sort(best if candidates is None else candidates[best])
+        scores = self.vectors[shortlist] @ query_vector
+        best = top_k(scores, k)
+        return shortlist[best], 1 - scores[best]
@@ -0,0 +1,54 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):  # noqa: UP046 (keeps Python 3.11 support)
+    """In-memory LRU cache whose entries expire after a time-to-live
+
+    Attributes:
+        max_size: Maximum number of entries, 0 disables the cache
+        ttl: Seconds after which an entry expires, None for no expiry
+        hits: Number of lookups that found an entry
+        misses: Number of lookups that found no entry
+    """
+
+    def __init__(self, max_size: int, ttl: float | None = None) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        """Returns the value of a key, or None if it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None or (entry[0] and entry[0] < time.monotonic()):
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: K, value: V) -> None:
+        """Stores a value, evicting the least recently used entry if full"""
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes all entries"""
+        self._entries.clear()
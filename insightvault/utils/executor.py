@@ -0,0 +1,47 @@
+import asyncio
+import functools
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import ParamSpec, TypeVar
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+class BlockingExecutor:
+    """Runs blocking calls on a dedicated thread pool
+
+    Awaiting `run()` keeps the event loop free while the call executes. If the
+    awaiting task is cancelled or the timeout expires, a call that has not started
+    yet is dropped. A call that is already running finishes in its thread, but its
+    result is discarded.
+
+    Attributes:
+        max_workers: Number of threads of the pool
+        timeout: Seconds to wait for a call, None to wait indefinitely
+    """
+
+    def __init__(
+        self, max_workers: int, timeout: float | None = None, name: str = "blocking"
+    ) -> None:
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name
+        )
+
+    async def run(self, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """Runs a blocking function on the pool and waits for its result
+
+        Raises:
+            TimeoutError: If the call does not finish within the timeout
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._pool, functools.partial(func, *args, **kwargs)
+        )
+        return await asyncio.wait_for(future, timeout=self.timeout)
+
+    def shutdown(self) -> None:
+        """Stops the pool after the running calls have finished"""
+        self._pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,63 @@
+import importlib
+import sys
+from collections.abc import Callable, Mapping
+from typing import Any
+
+
+class LazyImport:
+    """Stand-in for a module, or an attribute of a module, imported on first use
+
+    Calling the stand-in or reading one of its attributes imports the target, so a
+    module can name a heavy dependency at the top without paying its import cost
+    until the dependency is needed.
+
+    Attributes:
+        module: The name of the module to import
+        attribute: The name of the attribute of the module, None for the module
+    """
+
+    def __init__(self, module: str, attribute: str | None = None) -> None:
+        self.module = module
+        self.attribute = attribute
+        self._target: Any = None
+
+    def load(self) -> Any:
+        """Import the target once and return it"""
+        if self._target is None:
+            target = importlib.import_module(self.module)
+            self._target = (
+                target if self.attribute is None else getattr(target, self.attribute)
+            )
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.load(), name)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        target = (
+            self.module if self.attribute is None else f"{self.module}:{self.attribute}"
+        )
+        return f"LazyImport({target!r})"
+
+
+def lazy_attributes(
+    module_name: str, attributes: Mapping[str, str]
+) -> Callable[[str], Any]:
+    """Returns a module `__getattr__` that imports the attributes on first access
+
+    `attributes` maps each name to the module it is imported from. The imported
+    value is stored in the module, so later accesses do not go through
+    `__getattr__`.
+    """
+
+    def __getattr__(name: str) -> Any:  # noqa: N807
+        if name not in attributes:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(attributes[name]), name)
+        setattr(sys.modules[module_name], name, value)
+        return value
+
+    return __getattr__
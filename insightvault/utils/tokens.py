@@ -0,0 +1,18 @@
+import math
+
+# Average number of characters per token of English text for BPE tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Returns an estimate of the number of tokens of the text
+
+    The estimate does not load a tokenizer, it is meant for budgets, not for
+    exact limits.
+    """
+    return estimate_tokens_of_length(len(text))
+
+
+def estimate_tokens_of_length(num_chars: int) -> int:
+    """Returns an estimate of the number of tokens of a text of `num_chars`"""
+    return math.ceil(num_chars / CHARS_PER_TOKEN)
@@ -1,12 +1,28 @@
+import asyncio
+import os
+import threading
+from pathlib import Path
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
 from insightvault.app.base import BaseApp
+from insightvault.constants import DEFAULT_COLLECTION_NAME
+from insightvault.models.config import DatabaseConfig
 from insightvault.models.document import Document
+from insightvault.services.keyword_index import KeywordIndexService
+from insightvault.services.manifest import ManifestService
+from insightvault.services.numpy_database import NumpyDatabaseService
+from insightvault.services.splitter import chunk_position
 from tests.unit import BaseTest
 
 
+async def async_items(*items):
+    """Yield the items like an async iterator, such as a streamed LLM response"""
+    for item in items:
+        yield item
+
+
 class BaseAppTestSetup(BaseTest):
     @pytest.fixture
     def mock_embedding_service(self):
@@ -14,6 +30,8 @@ class BaseAppTestSetup(BaseTest):
         service = AsyncMock()
         service.init = AsyncMock()
         service.embed = AsyncMock(return_value=[[0.1, 0.2], [0.3, 0.4]])
+        service.embed_array = AsyncMock(return_value=[[0.1, 0.2], [0.3, 0.4]])
+        service.embed_query = AsyncMock(return_value=[0.1, 0.2])
         return service
 
     @pytest.fixture
@@ -23,8 +41,21 @@ class BaseAppTestSetup(BaseTest):
         service.add_documents = AsyncMock()
         service.delete_all_documents = AsyncMock()
         service.get_documents = AsyncMock()
+        service.iter_documents = Mock(side_effect=lambda *args, **kwargs: async_items())
         return service
 
+    @pytest.fixture
+    def mock_manifest_service(self, tmp_path):
+        """Create a manifest service that is stored in a temporary directory"""
+        return ManifestService(config=DatabaseConfig(path=str(tmp_path / "db")))
+
+    @pytest.fixture
+    def mock_keyword_service(self, tmp_path):
+        """Create a keyword index that is stored in a temporary directory"""
+        service = KeywordIndexService(config=DatabaseConfig(path=str(tmp_path / "db")))
+        yield service
+        service.close()
+
     @pytest.fixture
     def mock_splitter_service(self):
         """Create a mock splitter service"""
@@ -45,6 +76,8 @@ class BaseAppTestSetup(BaseTest):
         mock_db_service,
         mock_splitter_service,
         mock_embedding_service,
+        mock_manifest_service,
+        mock_keyword_service,
         mock_app_config,
     ):
         """Create a base app with mocked services"""
@@ -52,11 +85,15 @@ class BaseAppTestSetup(BaseTest):
             patch("insightvault.app.base.ChromaDatabaseService") as mock_db_class,
             patch("insightvault.app.base.SplitterService") as mock_splitter_class,
             patch("insightvault.app.base.EmbeddingService") as mock_embedding_class,
+            patch("insightvault.app.base.ManifestService") as mock_manifest_class,
+            patch("insightvault.app.base.KeywordIndexService") as mock_keyword_class,
             patch("insightvault.app.base.BaseApp._get_config") as mock_get_config,
         ):
             mock_db_class.return_value = mock_db_service
             mock_splitter_class.return_value = mock_splitter_service
             mock_embedding_class.return_value = mock_embedding_service
+            mock_manifest_class.return_value = mock_manifest_service
+            mock_keyword_class.return_value = mock_keyword_service
             mock_get_config.return_value = mock_app_config
 
             app = BaseApp()
@@ -79,6 +116,48 @@ class TestBaseApp(BaseAppTestSetup):
         base_app.embedder_service.init.assert_called_once()
         assert base_app.name == "insightvault.app.base"
 
+    def test_numpy_backend_is_selected_from_config(self, mock_app_config, tmp_path):
+        """Test that the database backend is chosen by `database.backend`"""
+        mock_app_config.database = DatabaseConfig(
+            backend="numpy", path=str(tmp_path / "db")
+        )
+        with (
+            patch("insightvault.app.base.ChromaDatabaseService") as mock_chroma,
+            patch("insightvault.app.base.EmbeddingService"),
+            patch("insightvault.app.base.BaseApp._get_config") as mock_get_config,
+        ):
+            mock_get_config.return_value = mock_app_config
+            app = BaseApp()
+
+        assert isinstance(app.db_service, NumpyDatabaseService)
+        mock_chroma.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_init_is_idempotent(self, base_app):
+        """Test that repeated init calls load the services only once"""
+        assert not base_app.is_initialized
+        assert base_app.init_duration is None
+
+        await base_app.init()
+        await base_app.init()
+
+        base_app.embedder_service.init.assert_called_once()
+        assert base_app.is_initialized
+        assert base_app.init_duration is not None
+
+    @pytest.mark.asyncio
+    async def test_concurrent_init_loads_services_once(self, base_app):
+        """Test that concurrent init calls share a single service load"""
+
+        async def slow_init():
+            await asyncio.sleep(0.01)
+
+        base_app.embedder_service.init.side_effect = slow_init
+
+        await asyncio.gather(*(base_app.init() for _ in range(5)))
+
+        base_app.embedder_service.init.assert_called_once()
+
     @pytest.mark.asyncio
     async def test_add_documents_processes_correctly(self, base_app, sample_document):
         """Test that add_documents processes documents correctly"""
@@ -89,7 +168,7 @@ class TestBaseApp(BaseAppTestSetup):
         base_app.splitter_service.split.assert_called_once_with(sample_document)
 
         # Verify embedder was called with chunk contents
-        base_app.embedder_service.embed.assert_called_once_with(
+        base_app.embedder_service.embed_array.assert_called_once_with(
             ["First chunk", "Second chunk"]
         )
 
@@ -100,6 +179,14 @@ class TestBaseApp(BaseAppTestSetup):
         assert processed_docs[0].embedding == [0.1, 0.2]
         assert processed_docs[1].embedding == [0.3, 0.4]
 
+    @pytest.mark.asyncio
+    async def test_add_documents_initializes_services(self, base_app, sample_document):
+        """Test that ingesting into a fresh app loads its services first"""
+        await base_app.async_add_documents([sample_document])
+
+        assert base_app.is_initialized
+        base_app.embedder_service.init.assert_called_once()
+
     @pytest.mark.asyncio
     async def test_add_documents_without_embedder_raises_error(
         self, base_app, sample_document
@@ -112,12 +199,322 @@ class TestBaseApp(BaseAppTestSetup):
 
         assert "Embedding service is not loaded" in str(exc.value)
 
+    @pytest.mark.asyncio
+    async def test_add_directory_streams_matching_files(self, base_app, tmp_path):
+        """Test that add_directory ingests the matching files of a tree"""
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "a.md").write_text("Alpha")
+        (tmp_path / "docs" / "b.txt").write_text("Beta")
+        (tmp_path / "drafts").mkdir()
+        (tmp_path / "drafts" / "c.md").write_text("Gamma")
+        (tmp_path / "d.md").write_text("Delta")
+        base_app.config.ingestion.queue_size = 1
+        base_app.splitter_service.split.side_effect = lambda doc: [doc]
+        base_app.embedder_service.embed_array.side_effect = lambda texts: [
+            [0.1] for _ in texts
+        ]
+        reported = []
+
+        progress = await base_app.async_add_directory(
+            tmp_path,
+            include=["*.md"],
+            exclude=["drafts/*"],
+            on_progress=lambda p: reported.append(p.chunks),
+        )
+
+        stored = base_app.db_service.add_documents.call_args[0][0]
+        assert [doc.content for doc in stored] == ["Delta", "Alpha"]
+        assert stored[1].metadata["source"] == str(tmp_path / "docs" / "a.md")
+        assert stored[1].title == "a.md"
+        expected_num_files = 2
+        assert progress.documents == expected_num_files
+        assert progress.chunks == expected_num_files
+        assert reported == [expected_num_files]
+
+    @pytest.mark.asyncio
+    async def test_add_directory_does_not_walk_excluded_directories(
+        self, base_app, tmp_path
+    ):
+        """Test that directories excluded as a whole are pruned from the walk"""
+        (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+        (tmp_path / "node_modules" / "pkg" / "a.md").write_text("Alpha")
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "b.md").write_text("Beta")
+        base_app.splitter_service.split.side_effect = lambda doc: [doc]
+        base_app.embedder_service.embed_array.side_effect = lambda texts: [
+            [0.1] for _ in texts
+        ]
+        walked = []
+        walk = os.walk
+
+        def record_walk(root):
+            for entry in walk(root):
+                walked.append((Path(entry[0]), threading.current_thread().name))
+                yield entry
+
+        with patch("insightvault.app.base.os.walk", side_effect=record_walk):
+            await base_app.async_add_directory(tmp_path, exclude=["node_modules/*"])
+
+        stored = base_app.db_service.add_documents.call_args[0][0]
+        assert [doc.content for doc in stored] == ["Beta"]
+        assert [path for path, _ in walked] == [tmp_path, tmp_path / "docs"]
+        main_thread = threading.current_thread().name
+        assert all(thread != main_thread for _, thread in walked)
+
+    @pytest.mark.asyncio
+    async def test_add_directory_skips_binary_files(self, base_app, tmp_path):
+        """Test that files which are not UTF-8 text are skipped"""
+        (tmp_path / "text.txt").write_text("Text")
+        (tmp_path / "image.bin").write_bytes(b"\xff\xfe\x00\x81")
+        base_app.splitter_service.split.side_effect = lambda doc: [doc]
+        base_app.embedder_service.embed_array.side_effect = lambda texts: [
+            [0.1] for _ in texts
+        ]
+
+        progress = await base_app.async_add_directory(tmp_path)
+
+        assert progress.documents == 1
+        stored = base_app.db_service.add_documents.call_args[0][0]
+        assert [doc.content for doc in stored] == ["Text"]
+
+    @pytest.mark.asyncio
+    async def test_add_documents_skips_unchanged_sources(self, base_app):
+        """Test that re-ingesting an unchanged source does not embed again"""
+        document = Document(title="Doc", content="Content", metadata={"source": "a"})
+
+        await base_app.async_add_documents([document])
+        await base_app.async_add_documents([document.model_copy()])
+
+        base_app.embedder_service.embed_array.assert_called_once()
+        base_app.db_service.add_documents.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_add_documents_only_embeds_changed_chunks(self, base_app):
+        """Test that only new chunks are embedded and stale chunks are deleted"""
+        base_app.splitter_service.split.side_effect = lambda doc: [
+            Document(id=f"id-{text}", title=doc.title, content=text)
+            for text in doc.content.split()
+        ]
+        base_app.embedder_service.embed_array.side_effect = lambda texts: [
+            [0.1] for _ in texts
+        ]
+
+        await base_app.async_add_documents(
+            [Document(title="Doc", content="one two", metadata={"source": "a"})]
+        )
+        await base_app.async_add_documents(
+            [Document(title="Doc", content="two three", metadata={"source": "a"})]
+        )
+
+        base_app.embedder_service.embed_array.assert_called_with(["three"])
+        base_app.db_service.delete_documents.assert_called_once_with(
+            ["id-one"], collection_name=DEFAULT_COLLECTION_NAME
+        )
+        entry = base_app.manifest_service.get("a")
+        assert entry.chunk_ids == ["id-two", "id-three"]
+
+    @pytest.mark.asyncio
+    async def test_add_documents_reembeds_source_after_model_change(self, base_app):
+        """Test that chunks stored with another model are all embedded again"""
+        base_app.splitter_service.split.side_effect = lambda doc: [
+            Document(id=f"id-{text}", title=doc.title, content=text)
+            for text in doc.content.split()
+        ]
+        base_app.embedder_service.embed_array.side_effect = lambda texts: [
+            [0.1] for _ in texts
+        ]
+
+        await base_app.async_add_documents(
+            [Document(title="Doc", content="one two", metadata={"source": "a"})]
+        )
+        base_app.config.embedding.model = "another-model"
+        await base_app.async_add_documents(
+            [Document(title="Doc", content="one two three", metadata={"source": "a"})]
+        )
+
+        base_app.embedder_service.embed_array.assert_called_with(
+            ["one", "two", "three"]
+        )
+        # The chunks embedded again replace the stored ones
+        base_app.db_service.delete_documents.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_failed_ingestion_does_not_record_source(self, base_app):
+        """Test that a source is ingested again after storing its chunks failed"""
+        base_app.splitter_service.split.side_effect = lambda doc: [
+            Document(id=f"id-{text}", title=doc.title, content=text)
+            for text in doc.content.split()
+        ]
+        base_app.embedder_service.embed_array.side_effect = lambda texts: [
+            [0.1] for _ in texts
+        ]
+        await base_app.async_add_documents(
+            [Document(title="Doc", content="one", metadata={"source": "a"})]
+        )
+
+        base_app.embedder_service.embed_array.side_effect = RuntimeError("Offline")
+        with pytest.raises(RuntimeError, match="Offline"):
+            await base_app.async_add_documents(
+                [Document(title="Doc", content="one two", metadata={"source": "a"})]
+            )
+
+        assert base_app.manifest_service.get("a").chunk_ids == ["id-one"]
+        base_app.db_service.delete_documents.assert_not_called()
+
+        base_app.embedder_service.embed_array.side_effect = lambda texts: [
+            [0.1] for _ in texts
+        ]
+        progress = await base_app.async_add_documents(
+            [Document(title="Doc", content="one two", metadata={"source": "a"})]
+        )
+
+        assert progress.skipped == 0
+        base_app.embedder_service.embed_array.assert_called_with(["two"])
+        assert base_app.manifest_service.get("a").chunk_ids == ["id-one", "id-two"]
+
+    @pytest.mark.asyncio
+    async def test_add_documents_updates_position_of_moved_chunks(self, base_app):
+        """Test that kept chunks get the position of the new document version"""
+        base_app.splitter_service.split.side_effect = lambda doc: [
+            Document(
+                id=f"id-{text}",
+                title=doc.title,
+                content=text,
+                metadata={
+                    **doc.metadata,
+                    **chunk_position(i, len(doc.content.split())),
+                },
+            )
+            for i, text in enumerate(doc.content.split())
+        ]
+        base_app.embedder_service.embed_array.side_effect = lambda texts: [
+            [0.1] for _ in texts
+        ]
+
+        await base_app.async_add_documents(
+            [Document(title="Doc", content="one two", metadata={"source": "a"})]
+        )
+        await base_app.async_add_documents(
+            [Document(title="Doc", content="zero one two", metadata={"source": "a"})]
+        )
+
+        base_app.embedder_service.embed_array.assert_called_with(["zero"])
+        [moved, collection_name] = base_app.db_service.update_metadata.call_args.args
+        assert collection_name == DEFAULT_COLLECTION_NAME
+        assert {doc_id: meta["chunk_index"] for doc_id, meta in moved.items()} == {
+            "id-one": "1",
+            "id-two": "2",
+        }
+        assert moved["id-one"]["total_chunks"] == "3"
+
+    @pytest.mark.asyncio
+    async def test_add_documents_updates_keyword_index(self, base_app):
+        """Test that stored chunks are indexed and stale chunks are removed"""
+        base_app.splitter_service.split.side_effect = lambda doc: [
+            Document(id=f"id-{text}", title=doc.title, content=text)
+            for text in doc.content.split()
+        ]
+        base_app.embedder_service.embed_array.side_effect = lambda texts: [
+            [0.1] for _ in texts
+        ]
+
+        await base_app.async_add_documents(
+            [Document(title="Doc", content="ERR-1 ERR-2", metadata={"source": "a"})]
+        )
+        await base_app.async_add_documents(
+            [Document(title="Doc", content="ERR-2 ERR-3", metadata={"source": "a"})]
+        )
+
+        keyword_service = base_app.keyword_service
+        assert keyword_service.search("ERR-1", limit=5) == []
+        assert keyword_service.search("ERR-3", limit=5) == ["id-ERR-3"]
+
+        await base_app.async_delete_all_documents()
+
+        assert keyword_service.search("ERR-2", limit=5) == []
+
+    @pytest.mark.asyncio
+    async def test_ingestion_backfills_empty_keyword_index(self, base_app):
+        """Test that stored chunks are indexed when the keyword index is empty"""
+        base_app.db_service.iter_documents.side_effect = lambda *args, **kwargs: (
+            async_items(Document(id="stored", title="Doc", content="ERR-7 failed"))
+        )
+
+        await base_app.async_add_documents([])
+        await base_app.async_add_documents([])
+
+        assert base_app.keyword_service.search("ERR-7", limit=5) == ["stored"]
+        base_app.db_service.iter_documents.assert_called_once_with(
+            DEFAULT_COLLECTION_NAME, include=("documents",)
+        )
+
+    def test_keyword_index_is_disabled_without_fts5(self, mock_app_config):
+        """Test that the keyword index is disabled if SQLite lacks FTS5"""
+        with (
+            patch("insightvault.app.base.ChromaDatabaseService"),
+            patch("insightvault.app.base.EmbeddingService"),
+            patch("insightvault.app.base.KeywordIndexService") as mock_keyword,
+            patch("insightvault.app.base.fts5_available", return_value=False),
+            patch("insightvault.app.base.BaseApp._get_config") as mock_get_config,
+        ):
+            mock_get_config.return_value = mock_app_config
+            app = BaseApp()
+
+        assert app.keyword_service is None
+        mock_keyword.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_ingestions_run_one_at_a_time(self, base_app):
+        """Test that concurrent ingestions do not interleave"""
+        events = []
+
+        async def split_changed(document, collection_name):
+            events.append(("start", document.title))
+            await asyncio.sleep(0.01)
+            events.append(("end", document.title))
+
+        base_app._split_changed = split_changed
+
+        await asyncio.gather(
+            base_app.async_add_documents([Document(title="a", content="a")]),
+            base_app.async_add_documents([Document(title="b", content="b")]),
+        )
+
+        assert [title for _, title in events] in (
+            ["a", "a", "b", "b"],
+            ["b", "b", "a", "a"],
+        )
+
+    @pytest.mark.asyncio
+    async def test_add_documents_persists_manifest(self, base_app, tmp_path):
+        """Test that the manifest is written after ingestion"""
+        document = Document(title="Doc", content="Content", metadata={"source": "a"})
+
+        await base_app.async_add_documents([document])
+
+        reloaded = ManifestService(config=DatabaseConfig(path=str(tmp_path / "db")))
+        assert reloaded.get("a") == base_app.manifest_service.get("a")
+
     @pytest.mark.asyncio
     async def test_delete_all_documents(self, base_app):
         """Test delete_all_documents calls database correctly"""
         await base_app.async_delete_all_documents()
         base_app.db_service.delete_all_documents.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_delete_all_documents_clears_manifest(self, base_app):
+        """Test that deleting all documents forgets the ingested sources"""
+        document = Document(title="Doc", content="Content", metadata={"source": "a"})
+        await base_app.async_add_documents([document])
+
+        await base_app.async_delete_all_documents()
+        await base_app.async_add_documents([document.model_copy()])
+
+        expected_num_embed_calls = 2
+        assert (
+            base_app.embedder_service.embed_array.call_count == expected_num_embed_calls
+        )
+
     @pytest.mark.asyncio
     async def test_list_documents(self, base_app):
         """Test list_documents returns database results"""
@@ -132,6 +529,28 @@ class TestBaseApp(BaseAppTestSetup):
         base_app.db_service.get_documents.assert_called_once()
         assert result == expected_docs
 
+    @pytest.mark.asyncio
+    async def test_count_documents_by_source(self, base_app):
+        """Test that chunks are counted per source without loading contents"""
+        documents = [
+            Document(title="A", content="", metadata={"source": "a.md"}),
+            Document(title="A", content="", metadata={"source": "a.md"}),
+            Document(title="Direct Input", content="", metadata={}),
+        ]
+        base_app.db_service.iter_documents = Mock(
+            side_effect=lambda **kwargs: async_items(*documents)
+        )
+
+        counts = await base_app.async_count_documents_by_source()
+
+        assert counts == {"a.md": 2, "Direct Input": 1}
+        base_app.db_service.iter_documents.assert_called_once_with(
+            collection_name=DEFAULT_COLLECTION_NAME,
+            limit=None,
+            offset=0,
+            include=("metadatas",),
+        )
+
     def test_sync_methods_call_async_versions(self, base_app):
         """Test that sync methods properly call their async counterparts"""
         with patch("asyncio.run") as mock_run:
@@ -163,7 +582,34 @@ class TestBaseApp(BaseAppTestSetup):
         await base_app.init()
         await base_app.async_add_documents([])
 
-        base_app.db_service.add_documents.assert_called_once_with([])
+        base_app.embedder_service.embed_array.assert_not_called()
+        base_app.db_service.add_documents.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_add_documents_batches_chunks_across_documents(self, base_app):
+        """Test that chunks of several documents are embedded in full batches"""
+        base_app.config.ingestion.batch_size = 4
+        base_app.splitter_service.split.side_effect = lambda doc: [
+            Document(title=doc.title, content=f"{doc.title} chunk {i}")
+            for i in range(2)
+        ]
+        base_app.embedder_service.embed_array.side_effect = lambda texts: [
+            [float(i)] for i in range(len(texts))
+        ]
+        documents = [Document(title=f"Doc {i}", content="Content") for i in range(3)]
+
+        await base_app.init()
+        await base_app.async_add_documents(documents)
+
+        embed_calls = base_app.embedder_service.embed_array.call_args_list
+        assert [len(call.args[0]) for call in embed_calls] == [4, 2]
+        assert embed_calls[0].args[0][2] == "Doc 1 chunk 0"
+
+        db_calls = base_app.db_service.add_documents.call_args_list
+        assert [len(call.args[0]) for call in db_calls] == [4, 2]
+        assert db_calls[1].args[0][0].content == "Doc 2 chunk 0"
+        assert db_calls[1].args[0][0].embedding == [0.0]
+        assert db_calls[1].args[0][1].embedding == [1.0]
 
     def test_get_config(self, base_app):
         """Test getting config file"""
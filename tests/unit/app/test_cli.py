@@ -1,10 +1,19 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 from click.testing import CliRunner
 
+import insightvault
 from insightvault.app.cli import cli
+from insightvault.constants import DEFAULT_COLLECTION_NAME
+from insightvault.models.database import QueryFilter
 from insightvault.models.document import Document
+from insightvault.models.ingestion import IngestionProgress
+from tests.unit.app.test_base import async_items
 
 
 class TestCLI:
@@ -36,7 +45,9 @@ class TestCLI:
         """Create a mock RAG app"""
         with patch("insightvault.app.cli.RAGApp") as mock:
             app_instance = mock.return_value
-            app_instance.query = Mock(return_value="Generated chat response")
+            app_instance.astream_query = Mock(
+                return_value=async_items("Generated ", "chat ", "response")
+            )
             yield mock
 
     @pytest.fixture
@@ -44,7 +55,9 @@ class TestCLI:
         """Create a mock summarizer app"""
         with patch("insightvault.app.cli.SummarizerApp") as mock:
             app_instance = mock.return_value
-            app_instance.summarize = Mock(return_value="Summarized text")
+            app_instance.astream_summarize = Mock(
+                side_effect=lambda text: async_items("Summarized ", "text")
+            )
             yield mock
 
     def test_manage_add_file(self, runner, mock_base_app, tmp_path):
@@ -64,6 +77,25 @@ class TestCLI:
         assert doc.content == "Test content"
         assert doc.metadata["source"] == str(test_file)
 
+    def test_manage_add_directory(self, runner, mock_base_app, tmp_path):
+        """Test adding a directory through CLI"""
+        mock_base_app.return_value.add_directory = Mock(
+            return_value=IngestionProgress(documents=3, chunks=7, elapsed=0.5)
+        )
+
+        result = runner.invoke(
+            cli,
+            ["manage", "add-dir", str(tmp_path), "-i", "*.md", "-e", "drafts/*"],
+        )
+
+        assert result.exit_code == 0
+        mock_base_app.return_value.add_directory.assert_called_once()
+        call = mock_base_app.return_value.add_directory.call_args
+        assert call.args[0] == str(tmp_path)
+        assert call.kwargs["include"] == ("*.md",)
+        assert call.kwargs["exclude"] == ("drafts/*",)
+        assert "Added 3 files (7 chunks)" in result.output
+
     def test_manage_add_text(self, runner, mock_base_app):
         """Test adding text through CLI"""
         mock_base_app.return_value.init = AsyncMock()
@@ -80,54 +112,136 @@ class TestCLI:
 
     def test_manage_list_documents(self, runner, mock_base_app):
         """Test listing documents through CLI"""
-        mock_base_app.return_value.list_documents.return_value = [
-            Document(
-                id="1",
-                title="Doc 1",
-                content="Content 1",
-                metadata={"title": "Doc 1"},
-            ),
-            Document(
-                id="2",
-                title="Doc 2",
-                content="Content 2",
-                metadata={"title": "Doc 2"},
-            ),
+        documents = [
+            Document(id="1", title="Doc 1", content="", metadata={"title": "Doc 1"}),
+            Document(id="2", title="Doc 2", content="", metadata={"title": "Doc 2"}),
         ]
+        mock_base_app.return_value.aiter_documents = Mock(
+            side_effect=lambda **kwargs: async_items(*documents)
+        )
 
         result = runner.invoke(cli, ["manage", "list"])
 
         assert result.exit_code == 0
         assert "1. Doc 1 (ID: 1)" in result.output
         assert "2. Doc 2 (ID: 2)" in result.output
+        mock_base_app.return_value.aiter_documents.assert_called_once_with(
+            limit=None,
+            offset=0,
+            include=("metadatas",),
+            collection_name=DEFAULT_COLLECTION_NAME,
+        )
+
+    def test_manage_list_documents_page(self, runner, mock_base_app):
+        """Test that the numbering of a page starts after the offset"""
+        document = Document(id="11", title="Doc", content="", metadata={})
+        mock_base_app.return_value.aiter_documents = Mock(
+            side_effect=lambda **kwargs: async_items(document)
+        )
+
+        result = runner.invoke(
+            cli, ["manage", "list", "--limit", "1", "--offset", "10"]
+        )
+
+        assert result.exit_code == 0
+        assert "11. Untitled (ID: 11)" in result.output
+        mock_base_app.return_value.aiter_documents.assert_called_once_with(
+            limit=1,
+            offset=10,
+            include=("metadatas",),
+            collection_name=DEFAULT_COLLECTION_NAME,
+        )
 
     def test_manage_list_documents_empty(self, runner, mock_base_app):
         """Test listing documents when none exist"""
-        mock_base_app.return_value.list_documents.return_value = []
+        mock_base_app.return_value.aiter_documents = Mock(
+            side_effect=lambda **kwargs: async_items()
+        )
 
         result = runner.invoke(cli, ["manage", "list"])
 
         assert result.exit_code == 0
         assert "No documents found in database." in result.output
 
+    def test_manage_list_group_by_source(self, runner, mock_base_app):
+        """Test listing the number of chunks per source"""
+        mock_base_app.return_value.count_documents_by_source = Mock(
+            return_value={"b.md": 1, "a.md": 3}
+        )
+
+        result = runner.invoke(cli, ["manage", "list", "--group-by-source"])
+
+        assert result.exit_code == 0
+        assert "a.md: 3\nb.md: 1" in result.output
+
     def test_manage_delete_all(self, runner, mock_base_app):
         """Test deleting all documents through CLI"""
         result = runner.invoke(cli, ["manage", "delete-all"])
 
         assert result.exit_code == 0
-        mock_base_app.return_value.delete_all_documents.assert_called_once()
+        mock_base_app.return_value.delete_all_documents.assert_called_once_with(
+            collection_name=DEFAULT_COLLECTION_NAME
+        )
         assert "All documents deleted" in result.output
 
+    def test_invalid_collection_name_is_rejected(self, runner, mock_base_app):
+        """Test that collection names cannot point outside the database"""
+        result = runner.invoke(
+            cli, ["manage", "delete-all", "--collection", "../../victim"]
+        )
+
+        assert result.exit_code != 0
+        assert "Invalid collection name" in result.output
+        mock_base_app.return_value.delete_all_documents.assert_not_called()
+
+    def test_manage_delete_all_in_collection(self, runner, mock_base_app):
+        """Test that the manage commands act on the given collection"""
+        result = runner.invoke(cli, ["manage", "delete-all", "--collection", "code"])
+
+        assert result.exit_code == 0
+        mock_base_app.return_value.delete_all_documents.assert_called_once_with(
+            collection_name="code"
+        )
+
     def test_search_query(self, runner, mock_search_app):
         """Test search query through CLI"""
         mock_search_app.return_value.init = AsyncMock()
         result = runner.invoke(cli, ["search", "test query"])
 
         assert result.exit_code == 0
-        mock_search_app.return_value.query.assert_called_once_with("test query")
+        mock_search_app.return_value.query.assert_called_once_with(
+            "test query", query_filter=None, collection_names=(DEFAULT_COLLECTION_NAME,)
+        )
         assert "1. Result 1" in result.output
         assert "2. Result 2" in result.output
 
+    def test_search_several_collections(self, runner, mock_search_app):
+        """Test that the collection option can be repeated"""
+        mock_search_app.return_value.init = AsyncMock()
+        result = runner.invoke(
+            cli, ["search", "test query", "--collection", "docs", "-c", "code"]
+        )
+
+        assert result.exit_code == 0
+        mock_search_app.return_value.query.assert_called_once_with(
+            "test query", query_filter=None, collection_names=("docs", "code")
+        )
+
+    def test_search_query_with_filter(self, runner, mock_search_app):
+        """Test that the filter options restrict the search"""
+        mock_search_app.return_value.init = AsyncMock()
+        result = runner.invoke(
+            cli,
+            ["search", "test query", "--source", "notes.md", "--contains", "sky"],
+        )
+
+        assert result.exit_code == 0
+        mock_search_app.return_value.query.assert_called_once_with(
+            "test query",
+            query_filter=QueryFilter(source="notes.md", contains="sky"),
+            collection_names=(DEFAULT_COLLECTION_NAME,),
+        )
+
     def test_search_query_no_results(self, runner, mock_search_app):
         """Test search query with no results"""
         mock_search_app.return_value.init = AsyncMock()
@@ -140,34 +254,85 @@ class TestCLI:
 
     def test_chat_query(self, runner, mock_rag_app):
         """Test chat query through CLI"""
-        mock_rag_app.return_value.init = AsyncMock()
         result = runner.invoke(cli, ["chat", "test question"])
 
         assert result.exit_code == 0
-        mock_rag_app.return_value.query.assert_called_once_with("test question")
+        mock_rag_app.return_value.astream_query.assert_called_once_with(
+            "test question",
+            query_filter=None,
+            collection_names=(DEFAULT_COLLECTION_NAME,),
+        )
         assert "Chat response" in result.output
+        assert "Generated chat response\n" in result.output
+
+    def test_chat_with_empty_response(self, runner, mock_rag_app):
+        """Test that an empty stream prints a notice instead of a blank line"""
+        mock_rag_app.return_value.astream_query = Mock(return_value=async_items())
+
+        result = runner.invoke(cli, ["chat", "test question"])
+
+        assert result.exit_code == 0
+        assert "No response from the LLM.\n" in result.output
+
+    def test_chat_without_query_fails(self, runner, mock_rag_app):
+        result = runner.invoke(cli, ["chat"])
+
+        assert result.exit_code != 0
+        assert "Missing argument" in result.output
+        mock_rag_app.assert_not_called()
+
+    def test_interactive_chat_reuses_app(self, runner, mock_rag_app):
+        """Test that an interactive session answers every question with one app"""
+        app = mock_rag_app.return_value
+        app.astream_chat = Mock(
+            side_effect=lambda question, **kwargs: async_items("Answer")
+        )
+        app.async_clear = AsyncMock()
+
+        result = runner.invoke(
+            cli,
+            ["chat", "--interactive", "First question"],
+            input="Second question\n/clear\n\n/exit\nNever asked\n",
+        )
+
+        assert result.exit_code == 0
+        mock_rag_app.assert_called_once()
+        assert [call.args[0] for call in app.astream_chat.call_args_list] == [
+            "First question",
+            "Second question",
+        ]
+        app.async_clear.assert_awaited_once()
+        assert "The chat history was cleared." in result.output
+
+    def test_interactive_chat_ends_with_input(self, runner, mock_rag_app):
+        """Test that the session ends at the end of the input"""
+        app = mock_rag_app.return_value
+        app.astream_chat = Mock(return_value=async_items("Answer"))
+
+        result = runner.invoke(cli, ["chat", "-i"], input="Question\n")
+
+        assert result.exit_code == 0
+        app.astream_chat.assert_called_once()
 
     def test_summarize_text(self, runner, mock_summarizer_app):
         """Test text summarization through CLI"""
-        mock_summarizer_app.return_value.init = AsyncMock()
         result = runner.invoke(cli, ["summarize", "Text to summarize"])
 
         assert result.exit_code == 0
-        mock_summarizer_app.return_value.summarize.assert_called_once_with(
+        mock_summarizer_app.return_value.astream_summarize.assert_called_once_with(
             "Text to summarize"
         )
         assert "Summarized text" in result.output
 
     def test_summarize_file(self, runner, mock_summarizer_app, tmp_path):
         """Test file summarization through CLI"""
-        mock_summarizer_app.return_value.init = AsyncMock()
         test_file = tmp_path / "test.txt"
         test_file.write_text("Content to summarize")
 
         result = runner.invoke(cli, ["summarize", "--file", str(test_file)])
 
         assert result.exit_code == 0
-        mock_summarizer_app.return_value.summarize.assert_called_once_with(
+        mock_summarizer_app.return_value.astream_summarize.assert_called_once_with(
             "Content to summarize"
         )
         assert "Summarized text" in result.output
@@ -178,3 +343,126 @@ class TestCLI:
         expected_exit_code = 2
         assert result.exit_code == expected_exit_code
         assert "No such command" in result.output
+
+    def test_search_through_daemon(self, runner, mock_search_app):
+        """Test that commands are sent to the daemon when it is enabled"""
+        client = Mock()
+        client.request.return_value = {"results": ["Doc A"]}
+        with patch("insightvault.app.cli._daemon", return_value=client):
+            result = runner.invoke(cli, ["search", "test query", "-c", "code"])
+
+        assert result.exit_code == 0
+        assert "1. Doc A" in result.output
+        client.request.assert_called_once_with(
+            "POST",
+            "/search",
+            {"query": "test query", "filter": None, "collections": ["code"]},
+        )
+        mock_search_app.assert_not_called()
+
+    def test_chat_through_daemon(self, runner, mock_rag_app):
+        client = Mock()
+        client.stream.return_value = iter(["Chat ", "answer"])
+        with patch("insightvault.app.cli._daemon", return_value=client):
+            result = runner.invoke(cli, ["chat", "test question"])
+
+        assert result.exit_code == 0
+        assert "Chat answer\n" in result.output
+        assert client.stream.call_args.args[0] == "/chat/stream"
+        mock_rag_app.assert_not_called()
+
+    def test_empty_chat_through_daemon(self, runner, mock_rag_app):
+        client = Mock()
+        client.stream.return_value = iter([])
+        with patch("insightvault.app.cli._daemon", return_value=client):
+            result = runner.invoke(cli, ["chat", "test question"])
+
+        assert result.exit_code == 0
+        assert "No response from the LLM.\n" in result.output
+
+    def test_manage_list_through_daemon(self, runner, mock_base_app):
+        client = Mock()
+        client.request.return_value = {
+            "documents": [{"id": "7", "metadata": {"title": "Doc 7"}}]
+        }
+        with patch("insightvault.app.cli._daemon", return_value=client):
+            result = runner.invoke(cli, ["manage", "list", "--offset", "6"])
+
+        assert result.exit_code == 0
+        assert "7. Doc 7 (ID: 7)" in result.output
+        client.request.assert_called_once_with(
+            "GET",
+            "/documents",
+            query={"collection": DEFAULT_COLLECTION_NAME, "limit": None, "offset": 6},
+        )
+        mock_base_app.assert_not_called()
+
+    def test_daemon_status(self, runner):
+        with patch("insightvault.app.daemon.DaemonClient") as mock_client:
+            mock_client.return_value.pid.return_value = 42
+            result = runner.invoke(
+                cli, ["daemon", "status", "--config", "./tests/mocks/mock_config.yaml"]
+            )
+
+        assert result.exit_code == 0
+        assert "PID: 42" in result.output
+
+    def test_manage_list_does_not_import_models(self, tmp_path):
+        """Test that listing documents does not import the embedding or LLM stack"""
+        (tmp_path / "config.yaml").write_text(
+            'database:\n  path: "./db"\n'
+            "splitter:\n  chunk_size: 1024\n  chunk_overlap: 256\n"
+            'llm:\n  model: "llama3"\n'
+            'embedding:\n  model: "all-MiniLM-L6-v2"\n'
+        )
+        script = (
+            "import sys\n"
+            "from insightvault.app.cli import cli\n"
+            "cli(['manage', 'list'], standalone_mode=False)\n"
+            "heavy = ['torch', 'sentence_transformers', 'llama_index', 'ollama']\n"
+            "print([name for name in heavy if name in sys.modules])\n"
+        )
+
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=tmp_path,
+            env={
+                **os.environ,
+                "PYTHONPATH": str(Path(insightvault.__file__).parents[1]),
+            },
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert result.stdout.splitlines()[-1] == "[]"
+
+    def test_cli_runs_without_fcntl(self, tmp_path):
+        """Test that commands without the daemon run where fcntl is missing"""
+        (tmp_path / "config.yaml").write_text(
+            'database:\n  path: "./db"\n'
+            "splitter:\n  chunk_size: 1024\n  chunk_overlap: 256\n"
+            'llm:\n  model: "llama3"\n'
+            'embedding:\n  model: "all-MiniLM-L6-v2"\n'
+        )
+        script = (
+            "import sys\n"
+            "sys.modules['fcntl'] = None\n"
+            "from insightvault.app.cli import cli\n"
+            "cli(['manage', 'list'], standalone_mode=False)\n"
+            "print('insightvault.app.daemon' in sys.modules)\n"
+        )
+
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=tmp_path,
+            env={
+                **os.environ,
+                "PYTHONPATH": str(Path(insightvault.__file__).parents[1]),
+            },
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert result.stdout.splitlines()[-1] == "False"
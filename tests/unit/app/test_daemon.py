@@ -0,0 +1,201 @@
+import json
+import os
+import signal
+import socketserver
+import stat
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from typing import ClassVar
+from unittest.mock import Mock, patch
+
+import pytest
+
+from insightvault.app.daemon import DaemonClient, DaemonError, run_daemon
+from insightvault.app.daemon import _lock as run_daemon_lock
+from insightvault.models.config import DaemonConfig
+
+
+class FakeDaemonHandler(BaseHTTPRequestHandler):
+    """Answers like the daemon and records the requests"""
+
+    requests: ClassVar[list[tuple[str, str, object]]] = []
+
+    def do_GET(self):
+        self.requests.append(("GET", self.path, None))
+        if self.path == "/health":
+            self._send_json({"status": "ok", "init_duration": 1.0, "pid": 1234})
+        else:
+            self._send_json({"documents": []})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(("POST", self.path, body))
+        if self.path == "/chat/stream":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            for token in ("Chat ", "answer"):
+                self.wfile.write(token.encode())
+                self.wfile.flush()
+        elif self.path == "/search":
+            self._send_json({"results": ["Doc A"]})
+        else:
+            self._send_json({"detail": "Not Found"}, status=404)
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("local", 0)
+
+
+class TestDaemonClient:
+    @pytest.fixture
+    def socket_dir(self):
+        """A short directory for sockets, their paths are limited to ~100 bytes"""
+        with tempfile.TemporaryDirectory() as directory:
+            yield Path(directory)
+
+    @pytest.fixture
+    def daemon_config(self, socket_dir):
+        return DaemonConfig(
+            enabled=True,
+            socket_path=str(socket_dir / "daemon.sock"),
+            log_path=str(socket_dir / "daemon.log"),
+            start_timeout=1.0,
+        )
+
+    @pytest.fixture
+    def fake_daemon(self, daemon_config):
+        """Serve the fake daemon on the configured socket"""
+        FakeDaemonHandler.requests = []
+        server = FakeDaemon(daemon_config.socket_path, FakeDaemonHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield FakeDaemonHandler.requests
+        server.shutdown()
+        server.server_close()
+
+    def test_request_sends_json(self, daemon_config, fake_daemon):
+        """Test that requests and responses are JSON over the socket"""
+        client = DaemonClient(daemon_config)
+
+        response = client.request("POST", "/search", {"query": "sky"})
+
+        assert response == {"results": ["Doc A"]}
+        assert fake_daemon == [("POST", "/search", {"query": "sky"})]
+
+    def test_request_leaves_out_unset_query_parameters(
+        self, daemon_config, fake_daemon
+    ):
+        client = DaemonClient(daemon_config)
+
+        client.request("GET", "/documents", query={"limit": None, "offset": 2})
+
+        assert fake_daemon == [("GET", "/documents?offset=2", None)]
+
+    def test_error_response_raises(self, daemon_config, fake_daemon):
+        client = DaemonClient(daemon_config)
+
+        with pytest.raises(DaemonError, match="404"):
+            client.request("POST", "/missing", {})
+
+    def test_stream_yields_text(self, daemon_config, fake_daemon):
+        """Test that a streamed response is yielded as it arrives"""
+        client = DaemonClient(daemon_config)
+
+        tokens = list(client.stream("/chat/stream", {"query": "sky"}))
+
+        assert "".join(tokens) == "Chat answer"
+
+    def test_pid_of_running_daemon(self, daemon_config, fake_daemon):
+        client = DaemonClient(daemon_config)
+
+        expected_pid = 1234
+        assert client.is_running()
+        assert client.pid() == expected_pid
+
+    def test_not_running_without_socket(self, daemon_config):
+        client = DaemonClient(daemon_config)
+
+        assert not client.is_running()
+        assert not client.stop()
+
+    def test_stop_terminates_daemon(self, daemon_config, fake_daemon):
+        client = DaemonClient(daemon_config)
+
+        with patch("insightvault.app.daemon.os.kill") as mock_kill:
+            assert client.stop()
+
+        mock_kill.assert_called_once_with(1234, signal.SIGTERM)
+
+    def test_start_fails_when_daemon_exits(self, daemon_config):
+        """Test that a daemon that exits during startup raises instead of hanging"""
+        client = DaemonClient(daemon_config)
+
+        with patch("insightvault.app.daemon.subprocess.Popen") as mock_popen:
+            mock_popen.return_value.poll.return_value = 1
+            with pytest.raises(DaemonError, match="exited"):
+                client.start()
+
+        command = mock_popen.call_args.args[0]
+        assert command[-4:] == ["daemon", "run", "--config", client.config_path]
+        assert mock_popen.call_args.kwargs["start_new_session"] is True
+
+    def test_run_daemon_serves_on_private_socket(self, daemon_config):
+        """Test that the socket is only accessible to the user and removed on exit"""
+        app = Mock()
+        app.state.config.daemon = daemon_config
+        modes = []
+
+        def run(sockets):
+            modes.append(stat.S_IMODE(os.stat(daemon_config.socket_path).st_mode))
+
+        with (
+            patch(
+                "insightvault.app.daemon.create_app", return_value=app
+            ) as mock_create_app,
+            patch("insightvault.app.daemon.uvicorn") as mock_uvicorn,
+        ):
+            mock_uvicorn.Server.return_value.run.side_effect = run
+            run_daemon()
+
+        mock_create_app.assert_called_once_with(
+            config_path="./config.yaml", daemon=True
+        )
+        assert modes == [0o600]
+        assert not Path(daemon_config.socket_path).exists()
+
+    def test_starting_daemon_is_not_started_again(self, daemon_config):
+        """Test that a daemon holding the lock is waited for instead of restarted"""
+        client = DaemonClient(daemon_config)
+        app = Mock()
+        app.state.config.daemon = daemon_config
+
+        with (
+            run_daemon_lock(client.lock_path),
+            patch("insightvault.app.daemon.create_app", return_value=app),
+            patch("insightvault.app.daemon.uvicorn") as mock_uvicorn,
+        ):
+            assert client.is_starting()
+            with pytest.raises(DaemonError, match="already running"):
+                run_daemon()
+
+        mock_uvicorn.Server.assert_not_called()
+
+        assert not client.is_starting()
@@ -3,8 +3,9 @@ from unittest.mock import AsyncMock, Mock, patch
 import pytest
 
 from insightvault.app.rag import RAGApp
+from insightvault.constants import DEFAULT_COLLECTION_NAME
 from insightvault.models.document import Document
-from tests.unit.app.test_base import BaseAppTestSetup
+from tests.unit.app.test_base import BaseAppTestSetup, async_items
 
 
 class TestRAGApp(BaseAppTestSetup):
@@ -14,6 +15,14 @@ class TestRAGApp(BaseAppTestSetup):
         service = AsyncMock()
         service.init = AsyncMock()
         service.query = AsyncMock(return_value="Generated response")
+        service.stream_query = Mock(
+            side_effect=lambda prompt, system: async_items("Generated ", "response")
+        )
+        service.stream_chat = Mock(
+            side_effect=lambda prompt, history_prompt, system: async_items(
+                "Chat ", "response"
+            )
+        )
         return service
 
     @pytest.fixture
@@ -21,6 +30,7 @@ class TestRAGApp(BaseAppTestSetup):
         """Create a mock prompt service"""
         service = Mock()
         service.get_prompt.return_value = "Generated prompt text"
+        service.get_system_prompt.return_value = "System prompt text"
         return service
 
     @pytest.fixture
@@ -29,6 +39,7 @@ class TestRAGApp(BaseAppTestSetup):
         mock_db_service,
         mock_splitter_service,
         mock_embedding_service,
+        mock_manifest_service,
         mock_llm_service,
         mock_prompt_service,
         mock_app_config,
@@ -38,6 +49,7 @@ class TestRAGApp(BaseAppTestSetup):
             patch("insightvault.app.base.ChromaDatabaseService") as mock_db_class,
             patch("insightvault.app.base.SplitterService") as mock_splitter_class,
             patch("insightvault.app.base.EmbeddingService") as mock_embedding_class,
+            patch("insightvault.app.base.ManifestService") as mock_manifest_class,
             patch("insightvault.app.rag.OllamaLLMService") as mock_llm_class,
             patch("insightvault.app.rag.PromptService") as mock_prompt_class,
             patch("insightvault.app.base.BaseApp._get_config") as mock_get_config,
@@ -45,6 +57,7 @@ class TestRAGApp(BaseAppTestSetup):
             mock_db_class.return_value = mock_db_service
             mock_splitter_class.return_value = mock_splitter_service
             mock_embedding_class.return_value = mock_embedding_service
+            mock_manifest_class.return_value = mock_manifest_service
             mock_llm_class.return_value = mock_llm_service
             mock_prompt_class.return_value = mock_prompt_service
             mock_get_config.return_value = mock_app_config
@@ -65,7 +78,7 @@ class TestRAGApp(BaseAppTestSetup):
         """Test that query retrieves documents and generates response"""
         # Setup mock responses
         await rag_app.init()
-        rag_app.embedder_service.embed.return_value = [[0.1, 0.2, 0.3]]
+        rag_app.embedder_service.embed_query.return_value = [0.1, 0.2, 0.3]
         rag_app.db_service.query.return_value = [
             Document(title="Doc 1", content="Content from first document"),
             Document(title="Doc 2", content="Content from second document"),
@@ -74,10 +87,14 @@ class TestRAGApp(BaseAppTestSetup):
         result = await rag_app.async_query("test query")
 
         # Verify embeddings were generated
-        rag_app.embedder_service.embed.assert_called_once_with(["test query"])
+        rag_app.embedder_service.embed_query.assert_called_once_with("test query")
 
         # Verify database was queried with embeddings
-        rag_app.db_service.query.assert_called_once_with([0.1, 0.2, 0.3])
+        rag_app.db_service.query.assert_called_once_with(
+            [0.1, 0.2, 0.3],
+            collection_name=DEFAULT_COLLECTION_NAME,
+            query_filter=None,
+        )
 
         # Verify prompt was generated with correct context
         expected_context = "Content from first document\nContent from second document"
@@ -88,11 +105,28 @@ class TestRAGApp(BaseAppTestSetup):
 
         # Verify LLM was called with prompt
         rag_app.llm_service.query.assert_called_once_with(
-            prompt="Generated prompt text"
+            prompt="Generated prompt text", system="System prompt text"
         )
 
         assert result == ["Generated response"]
 
+    @pytest.mark.asyncio
+    async def test_async_query_packs_context(self, rag_app):
+        """Test that repeated chunks are left out of the context and counted"""
+        rag_app.db_service.query.return_value = [
+            Document(title="Doc 1", content="Repeated content"),
+            Document(title="Doc 2", content="Repeated content"),
+        ]
+
+        await rag_app.async_query("test query")
+
+        rag_app.prompt_service.get_prompt.assert_called_once_with(
+            prompt_type="rag_context",
+            context={"question": "test query", "context": "Repeated content"},
+        )
+        assert rag_app.last_context.dropped == 1
+        assert rag_app.last_context.tokens_saved > 0
+
     def test_sync_query_calls_async_version(self, rag_app):
         """Test that sync query method properly calls async version"""
         with patch("asyncio.run") as mock_run:
@@ -103,18 +137,60 @@ class TestRAGApp(BaseAppTestSetup):
     async def test_async_query_with_no_results(self, rag_app):
         """Test query behavior when no documents are found"""
         await rag_app.init()
-        rag_app.embedder_service.embed.return_value = [[0.1, 0.2, 0.3]]
+        rag_app.embedder_service.embed_query.return_value = [0.1, 0.2, 0.3]
         rag_app.db_service.query.return_value = None
 
         result = await rag_app.async_query("test query")
 
         assert result == ["No documents found in the database."]
 
+    @pytest.mark.asyncio
+    async def test_astream_query_yields_tokens(self, rag_app):
+        """Test that the streamed response is yielded token by token"""
+        rag_app.db_service.query.return_value = [
+            Document(title="Doc", content="Content")
+        ]
+
+        tokens = [token async for token in rag_app.astream_query("test query")]
+
+        assert tokens == ["Generated ", "response"]
+        rag_app.embedder_service.embed_query.assert_called_once_with("test query")
+        rag_app.llm_service.stream_query.assert_called_once_with(
+            prompt="Generated prompt text", system="System prompt text"
+        )
+
+    @pytest.mark.asyncio
+    async def test_astream_query_with_no_results(self, rag_app):
+        """Test streaming when no documents are found"""
+        rag_app.db_service.query.return_value = None
+
+        tokens = [token async for token in rag_app.astream_query("test query")]
+
+        assert tokens == ["No documents found in the database."]
+        rag_app.llm_service.stream_query.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_astream_chat_records_the_bare_question(self, rag_app):
+        """Test that chats send the context prompt but record only the question"""
+        rag_app.db_service.query.return_value = [
+            Document(title="Doc", content="Content")
+        ]
+
+        tokens = [token async for token in rag_app.astream_chat("test query")]
+
+        assert tokens == ["Chat ", "response"]
+        rag_app.llm_service.stream_chat.assert_called_once_with(
+            prompt="Generated prompt text",
+            history_prompt="test query",
+            system="System prompt text",
+        )
+        rag_app.llm_service.stream_query.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_async_query_with_llm_no_response(self, rag_app):
         """Test handling of no response from LLM"""
         await rag_app.init()
-        rag_app.embedder_service.embed.return_value = [[0.1, 0.2, 0.3]]
+        rag_app.embedder_service.embed_query.return_value = [0.1, 0.2, 0.3]
         rag_app.db_service.query.return_value = [
             Document(title="Doc", content="Content")
         ]
@@ -1,8 +1,9 @@
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import pytest
 
 from insightvault.app.search import SearchApp
+from insightvault.constants import DEFAULT_COLLECTION_NAME
 from insightvault.models.document import Document
 from tests.unit.app.test_base import BaseAppTestSetup
 
@@ -14,6 +15,7 @@ class TestSearchApp(BaseAppTestSetup):
         mock_db_service,
         mock_splitter_service,
         mock_embedding_service,
+        mock_manifest_service,
         mock_app_config,
     ):
         """Create a search app with mocked services"""
@@ -21,11 +23,13 @@ class TestSearchApp(BaseAppTestSetup):
             patch("insightvault.app.base.ChromaDatabaseService") as mock_db_class,
             patch("insightvault.app.base.SplitterService") as mock_splitter_class,
             patch("insightvault.app.base.EmbeddingService") as mock_embedding_class,
+            patch("insightvault.app.base.ManifestService") as mock_manifest_class,
             patch("insightvault.app.base.BaseApp._get_config") as mock_get_config,
         ):
             mock_db_class.return_value = mock_db_service
             mock_splitter_class.return_value = mock_splitter_service
             mock_embedding_class.return_value = mock_embedding_service
+            mock_manifest_class.return_value = mock_manifest_service
             mock_get_config.return_value = mock_app_config
 
             app = SearchApp()
@@ -36,7 +40,7 @@ class TestSearchApp(BaseAppTestSetup):
         """Test that query returns sorted unique document titles"""
         # Setup mock responses
         await search_app.init()
-        search_app.embedder_service.embed.return_value = [[0.1, 0.2, 0.3]]
+        search_app.embedder_service.embed_query.return_value = [0.1, 0.2, 0.3]
         search_app.db_service.query.return_value = [
             Document(title="Doc B", content="Content B"),
             Document(title="Doc A", content="Content A"),
@@ -46,10 +50,14 @@ class TestSearchApp(BaseAppTestSetup):
         result = await search_app.async_query("test query")
 
         # Verify embeddings were generated
-        search_app.embedder_service.embed.assert_called_once_with(["test query"])
+        search_app.embedder_service.embed_query.assert_called_once_with("test query")
 
         # Verify database was queried with embeddings
-        search_app.db_service.query.assert_called_once_with([0.1, 0.2, 0.3])
+        search_app.db_service.query.assert_called_once_with(
+            [0.1, 0.2, 0.3],
+            collection_name=DEFAULT_COLLECTION_NAME,
+            query_filter=None,
+        )
 
         # Verify results are unique and sorted
         assert result == ["Doc A", "Doc B"]
@@ -58,7 +66,7 @@ class TestSearchApp(BaseAppTestSetup):
     async def test_async_query_with_no_results(self, search_app):
         """Test query behavior when no results are found"""
         await search_app.init()
-        search_app.embedder_service.embed.return_value = [[0.1, 0.2, 0.3]]
+        search_app.embedder_service.embed_query.return_value = [0.1, 0.2, 0.3]
         search_app.db_service.query.return_value = []
 
         result = await search_app.async_query("test query")
@@ -70,9 +78,121 @@ class TestSearchApp(BaseAppTestSetup):
         """Test that query text is preserved in embedding call"""
         complex_query = "What is the meaning of life?"
         await search_app.init()
-        search_app.embedder_service.embed.return_value = [[0.1, 0.2, 0.3]]
+        search_app.embedder_service.embed_query.return_value = [0.1, 0.2, 0.3]
         search_app.db_service.query.return_value = []
 
         await search_app.async_query(complex_query)
 
-        search_app.embedder_service.embed.assert_called_once_with([complex_query])
+        search_app.embedder_service.embed_query.assert_called_once_with(complex_query)
+
+    @pytest.mark.asyncio
+    async def test_async_query_reuses_loaded_services(self, search_app):
+        """Test that repeated queries do not reload the embedding model"""
+        search_app.embedder_service.embed_query.return_value = [0.1, 0.2, 0.3]
+        search_app.db_service.query.return_value = []
+
+        await search_app.async_query("first query")
+        await search_app.async_query("second query")
+
+        search_app.embedder_service.init.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_async_query_many_embeds_queries_in_one_batch(self, search_app):
+        """Test that many queries are embedded and searched with one call each"""
+        await search_app.init()
+        embeddings = [[0.1, 0.2], [0.3, 0.4]]
+        search_app.embedder_service.embed_array.return_value = embeddings
+        search_app.db_service.query_many.return_value = [
+            [
+                Document(title="Doc B", content="Content B"),
+                Document(title="Doc A", content="Content A"),
+            ],
+            [],
+        ]
+
+        result = await search_app.async_query_many(["first query", "second query"])
+
+        search_app.embedder_service.embed_array.assert_called_once_with(
+            ["first query", "second query"]
+        )
+        search_app.embedder_service.embed_query.assert_not_called()
+        search_app.db_service.query_many.assert_called_once_with(
+            embeddings, collection_name=DEFAULT_COLLECTION_NAME, query_filter=None
+        )
+        assert result == [["Doc A", "Doc B"], []]
+
+    @pytest.mark.asyncio
+    async def test_async_query_many_without_queries(self, search_app):
+        """Test that no queries give no results without touching the services"""
+        result = await search_app.async_query_many([])
+
+        assert result == []
+        search_app.db_service.query_many.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_identifier_query_skips_embedder(self, search_app):
+        """Test that identifier-like queries are answered from the keyword index"""
+        search_app.keyword_service = Mock()
+        search_app.keyword_service.search.return_value = ["2"]
+        search_app.db_service.get_documents_by_ids.return_value = [
+            Document(id="2", title="Error codes", content="ERR-1234 means ...")
+        ]
+
+        result = await search_app.async_query("ERR-1234")
+
+        assert result == ["Error codes"]
+        search_app.db_service.get_documents_by_ids.assert_called_once_with(
+            ["2"], collection_name=DEFAULT_COLLECTION_NAME
+        )
+        search_app.embedder_service.embed_query.assert_not_called()
+        search_app.db_service.query.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_query_fuses_keyword_and_vector_results(self, search_app):
+        """Test that keyword matches are fused with the vector search results"""
+        search_app.keyword_service = Mock()
+        search_app.keyword_service.search.return_value = ["3", "1"]
+        search_app.db_service.query.return_value = [
+            Document(id="1", title="Doc A", content="Content A"),
+            Document(id="2", title="Doc B", content="Content B"),
+        ]
+        search_app.db_service.get_documents_by_ids.return_value = [
+            Document(id="3", title="Doc C", content="Content C")
+        ]
+
+        documents = await search_app._retrieve("what does ERR-1234 mean")
+
+        assert [doc.id for doc in documents] == ["1", "3", "2"]
+        search_app.embedder_service.embed_query.assert_called_once()
+        search_app.db_service.get_documents_by_ids.assert_called_once_with(
+            ["3"], collection_name=DEFAULT_COLLECTION_NAME
+        )
+
+    @pytest.mark.asyncio
+    async def test_query_merges_collections_by_distance(self, search_app):
+        """Test that collections are queried in parallel and merged by distance"""
+        results = {
+            "docs": [
+                Document(id="1", title="Doc 1", content="1", distance=0.1),
+                Document(id="3", title="Doc 3", content="3", distance=0.3),
+            ],
+            "code": [
+                Document(id="2", title="Doc 2", content="2", distance=0.2),
+                Document(id="4", title="Doc 4", content="4", distance=0.4),
+            ],
+        }
+        search_app.db_service.query.side_effect = (
+            lambda embedding, collection_name, query_filter: results[collection_name]
+        )
+        search_app.config.database.max_num_results = 3
+
+        documents = await search_app._retrieve(
+            "test query", collection_names=["docs", "code"]
+        )
+
+        assert [doc.id for doc in documents] == ["1", "2", "3"]
+        search_app.embedder_service.embed_query.assert_called_once_with("test query")
+        assert {
+            call.kwargs["collection_name"]
+            for call in search_app.db_service.query.call_args_list
+        } == {"docs", "code"}
@@ -0,0 +1,342 @@
+import asyncio
+import os
+import time
+from http import HTTPStatus
+from unittest.mock import AsyncMock, Mock, patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from insightvault.app.server import create_app
+from insightvault.constants import DEFAULT_COLLECTION_NAME
+from insightvault.models.config import DatabaseConfig
+from insightvault.models.database import QueryFilter
+from insightvault.models.document import Document
+from insightvault.models.ingestion import IngestionProgress
+from tests.unit import BaseTest
+from tests.unit.app.test_base import async_items
+
+
+class TestServer(BaseTest):
+    @pytest.fixture
+    def mock_apps(self, mock_app_config):
+        """Patch the apps used by the server with mocks"""
+        with (
+            patch("insightvault.app.server.SearchApp") as mock_search_class,
+            patch("insightvault.app.server.RAGApp") as mock_rag_class,
+            patch("insightvault.app.server.SummarizerApp") as mock_summarizer_class,
+        ):
+            search_app = mock_search_class.return_value
+            search_app.config = mock_app_config
+            search_app.init = AsyncMock()
+            search_app.async_query = AsyncMock(return_value=["Doc A", "Doc B"])
+            search_app.async_add_documents = AsyncMock(
+                return_value=IngestionProgress(documents=2, chunks=3, elapsed=0.1)
+            )
+            rag_app = mock_rag_class.return_value
+            rag_app.init = AsyncMock()
+            rag_app.init_duration = 1.5
+            rag_app.async_query = AsyncMock(return_value=["Chat answer"])
+            summarizer_app = mock_summarizer_class.return_value
+            summarizer_app.init = AsyncMock()
+            summarizer_app.async_summarize = AsyncMock(return_value="Summary")
+            yield Mock(search=search_app, rag=rag_app, summarizer=summarizer_app)
+
+    @pytest.fixture
+    def client(self, mock_apps):
+        """Create a test client, running the startup of the server"""
+        with TestClient(create_app(config_path="./tests/mocks/mock_config.yaml")) as c:
+            yield c
+
+    @pytest.fixture
+    def daemon_client(self, mock_apps):
+        """Create a test client of the daemon app"""
+        app = create_app(config_path="./tests/mocks/mock_config.yaml", daemon=True)
+        with TestClient(app) as c:
+            yield c
+
+    def test_apps_are_initialized_once_at_startup(self, client, mock_apps):
+        """Test that the models are loaded at startup, not per request"""
+        client.post("/search", json={"query": "first"})
+        client.post("/search", json={"query": "second"})
+
+        mock_apps.search.init.assert_called_once()
+        mock_apps.rag.init.assert_called_once()
+        mock_apps.summarizer.init.assert_called_once()
+
+    def test_apps_share_services(self, mock_apps):
+        """Test that the RAG and summarizer apps use the search app services"""
+        create_app()
+
+        assert mock_apps.rag.db_service is mock_apps.search.db_service
+        assert mock_apps.rag.embedder_service is mock_apps.search.embedder_service
+        assert mock_apps.summarizer.llm_service is mock_apps.rag.llm_service
+
+    def test_shared_services_are_loaded_once(self, mock_app_config, tmp_path):
+        """Test that the concurrent startup of the apps loads each model once"""
+        mock_app_config.database = DatabaseConfig(path=str(tmp_path / "db"))
+
+        def load_slowly(*args):
+            # Keeps the first load running while the other apps initialize
+            time.sleep(0.05)
+            return Mock()
+
+        with (
+            patch("insightvault.app.base.ChromaDatabaseService"),
+            patch("insightvault.app.base.BaseApp._get_config") as mock_get_config,
+            patch(
+                "insightvault.services.embedding.SentenceTransformer",
+                side_effect=load_slowly,
+            ) as mock_transformer,
+            patch(
+                "insightvault.services.llm.AsyncClient", side_effect=load_slowly
+            ) as mock_client,
+        ):
+            mock_get_config.return_value = mock_app_config
+            with TestClient(create_app()):
+                pass
+
+        mock_transformer.assert_called_once()
+        mock_client.assert_called_once()
+
+    def test_query_embeddings_are_coalesced(self, mock_apps, mock_app_config):
+        """Test that the server enables coalescing of query embeddings"""
+        create_app()
+
+        assert (
+            mock_apps.search.embedder_service.config.coalesce_window
+            == mock_app_config.server.coalesce_window
+        )
+
+    def test_health(self, client):
+        response = client.get("/health")
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            "status": "ok",
+            "init_duration": 1.5,
+            "pid": os.getpid(),
+        }
+
+    def test_search(self, client, mock_apps):
+        response = client.post("/search", json={"query": "test query"})
+
+        assert response.json() == {"results": ["Doc A", "Doc B"]}
+        mock_apps.search.async_query.assert_called_once_with(
+            "test query",
+            query_filter=None,
+            collection_names=[DEFAULT_COLLECTION_NAME],
+        )
+
+    def test_search_with_filter(self, client, mock_apps):
+        response = client.post(
+            "/search", json={"query": "test query", "filter": {"type": "note"}}
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        mock_apps.search.async_query.assert_called_once_with(
+            "test query",
+            query_filter=QueryFilter(type="note"),
+            collection_names=[DEFAULT_COLLECTION_NAME],
+        )
+
+    def test_chat(self, client, mock_apps):
+        response = client.post("/chat", json={"query": "test question"})
+
+        assert response.json() == {"response": "Chat answer"}
+        mock_apps.rag.async_query.assert_called_once_with(
+            "test question",
+            query_filter=None,
+            collection_names=[DEFAULT_COLLECTION_NAME],
+        )
+
+    def test_summarize(self, client, mock_apps):
+        response = client.post("/summarize", json={"text": "Long text"})
+
+        assert response.json() == {"summary": "Summary"}
+        mock_apps.summarizer.async_summarize.assert_called_once_with("Long text")
+
+    def test_add_documents(self, client, mock_apps):
+        response = client.post(
+            "/documents",
+            json={
+                "documents": [
+                    {"title": "Doc 1", "content": "Content 1"},
+                    {"title": "Doc 2", "content": "Content 2", "metadata": {"a": 1}},
+                ]
+            },
+        )
+
+        expected_num_chunks = 3
+        assert response.json()["chunks"] == expected_num_chunks
+        documents = mock_apps.search.async_add_documents.call_args[0][0]
+        assert [doc.title for doc in documents] == ["Doc 1", "Doc 2"]
+        assert documents[1].metadata == {"a": 1}
+
+    def test_chat_stream(self, client, mock_apps):
+        """Test that the chat response is streamed as plain text"""
+        mock_apps.rag.astream_query = Mock(return_value=async_items("Chat ", "answer"))
+
+        response = client.post("/chat/stream", json={"query": "test question"})
+
+        assert response.text == "Chat answer"
+        mock_apps.rag.astream_query.assert_called_once_with(
+            "test question",
+            query_filter=None,
+            collection_names=[DEFAULT_COLLECTION_NAME],
+        )
+
+    def test_add_directory(self, daemon_client, mock_apps):
+        mock_apps.search.async_add_directory = AsyncMock(
+            return_value=IngestionProgress(documents=4, chunks=9, elapsed=0.2)
+        )
+
+        response = daemon_client.post(
+            "/directories", json={"path": "/notes", "include": ["*.md"]}
+        )
+
+        assert response.json()["documents"] == len(["a", "b", "c", "d"])
+        mock_apps.search.async_add_directory.assert_called_once_with(
+            "/notes",
+            include=["*.md"],
+            exclude=[],
+            collection_name=DEFAULT_COLLECTION_NAME,
+        )
+
+    def test_list_documents(self, client, mock_apps):
+        """Test that documents are listed without their contents"""
+        mock_apps.search.aiter_documents = Mock(
+            return_value=async_items(
+                Document(id="1", title="Doc 1", content="", metadata={"title": "A"})
+            )
+        )
+
+        response = client.get(
+            "/documents", params={"limit": 1, "offset": 2, "collection": "code"}
+        )
+
+        assert response.json() == {
+            "documents": [{"id": "1", "metadata": {"title": "A"}}]
+        }
+        mock_apps.search.aiter_documents.assert_called_once_with(
+            limit=1, offset=2, include=("metadatas",), collection_name="code"
+        )
+
+    def test_delete_all_documents(self, daemon_client, mock_apps):
+        mock_apps.search.async_delete_all_documents = AsyncMock()
+
+        response = daemon_client.delete("/documents", params={"collection": "code"})
+
+        assert response.status_code == HTTPStatus.OK
+        mock_apps.search.async_delete_all_documents.assert_called_once_with(
+            collection_name="code"
+        )
+
+    def test_daemon_routes_are_not_served(self, client, mock_apps):
+        """Test that the server does not read its files or delete documents"""
+        mock_apps.search.async_add_directory = AsyncMock()
+        mock_apps.search.async_delete_all_documents = AsyncMock()
+
+        added = client.post("/directories", json={"path": "/"})
+        deleted = client.delete("/documents")
+
+        assert added.status_code == HTTPStatus.NOT_FOUND
+        assert deleted.status_code == HTTPStatus.METHOD_NOT_ALLOWED
+        mock_apps.search.async_add_directory.assert_not_called()
+        mock_apps.search.async_delete_all_documents.assert_not_called()
+
+    def test_invalid_collection_names_are_rejected(self, daemon_client, mock_apps):
+        """Test that collection names cannot point outside the database"""
+        mock_apps.search.async_delete_all_documents = AsyncMock()
+
+        deleted = daemon_client.delete(
+            "/documents", params={"collection": "../../../x"}
+        )
+        searched = daemon_client.post(
+            "/search", json={"query": "test", "collections": ["a/b"]}
+        )
+
+        assert deleted.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert searched.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        mock_apps.search.async_delete_all_documents.assert_not_called()
+
+    def test_count_sources(self, client, mock_apps):
+        mock_apps.search.async_count_documents_by_source = AsyncMock(
+            return_value={"a.md": 2}
+        )
+
+        response = client.get("/sources")
+
+        assert response.json() == {"sources": {"a.md": 2}}
+
+    def test_invalid_request(self, client):
+        response = client.post("/search", json={})
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    def test_concurrent_requests_are_limited(self, mock_apps, mock_app_config):
+        """Test that no more than the configured number of requests run at once"""
+        mock_app_config.server.max_concurrent_requests = 2
+        running = 0
+        max_running = 0
+
+        async def slow_query(query, query_filter=None, collection_names=()):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+            return [query]
+
+        mock_apps.search.async_query.side_effect = slow_query
+        app = create_app()
+
+        async def send_requests():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                await asyncio.gather(
+                    *(client.post("/search", json={"query": str(i)}) for i in range(6))
+                )
+
+        asyncio.run(send_requests())
+
+        assert max_running == mock_app_config.server.max_concurrent_requests
+
+    def test_streamed_responses_hold_their_slot(self, mock_apps, mock_app_config):
+        """Test that a streamed response is counted until its stream has finished"""
+        mock_app_config.server.max_concurrent_requests = 1
+        events = []
+
+        async def stream_tokens(*args, **kwargs):
+            for token in ("a", "b"):
+                await asyncio.sleep(0.05)
+                events.append(f"token {token}")
+                yield token
+
+        async def query(query, query_filter=None, collection_names=()):
+            events.append("search")
+            return [query]
+
+        mock_apps.rag.astream_query = Mock(side_effect=stream_tokens)
+        mock_apps.search.async_query.side_effect = query
+        app = create_app()
+
+        async def send_requests():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                stream = asyncio.create_task(
+                    client.post("/chat/stream", json={"query": "test"})
+                )
+                await asyncio.sleep(0.01)
+                await client.post("/search", json={"query": "test"})
+                return await stream
+
+        response = asyncio.run(send_requests())
+
+        assert response.text == "ab"
+        assert events == ["token a", "token b", "search"]
@@ -1,9 +1,13 @@
+import asyncio
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
+from pydantic import ValidationError
 
 from insightvault.app.summarizer import SummarizerApp
-from tests.unit.app.test_base import BaseAppTestSetup
+from insightvault.models.config import SplitterConfig, SummarizerConfig
+from insightvault.services.splitter import SplitterService
+from tests.unit.app.test_base import BaseAppTestSetup, async_items
 
 
 class TestSummarizerApp(BaseAppTestSetup):
@@ -12,6 +16,9 @@ class TestSummarizerApp(BaseAppTestSetup):
         """Create a mock LLM service"""
         service = AsyncMock()
         service.query = AsyncMock(return_value="Summarized text")
+        service.stream_query = Mock(
+            side_effect=lambda prompt: async_items("Summarized ", "text")
+        )
         return service
 
     @pytest.fixture
@@ -27,6 +34,7 @@ class TestSummarizerApp(BaseAppTestSetup):
         mock_db_service,
         mock_splitter_service,
         mock_embedding_service,
+        mock_manifest_service,
         mock_llm_service,
         mock_prompt_service,
         mock_app_config,
@@ -36,6 +44,7 @@ class TestSummarizerApp(BaseAppTestSetup):
             patch("insightvault.app.base.ChromaDatabaseService") as mock_db_class,
             patch("insightvault.app.base.SplitterService") as mock_splitter_class,
             patch("insightvault.app.base.EmbeddingService") as mock_embedding_class,
+            patch("insightvault.app.base.ManifestService") as mock_manifest_class,
             patch("insightvault.app.summarizer.OllamaLLMService") as mock_llm_class,
             patch("insightvault.app.summarizer.PromptService") as mock_prompt_class,
             patch("insightvault.app.base.BaseApp._get_config") as mock_get_config,
@@ -43,6 +52,7 @@ class TestSummarizerApp(BaseAppTestSetup):
             mock_db_class.return_value = mock_db_service
             mock_splitter_class.return_value = mock_splitter_service
             mock_embedding_class.return_value = mock_embedding_service
+            mock_manifest_class.return_value = mock_manifest_service
             mock_llm_class.return_value = mock_llm_service
             mock_prompt_class.return_value = mock_prompt_service
             mock_get_config.return_value = mock_app_config
@@ -69,6 +79,18 @@ class TestSummarizerApp(BaseAppTestSetup):
 
         assert result == "Summarized text"
 
+    @pytest.mark.asyncio
+    async def test_astream_summarize_yields_tokens(self, summarizer_app):
+        """Test that the streamed summary is yielded token by token"""
+        tokens = [
+            token async for token in summarizer_app.astream_summarize("Some text")
+        ]
+
+        assert tokens == ["Summarized ", "text"]
+        summarizer_app.llm_service.stream_query.assert_called_once_with(
+            prompt="Generated prompt text"
+        )
+
     @pytest.mark.asyncio
     async def test_async_summarize_preserves_text(self, summarizer_app):
         """Test that original text is preserved in prompt generation"""
@@ -110,3 +132,81 @@ class TestSummarizerApp(BaseAppTestSetup):
             prompt_type="summarize_text",
             context={"text": long_text},
         )
+
+    @pytest.fixture
+    def map_reduce_app(self, summarizer_app):
+        """Create a summarizer app that splits texts into small chunks"""
+        summarizer_app.summary_splitter_service = SplitterService(
+            config=SplitterConfig(chunk_size=32, chunk_overlap=0)
+        )
+        return summarizer_app
+
+    @pytest.mark.asyncio
+    async def test_async_summarize_map_reduces_long_text(self, map_reduce_app):
+        """Test that chunks are summarized and the summaries merged"""
+        long_text = " ".join(f"word{i}" for i in range(60))
+        num_chunks = len(map_reduce_app._split(long_text))
+        map_reduce_app.llm_service.query.return_value = "Partial summary"
+
+        result = await map_reduce_app.async_summarize(long_text)
+
+        assert result == "Partial summary"
+        assert map_reduce_app.llm_service.query.call_count == num_chunks + 1
+        map_reduce_app.prompt_service.get_prompt.assert_called_with(
+            prompt_type="merge_summaries",
+            context={"summaries": "\n\n".join(["Partial summary"] * num_chunks)},
+        )
+
+    @pytest.mark.asyncio
+    async def test_async_summarize_merges_recursively(self, map_reduce_app):
+        """Test that partial summaries longer than one chunk are reduced again"""
+        long_text = " ".join(f"word{i}" for i in range(200))
+        map_reduce_app.llm_service.query.return_value = "Partial summary"
+
+        await map_reduce_app.async_summarize(long_text)
+
+        summaries = map_reduce_app.prompt_service.get_prompt.call_args.kwargs[
+            "context"
+        ]["summaries"]
+        assert len(map_reduce_app._split(summaries)) == 1
+        assert len(map_reduce_app._split(long_text)) > summaries.count("Partial")
+
+    @pytest.mark.asyncio
+    async def test_async_summarize_limits_concurrency(self, map_reduce_app):
+        """Test that at most `max_concurrency` chunks are summarized at once"""
+        map_reduce_app.config.summarizer.max_concurrency = 2
+        running = 0
+        max_running = 0
+
+        async def query(prompt):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return "Partial summary"
+
+        map_reduce_app.llm_service.query.side_effect = query
+
+        await map_reduce_app.async_summarize(" ".join(["word"] * 500))
+
+        assert max_running == map_reduce_app.config.summarizer.max_concurrency
+
+    @pytest.mark.asyncio
+    async def test_async_summarize_without_map_reduce(self, map_reduce_app):
+        """Test that disabling map-reduce summarizes the text in one call"""
+        map_reduce_app.config.summarizer.map_reduce = False
+        long_text = " ".join(f"word{i}" for i in range(200))
+
+        await map_reduce_app.async_summarize(long_text)
+
+        map_reduce_app.llm_service.query.assert_called_once()
+        map_reduce_app.prompt_service.get_prompt.assert_called_once_with(
+            prompt_type="summarize_text",
+            context={"text": long_text},
+        )
+
+    def test_max_depth_must_be_positive(self):
+        """Test that map-reduce needs at least one round of partial summaries"""
+        with pytest.raises(ValidationError):
+            SummarizerConfig(max_depth=0)
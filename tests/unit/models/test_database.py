@@ -0,0 +1,40 @@
+import pytest
+from pydantic import ValidationError
+
+from insightvault.models.database import QueryFilter, validate_collection_name
+
+
+class TestQueryFilter:
+    def test_metadata_contains_only_set_fields(self):
+        """Test that unset fields are not part of the metadata filter"""
+        query_filter = QueryFilter(source="a.md", type="note", contains="sky")
+
+        assert query_filter.metadata() == {"source": "a.md", "type": "note"}
+
+    def test_matches_requires_all_fields(self):
+        """Test that a document must match every set field"""
+        query_filter = QueryFilter(source="a.md", contains="sky")
+
+        assert query_filter.matches({"source": "a.md"}, "The sky is blue")
+        assert not query_filter.matches({"source": "b.md"}, "The sky is blue")
+        assert not query_filter.matches({"source": "a.md"}, "The sea is blue")
+        assert QueryFilter().matches({}, "Anything")
+
+    def test_filters_are_hashable_and_frozen(self):
+        """Test that filters can be used as cache keys"""
+        assert hash(QueryFilter(title="A")) == hash(QueryFilter(title="A"))
+        with pytest.raises(ValidationError):
+            QueryFilter(title="A").title = "B"
+
+
+class TestCollectionName:
+    @pytest.mark.parametrize("name", ["default", "my-docs_2", "a.b"])
+    def test_valid_names(self, name):
+        assert validate_collection_name(name) == name
+
+    @pytest.mark.parametrize(
+        "name", ["../../victim", "a/b", "a\\b", "a..b", ".hidden", "ab", "x" * 64]
+    )
+    def test_invalid_names(self, name):
+        with pytest.raises(ValueError, match="Invalid collection name"):
+            validate_collection_name(name)
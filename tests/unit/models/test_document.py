@@ -0,0 +1,27 @@
+import numpy as np
+
+from insightvault.models.document import Document
+
+
+class TestDocument:
+    def test_embedding_accepts_numpy_array(self):
+        """Test that a NumPy embedding is stored without conversion"""
+        embedding = np.array([0.1, 0.2], dtype=np.float32)
+
+        document = Document(title="Doc", content="Content", embedding=embedding)
+
+        assert document.embedding is embedding
+
+    def test_embedding_accepts_list(self):
+        """Test that a list embedding is still accepted"""
+        document = Document(title="Doc", content="Content", embedding=[0.1, 0.2])
+
+        assert document.embedding == [0.1, 0.2]
+
+    def test_numpy_embedding_is_serialized_as_list(self):
+        """Test that NumPy embeddings are serialized to JSON as lists"""
+        embedding = np.array([0.5, 0.25], dtype=np.float32)
+        document = Document(title="Doc", content="Content", embedding=embedding)
+
+        assert document.model_dump()["embedding"] == [0.5, 0.25]
+        assert '"embedding":[0.5,0.25]' in document.model_dump_json()
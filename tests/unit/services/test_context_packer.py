@@ -0,0 +1,118 @@
+from insightvault.models.config import LlmConfig
+from insightvault.models.document import Document
+from insightvault.services.context_packer import ContextPackerService, overlap
+
+SHARED = "The overlap of both chunks. "
+
+
+def chunk(content, index, source="doc.md", doc_id=None):
+    return Document(
+        id=doc_id or f"{source}-{index}",
+        title=source,
+        content=content,
+        metadata={"source": source, "chunk_index": str(index)},
+    )
+
+
+class TestOverlap:
+    def test_longest_shared_text(self):
+        assert overlap(f"First part. {SHARED}", f"{SHARED}Second part.") == len(SHARED)
+
+    def test_short_matches_are_not_overlap(self):
+        assert overlap("Ends with the word", "word starts this") == 0
+
+
+class TestContextPackerService:
+    def test_adjacent_chunks_are_joined_without_overlap(self):
+        """Test that the text shared by adjacent chunks is only kept once"""
+        packer = ContextPackerService(LlmConfig())
+        documents = [
+            chunk(f"{SHARED}Second part.", 1),
+            chunk(f"First part. {SHARED}", 0),
+        ]
+
+        packed = packer.pack(documents)
+
+        assert packed.text == f"First part. {SHARED}Second part."
+        assert packed.document_ids == ["doc.md-1", "doc.md-0"]
+        assert packed.tokens_saved > 0
+
+    def test_chunks_without_overlap_are_not_joined(self):
+        """Test that a stale chunk index does not join unrelated chunks"""
+        packer = ContextPackerService(LlmConfig())
+        documents = [
+            chunk("Moved chunk.", 5),
+            chunk("Unrelated chunk.", 7, source="other.md"),
+            chunk("Stale neighbour.", 4),
+        ]
+
+        packed = packer.pack(documents)
+
+        assert packed.text == "Moved chunk.\nUnrelated chunk.\nStale neighbour."
+
+    def test_shared_text_counts_once_against_budget(self):
+        """Test that a chunk fits if only its text beyond the overlap fits"""
+        first = f"{'a' * 12}{SHARED}"
+        second = f"{SHARED}{'b' * 12}"
+        budget = (len(first) + len(second) - len(SHARED)) // 4 + 1
+        packer = ContextPackerService(LlmConfig(context_max_tokens=budget))
+        documents = [chunk(first, 0), chunk(second, 1), chunk("c" * 4, 3)]
+
+        packed = packer.pack(documents)
+
+        assert packed.document_ids == ["doc.md-0", "doc.md-1"]
+        assert packed.text == f"{'a' * 12}{SHARED}{'b' * 12}"
+        assert packed.tokens <= budget
+
+    def test_passages_are_ordered_by_rank(self):
+        """Test that the passage of the best chunk comes first"""
+        packer = ContextPackerService(LlmConfig())
+        documents = [
+            chunk("Best chunk.", 4, source="b.md"),
+            chunk("Second chunk.", 0, source="a.md"),
+        ]
+
+        packed = packer.pack(documents)
+
+        assert packed.text == "Best chunk.\nSecond chunk."
+
+    def test_repeated_chunks_are_dropped(self):
+        packer = ContextPackerService(LlmConfig())
+        documents = [
+            chunk("Same text.", 0, source="a.md"),
+            chunk("Same text.", 0, source="b.md"),
+        ]
+
+        packed = packer.pack(documents)
+
+        assert packed.text == "Same text."
+        assert packed.dropped == 1
+
+    def test_chunks_over_budget_are_skipped(self):
+        """Test that chunks that do not fit are skipped and smaller ones taken"""
+        packer = ContextPackerService(LlmConfig(context_max_tokens=10))
+        documents = [
+            chunk("a" * 24, 0, source="a.md"),
+            chunk("b" * 24, 0, source="b.md"),
+            chunk("c" * 8, 0, source="c.md"),
+        ]
+
+        packed = packer.pack(documents)
+
+        assert packed.document_ids == ["a.md-0", "c.md-0"]
+        assert packed.tokens <= packer.config.context_max_tokens
+        assert packed.dropped == 1
+
+    def test_best_chunk_is_cut_when_nothing_fits(self):
+        packer = ContextPackerService(LlmConfig(context_max_tokens=2))
+
+        packed = packer.pack([chunk("a" * 100, 0)])
+
+        assert packed.text == "a" * 8
+        assert packed.document_ids == ["doc.md-0"]
+
+    def test_no_documents(self):
+        packed = ContextPackerService(LlmConfig()).pack([])
+
+        assert packed.text == ""
+        assert packed.tokens_saved == 0
@@ -1,8 +1,12 @@
+import time
 from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest
 
-from insightvault.models.database import DistanceFunction
+from insightvault.models.config import CollectionConfig
+from insightvault.models.database import DistanceFunction, QueryFilter
+from insightvault.models.document import Document
 from insightvault.services.database import ChromaDatabaseService
 from tests.unit import BaseTest
 
@@ -12,7 +16,8 @@ class TestChromaDatabaseService(BaseTest):
     def mock_collection(self):
         """Create a mock Chroma collection"""
         collection = Mock()
-        collection.add = Mock()
+        collection.upsert = Mock()
+        collection.delete = Mock()
         collection.query = Mock()
         collection.get = Mock()
         return collection
@@ -66,40 +71,265 @@ class TestChromaDatabaseService(BaseTest):
 
         await service.add_documents(sample_documents)
 
-        mock_collection.add.assert_called_once_with(
-            documents=[doc.content for doc in sample_documents],
-            metadatas=[doc.metadata for doc in sample_documents],
-            embeddings=[doc.embedding for doc in sample_documents],
-            ids=[doc.id for doc in sample_documents],
+        call = mock_collection.upsert.call_args
+        assert call.kwargs["documents"] == [doc.content for doc in sample_documents]
+        assert call.kwargs["metadatas"] == [doc.metadata for doc in sample_documents]
+        assert call.kwargs["ids"] == [doc.id for doc in sample_documents]
+        embeddings = call.kwargs["embeddings"]
+        assert embeddings.dtype == np.float32
+        np.testing.assert_allclose(
+            embeddings, [doc.embedding for doc in sample_documents], rtol=1e-6
         )
 
+    @pytest.mark.asyncio
+    async def test_add_documents_with_numpy_embeddings(
+        self, db_service, mock_collection
+    ):
+        """Test that NumPy embeddings are passed on as one float32 array"""
+        batch = np.array([[0.1, 0.2], [0.3, 0.4]], dtype=np.float32)
+        documents = [
+            Document(title=f"Doc {i}", content="Content", embedding=row)
+            for i, row in enumerate(batch)
+        ]
+        service = await db_service
+        service.client.get_or_create_collection.return_value = mock_collection
+
+        await service.add_documents(documents)
+
+        embeddings = mock_collection.upsert.call_args.kwargs["embeddings"]
+        assert embeddings.shape == batch.shape
+        np.testing.assert_array_equal(embeddings, batch)
+
     @pytest.mark.asyncio
     async def test_query_returns_documents(self, db_service, mock_collection):
-        """Test querying documents"""
+        """Test that a query fetches distances first and contents only for hits"""
         mock_collection.query.return_value = {
-            "ids": [["1"]],
-            "documents": [["Content"]],
-            "metadatas": [[{"title": "Doc", "source": "test"}]],
-            "distances": [[0.95]],
-            "embeddings": [[[0.1, 0.2, 0.3]]],
-            "data": [
-                [
-                    {
-                        "id": "1",
-                        "content": "Content",
-                        "metadata": {"title": "Doc", "source": "test"},
-                    }
-                ]
-            ],
+            "ids": [["1", "2"]],
+            "distances": [[0.05, 0.1]],
+            "documents": None,
+            "metadatas": None,
+            "embeddings": None,
+        }
+        mock_collection.get.return_value = {
+            "ids": ["2", "1"],
+            "documents": ["Content 2", "Content"],
+            "metadatas": [{"title": "Doc 2"}, {"title": "Doc", "source": "test"}],
         }
         service = await db_service
         service.client.get_collection.return_value = mock_collection
 
         results = await service.query([0.1, 0.2, 0.3])
 
-        assert len(results) == 1
+        assert [doc.id for doc in results] == ["1", "2"]
         assert results[0].title == "Doc"
         assert results[0].content == "Content"
+        query_call = mock_collection.query.call_args.kwargs
+        assert query_call["include"] == ["distances"]
+        assert query_call["n_results"] == (
+            service.config.max_num_results * service.config.query_overfetch
+        )
+        mock_collection.get.assert_called_once_with(
+            ids=["1", "2"], include=["documents", "metadatas"]
+        )
+
+    @pytest.mark.asyncio
+    async def test_query_without_filtering_fetches_contents(
+        self, db_service, mock_collection
+    ):
+        """Test that an unfiltered query fetches contents in the same call"""
+        mock_collection.query.return_value = {
+            "ids": [["1"]],
+            "documents": [["Content"]],
+            "metadatas": [[{"title": "Doc"}]],
+            "distances": [[0.95]],
+        }
+        service = await db_service
+        service.client.get_collection.return_value = mock_collection
+
+        results = await service.query([0.1, 0.2, 0.3], filter_docs=False)
+
+        assert [doc.title for doc in results] == ["Doc"]
+        assert mock_collection.query.call_args.kwargs["n_results"] == (
+            service.config.max_num_results
+        )
+        mock_collection.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_query_many_issues_single_query(self, db_service, mock_collection):
+        """Test that many queries share one Chroma query and one get"""
+        mock_collection.query.return_value = {
+            "ids": [["1", "2"], ["2", "3"]],
+            "distances": [[0.05, 1.9], [0.1, 0.2]],
+        }
+        mock_collection.get.return_value = {
+            "ids": ["1", "2", "3"],
+            "documents": ["Content 1", "Content 2", "Content 3"],
+            "metadatas": [{"title": "Doc 1"}, {"title": "Doc 2"}, {"title": "Doc 3"}],
+        }
+        service = await db_service
+        service.client.get_collection.return_value = mock_collection
+        query_embeddings = np.array([[0.1, 0.2], [0.3, 0.4]], dtype=np.float32)
+
+        results = await service.query_many(query_embeddings)
+
+        assert [[doc.id for doc in docs] for docs in results] == [["1"], ["2", "3"]]
+        mock_collection.query.assert_called_once()
+        np.testing.assert_array_equal(
+            mock_collection.query.call_args.kwargs["query_embeddings"],
+            query_embeddings,
+        )
+        mock_collection.get.assert_called_once_with(
+            ids=["1", "2", "3"], include=["documents", "metadatas"]
+        )
+
+    @pytest.mark.asyncio
+    async def test_query_many_without_filtering(self, db_service, mock_collection):
+        """Test that unfiltered queries return the contents of each query"""
+        mock_collection.query.return_value = {
+            "ids": [["1"], ["2"]],
+            "documents": [["Content 1"], ["Content 2"]],
+            "metadatas": [[{"title": "Doc 1"}], [{"title": "Doc 2"}]],
+            "distances": [[0.1], [1.5]],
+        }
+        service = await db_service
+        service.client.get_collection.return_value = mock_collection
+
+        results = await service.query_many([[0.1, 0.2], [0.3, 0.4]], filter_docs=False)
+
+        assert [[doc.title for doc in docs] for docs in results] == [
+            ["Doc 1"],
+            ["Doc 2"],
+        ]
+        mock_collection.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_query_passes_filter_to_chroma(self, db_service, mock_collection):
+        """Test that the query filter becomes Chroma where clauses"""
+        mock_collection.query.return_value = {"ids": [[]], "distances": [[]]}
+        service = await db_service
+        service.client.get_collection.return_value = mock_collection
+
+        results = await service.query(
+            [0.1, 0.2, 0.3],
+            query_filter=QueryFilter(source="a.md", type="note", contains="sky"),
+        )
+
+        assert results == []
+        query_call = mock_collection.query.call_args.kwargs
+        assert query_call["where"] == {"$and": [{"source": "a.md"}, {"type": "note"}]}
+        assert query_call["where_document"] == {"$contains": "sky"}
+        mock_collection.get.assert_not_called()
+
+    def test_where_with_single_condition(self, mock_database_config):
+        """Test that a single metadata condition is not wrapped in `$and`"""
+        service = ChromaDatabaseService(config=mock_database_config)
+
+        assert service._where(QueryFilter(title="Doc")) == {"title": "Doc"}
+        assert service._where(QueryFilter(contains="sky")) is None
+        assert service._where(None) is None
+        assert service._where_document(QueryFilter(title="Doc")) is None
+
+    @pytest.mark.asyncio
+    async def test_get_documents_by_ids(self, db_service, mock_collection):
+        """Test that documents are returned in the order of the ids"""
+        mock_collection.get.return_value = {
+            "ids": ["b", "a"],
+            "documents": ["Content B", "Content A"],
+            "metadatas": [{"title": "B"}, {"title": "A"}],
+        }
+        service = await db_service
+        service.client.get_collection.return_value = mock_collection
+
+        documents = await service.get_documents_by_ids(["a", "missing", "b"])
+
+        assert [doc.id for doc in documents] == ["a", "b"]
+        assert await service.get_documents_by_ids([]) == []
+
+    @pytest.mark.asyncio
+    async def test_repeated_query_is_cached(self, db_service, mock_collection):
+        """Test that a repeated query is answered from the result cache"""
+        mock_collection.query.return_value = {
+            "ids": [["1"]],
+            "documents": [["Content"]],
+            "metadatas": [[{"title": "Doc"}]],
+            "distances": [[0.05]],
+            "embeddings": None,
+            "data": None,
+        }
+        mock_collection.get.return_value = {
+            "ids": ["1"],
+            "documents": ["Content"],
+            "metadatas": [{"title": "Doc"}],
+        }
+        service = await db_service
+        service.client.get_collection.return_value = mock_collection
+
+        first = await service.query([0.1, 0.2, 0.3])
+        second = await service.query([0.1, 0.2, 0.3])
+
+        mock_collection.query.assert_called_once()
+        assert [doc.id for doc in second] == [doc.id for doc in first]
+        assert service.query_cache.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_cached_results_are_copies(self, db_service, mock_collection):
+        """Test that changing a returned document does not change the cache"""
+        mock_collection.query.return_value = {
+            "ids": [["1"]],
+            "documents": [["Content"]],
+            "metadatas": [[{"title": "Doc"}]],
+            "distances": [[0.05]],
+            "embeddings": None,
+            "data": None,
+        }
+        mock_collection.get.return_value = {
+            "ids": ["1"],
+            "documents": ["Content"],
+            "metadatas": [{"title": "Doc"}],
+        }
+        service = await db_service
+        service.client.get_collection.return_value = mock_collection
+
+        [first] = await service.query([0.1, 0.2, 0.3])
+        first.content = "Changed"
+        first.metadata["title"] = "Changed"
+        [second] = await service.query([0.1, 0.2, 0.3])
+        second.metadata["title"] = "Changed again"
+        [third] = await service.query([0.1, 0.2, 0.3])
+
+        assert third.content == "Content"
+        assert third.metadata == {"title": "Doc"}
+
+    @pytest.mark.asyncio
+    async def test_writes_invalidate_query_cache(
+        self, db_service, mock_collection, sample_documents
+    ):
+        """Test that adding and deleting documents clears cached results"""
+        mock_collection.query.return_value = {
+            "ids": [["1"]],
+            "documents": [["Content"]],
+            "metadatas": [[{"title": "Doc"}]],
+            "distances": [[0.05]],
+            "embeddings": None,
+            "data": None,
+        }
+        mock_collection.get.return_value = {
+            "ids": ["1"],
+            "documents": ["Content"],
+            "metadatas": [{"title": "Doc"}],
+        }
+        service = await db_service
+        service.client.get_collection.return_value = mock_collection
+        service.client.get_or_create_collection.return_value = mock_collection
+
+        await service.query([0.1, 0.2, 0.3])
+        await service.add_documents(sample_documents)
+        await service.query([0.1, 0.2, 0.3])
+        await service.delete_all_documents()
+        await service.query([0.1, 0.2, 0.3])
+
+        expected_num_queries = 3
+        assert mock_collection.query.call_count == expected_num_queries
 
     @pytest.mark.asyncio
     async def test_get_documents(self, db_service, mock_collection):
@@ -122,6 +352,80 @@ class TestChromaDatabaseService(BaseTest):
         assert documents[0].title == "Doc 1"
         assert documents[1].title == "Doc 2"
 
+    @pytest.mark.asyncio
+    async def test_iter_documents_fetches_pages(self, db_service, mock_collection):
+        """Test that documents are fetched lazily in pages"""
+        pages = [
+            {"ids": ["1", "2"], "documents": None, "metadatas": [{}, {}]},
+            {"ids": ["3"], "documents": None, "metadatas": [{"title": "Doc 3"}]},
+        ]
+        mock_collection.get.side_effect = pages
+        service = await db_service
+        service.config.page_size = 2
+        service.client.get_collection.return_value = mock_collection
+
+        documents = [
+            doc
+            async for doc in service.iter_documents(offset=4, include=("metadatas",))
+        ]
+
+        assert [doc.id for doc in documents] == ["1", "2", "3"]
+        assert documents[2].title == "Doc 3"
+        assert documents[0].content == ""
+        offsets = [call.kwargs["offset"] for call in mock_collection.get.call_args_list]
+        assert offsets == [4, 6]
+        assert mock_collection.get.call_args.kwargs["include"] == ["metadatas"]
+
+    @pytest.mark.asyncio
+    async def test_iter_documents_respects_limit(self, db_service, mock_collection):
+        """Test that no more than `limit` documents are requested"""
+        mock_collection.get.return_value = {
+            "ids": ["1", "2", "3"],
+            "documents": ["A", "B", "C"],
+            "metadatas": [{}, {}, {}],
+        }
+        service = await db_service
+        service.client.get_collection.return_value = mock_collection
+
+        documents = await service.get_documents(limit=3)
+
+        expected_num_documents = 3
+        assert len(documents) == expected_num_documents
+        mock_collection.get.assert_called_once_with(
+            limit=3, offset=0, include=["documents", "metadatas"]
+        )
+
+    @pytest.mark.asyncio
+    async def test_delete_documents(self, db_service, mock_collection):
+        """Test deleting documents by id"""
+        service = await db_service
+        service.client.get_collection.return_value = mock_collection
+
+        await service.delete_documents(["1", "2"])
+
+        mock_collection.delete.assert_called_once_with(ids=["1", "2"])
+
+    @pytest.mark.asyncio
+    async def test_update_metadata(self, db_service, mock_collection):
+        """Test that metadatas are updated by id"""
+        service = await db_service
+        service.client.get_collection.return_value = mock_collection
+
+        await service.update_metadata({"1": {"chunk_index": "2"}})
+
+        mock_collection.update.assert_called_once_with(
+            ids=["1"], metadatas=[{"chunk_index": "2"}]
+        )
+
+    @pytest.mark.asyncio
+    async def test_delete_documents_with_empty_list(self, db_service):
+        """Test that deleting no documents does not touch the database"""
+        service = await db_service
+
+        await service.delete_documents([])
+
+        service.client.get_collection.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_delete_all_documents(self, db_service):
         """Test deleting all documents"""
@@ -136,10 +440,15 @@ class TestChromaDatabaseService(BaseTest):
             "ids": [["1", "2"]],
             "documents": [["Content 1", "Content 2"]],
             "metadatas": [[{"title": "Doc 1"}, {"title": "Doc 2"}]],
-            "distances": [[0.95, 0.85]],
+            "distances": [[0.85, 0.95]],
             "embeddings": [[None, None]],
             "data": [[None, None]],
         }
+        mock_collection.get.return_value = {
+            "ids": ["1"],
+            "documents": ["Content 1"],
+            "metadatas": [{"title": "Doc 1"}],
+        }
         service = await db_service
         service.client.get_collection.return_value = mock_collection
 
@@ -147,6 +456,79 @@ class TestChromaDatabaseService(BaseTest):
 
         assert len(results) == 1
         assert results[0].title == "Doc 1"
+        mock_collection.get.assert_called_once_with(
+            ids=["1"], include=["documents", "metadatas"]
+        )
+
+    @pytest.mark.asyncio
+    async def test_collection_settings_override_defaults(
+        self, db_service, mock_collection
+    ):
+        """Test that a collection uses its own distance function and threshold"""
+        service = await db_service
+        service.config.collections = {
+            "code": CollectionConfig(distance="l2", result_threshold=0.2)
+        }
+        service.client.get_or_create_collection.return_value = mock_collection
+        mock_collection.metadata = {"hnsw:space": "l2"}
+        mock_collection.query.return_value = {
+            "ids": [["1", "2"]],
+            "distances": [[0.3, 0.8]],
+        }
+        mock_collection.get.return_value = {
+            "ids": ["1"],
+            "documents": ["Content 1"],
+            "metadatas": [{"title": "Doc 1"}],
+        }
+        service.client.get_collection.return_value = mock_collection
+
+        await service.add_documents(
+            [Document(title="Doc", content="Content", embedding=[0.1, 0.2])],
+            collection_name="code",
+        )
+        results = await service.query([0.1, 0.2], collection_name="code")
+
+        service.client.get_or_create_collection.assert_called_once_with(
+            name="code", metadata={"hnsw:space": "l2"}
+        )
+        assert [doc.id for doc in results] == ["1"]
+        assert results[0].distance == pytest.approx(0.15)
+
+    def test_filter_docs_keeps_results_within_threshold(self, mock_database_config):
+        """Test that only results within the cosine distance threshold are kept"""
+        service = ChromaDatabaseService(config=mock_database_config)
+        results = {
+            "ids": [["1", "2", "3"]],
+            "documents": [["Content 1", "Content 2", "Content 3"]],
+            "metadatas": [[{"title": "1"}, {"title": "2"}, {"title": "3"}]],
+            "distances": [[0.1, 0.5, 0.7]],
+            "embeddings": None,
+            "included": ["documents", "metadatas", "distances"],
+        }
+
+        filtered = service._filter_docs(results, threshold=0.5)
+
+        assert filtered["ids"] == [["1", "2"]]
+        assert filtered["documents"] == [["Content 1", "Content 2"]]
+        assert filtered["metadatas"] == [[{"title": "1"}, {"title": "2"}]]
+        assert filtered["distances"] == [[0.1, 0.5]]
+        assert filtered["embeddings"] is None
+        assert filtered["included"] == results["included"]
+
+    def test_filter_docs_converts_l2_distances(self, mock_database_config):
+        """Test that squared l2 distances are compared as cosine distances"""
+        service = ChromaDatabaseService(config=mock_database_config)
+        service.similarity_function = service._get_db_value(DistanceFunction.L2)
+        results = {
+            "ids": [["1", "2"]],
+            "documents": [["Content 1", "Content 2"]],
+            "metadatas": [[{}, {}]],
+            "distances": [[0.8, 1.2]],
+        }
+
+        filtered = service._filter_docs(results, threshold=0.5)
+
+        assert filtered["ids"] == [["1"]]
 
     def test_get_db_value_returns_correct_string(self, mock_database_config):
         """Test distance function conversion"""
@@ -154,6 +536,17 @@ class TestChromaDatabaseService(BaseTest):
 
         assert service._get_db_value(DistanceFunction.COSINE) == "cosine"
         assert service._get_db_value(DistanceFunction.L2) == "l2"
+        assert service._get_db_value(DistanceFunction.INNER_PRODUCT) == "ip"
+
+    @pytest.mark.asyncio
+    async def test_query_timeout_is_raised(self, db_service, mock_collection):
+        """Test that a query exceeding the timeout raises instead of hanging"""
+        service = await db_service
+        service.executor.timeout = 0.01
+        service.client.get_collection.side_effect = lambda name: time.sleep(0.2)
+
+        with pytest.raises(TimeoutError):
+            await service.query([0.1, 0.2, 0.3])
 
     @pytest.mark.asyncio
     async def test_query_handles_collection_error(self, db_service):
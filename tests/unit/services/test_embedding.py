@@ -1,9 +1,12 @@
+import asyncio
+import threading
 from unittest.mock import Mock, patch
 
 import numpy as np
 import pytest
 
 from insightvault.services.embedding import EmbeddingService
+from insightvault.services.embedding_cache import EmbeddingCache
 from tests.unit import BaseTest
 
 
@@ -40,6 +43,18 @@ class TestEmbeddingService(BaseTest):
             mock_transformer.assert_called_once_with("all-MiniLM-L6-v2")
             assert service.client == mock_transformer.return_value
 
+    @pytest.mark.asyncio
+    async def test_init_loads_model_once(self, mock_embedding_config):
+        """Test that repeated init calls do not reload the model"""
+        with patch(
+            "insightvault.services.embedding.SentenceTransformer"
+        ) as mock_transformer:
+            service = EmbeddingService(config=mock_embedding_config)
+            await service.init()
+            await service.init()
+
+            mock_transformer.assert_called_once_with("all-MiniLM-L6-v2")
+
     @pytest.mark.asyncio
     async def test_embed_returns_list_of_embeddings(
         self, embedding_service, mock_embeddings
@@ -56,6 +71,21 @@ class TestEmbeddingService(BaseTest):
         assert result[0] == [0.1, 0.2, 0.3]
         assert result[1] == [0.4, 0.5, 0.6]
 
+    @pytest.mark.asyncio
+    async def test_embed_array_returns_float32_batch(
+        self, embedding_service, mock_embeddings
+    ):
+        """Test that embed_array returns one contiguous float32 array"""
+        service = await embedding_service
+        service.client.encode.return_value = mock_embeddings
+
+        result = await service.embed_array(["First text", "Second text"])
+
+        assert isinstance(result, np.ndarray)
+        assert result.dtype == np.float32
+        assert result.shape == mock_embeddings.shape
+        assert result.flags["C_CONTIGUOUS"]
+
     @pytest.mark.asyncio
     async def test_embed_calls_encode_with_correct_params(self, embedding_service):
         service = await embedding_service
@@ -66,6 +96,19 @@ class TestEmbeddingService(BaseTest):
             texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True
         )
 
+    @pytest.mark.asyncio
+    async def test_embed_runs_encoder_on_executor(self, embedding_service):
+        """Test that the encoder does not run on the event loop thread"""
+        service = await embedding_service
+        threads = []
+        service.client.encode.side_effect = lambda texts, **kwargs: (
+            threads.append(threading.current_thread().name) or np.array([[0.1]])
+        )
+
+        await service.embed(["Test text"])
+
+        assert threads[0].startswith("insightvault-embedding")
+
     @pytest.mark.asyncio
     async def test_embed_with_empty_list(self, embedding_service):
         """Test embedding empty list of texts"""
@@ -113,3 +156,126 @@ class TestEmbeddingService(BaseTest):
             await service.init()
 
             mock_to_thread.assert_called_once_with(mock_transformer, "all-MiniLM-L6-v2")
+
+    @pytest.mark.asyncio
+    async def test_embed_with_cache_only_encodes_missing_texts(
+        self, embedding_service, tmp_path
+    ):
+        """Test that cached texts are not encoded again"""
+        service = await embedding_service
+        service.config.cache_enabled = True
+        service.config.cache_path = str(tmp_path)
+        service.cache = EmbeddingCache(config=service.config)
+        service.client.encode.side_effect = lambda texts, **kwargs: np.array(
+            [[float(len(text))] for text in texts]
+        )
+
+        first = await service.embed(["a", "bb", "a"])
+        second = await service.embed(["bb", "ccc"])
+
+        assert first == [[1.0], [2.0], [1.0]]
+        assert second == [[2.0], [3.0]]
+        encoded = [call.args[0] for call in service.client.encode.call_args_list]
+        assert encoded == [["a", "bb"], ["ccc"]]
+        assert service.cache.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_embed_with_cache_hits_does_not_need_model(
+        self, mock_embedding_config, tmp_path
+    ):
+        """Test that fully cached texts are embedded without loading the model"""
+        mock_embedding_config.cache_enabled = True
+        mock_embedding_config.cache_path = str(tmp_path)
+        service = EmbeddingService(config=mock_embedding_config)
+        service.cache.put_many(["cached"], [[0.5, 0.25]])
+
+        result = await service.embed(["cached"])
+
+        assert result == [[0.5, 0.25]]
+
+    @pytest.mark.asyncio
+    async def test_embed_accesses_cache_on_executor(self, embedding_service, tmp_path):
+        """Test that the cache files are not read or written on the event loop"""
+        service = await embedding_service
+        service.config.cache_enabled = True
+        service.config.cache_path = str(tmp_path)
+        service.cache = EmbeddingCache(config=service.config)
+        service.client.encode.side_effect = lambda texts, **kwargs: np.array([[0.1]])
+        threads = []
+        for name in ("get_many", "put_many", "flush"):
+            method = getattr(service.cache, name)
+            setattr(
+                service.cache,
+                name,
+                Mock(
+                    side_effect=lambda *args, method=method: (
+                        threads.append(threading.current_thread().name) or method(*args)
+                    )
+                ),
+            )
+
+        await service.embed(["Test text"])
+
+        expected_num_calls = 3
+        assert len(threads) == expected_num_calls
+        assert all(name.startswith("insightvault-embedding") for name in threads)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_are_coalesced(self, embedding_service):
+        """Test that concurrent queries are encoded in a single batch"""
+        service = await embedding_service
+        service.config.coalesce_window = 0.01
+        service.client.encode.side_effect = lambda texts, **kwargs: np.array(
+            [[float(len(text))] for text in texts]
+        )
+
+        results = await asyncio.gather(
+            service.embed_query("a"),
+            service.embed_query("bb"),
+            service.embed_query("ccc"),
+        )
+
+        service.client.encode.assert_called_once()
+        assert service.client.encode.call_args.args[0] == ["a", "bb", "ccc"]
+        assert [result.tolist() for result in results] == [[1.0], [2.0], [3.0]]
+
+    @pytest.mark.asyncio
+    async def test_full_batch_is_encoded_without_waiting(self, embedding_service):
+        """Test that a batch is flushed as soon as it reaches the maximum size"""
+        service = await embedding_service
+        service.config.coalesce_window = 60.0
+        service.config.coalesce_max_batch_size = 2
+        service.client.encode.side_effect = lambda texts, **kwargs: np.array(
+            [[0.5] for _ in texts]
+        )
+
+        results = await asyncio.wait_for(
+            asyncio.gather(service.embed_query("a"), service.embed_query("b")),
+            timeout=1.0,
+        )
+
+        assert len(results) == service.config.coalesce_max_batch_size
+
+    @pytest.mark.asyncio
+    async def test_coalescing_is_disabled_by_default(self, embedding_service):
+        """Test that a window of zero encodes each query on its own"""
+        service = await embedding_service
+
+        await asyncio.gather(service.embed_query("a"), service.embed_query("b"))
+
+        expected_num_calls = 2
+        assert service.client.encode.call_count == expected_num_calls
+
+    @pytest.mark.asyncio
+    async def test_coalesced_errors_reach_all_callers(self, embedding_service):
+        """Test that an encoder error is raised to every waiting caller"""
+        service = await embedding_service
+        service.client.encode.side_effect = ValueError("Encoder failed")
+
+        results = await asyncio.gather(
+            service.embed_query("a"),
+            service.embed_query("b"),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(result, ValueError) for result in results)
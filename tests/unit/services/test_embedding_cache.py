@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from insightvault.models.config import EmbeddingConfig
+from insightvault.services.embedding_cache import EmbeddingCache
+
+
+class TestEmbeddingCache:
+    @pytest.fixture
+    def cache_config(self, tmp_path):
+        """Create a config for a small cache in a temporary directory"""
+        return EmbeddingConfig(
+            model="org/some-model",
+            cache_enabled=True,
+            cache_path=str(tmp_path),
+            cache_max_entries=3,
+        )
+
+    @pytest.fixture
+    def cache(self, cache_config):
+        return EmbeddingCache(config=cache_config)
+
+    def test_cache_directory_is_per_model(self, cache, tmp_path):
+        """Test that the cache files are stored in a directory of the model"""
+        assert cache.path == tmp_path / "org_some-model"
+
+    def test_get_missing_texts(self, cache):
+        """Test that unknown texts are misses"""
+        assert cache.get_many(["a", "b"]) == [None, None]
+        expected_misses = 2
+        assert cache.misses == expected_misses
+        assert cache.hits == 0
+
+    def test_put_and_get(self, cache):
+        """Test that stored vectors are returned as float32"""
+        cache.put_many(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+
+        result = cache.get_many(["b", "c"])
+
+        assert result[0].dtype == np.float32
+        assert result[0].tolist() == [3.0, 4.0]
+        assert result[1] is None
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_least_recently_used_entry_is_evicted(self, cache):
+        """Test that the oldest entry is evicted when the cache is full"""
+        cache.put_many(["a", "b", "c"], [[1.0], [2.0], [3.0]])
+        cache.get_many(["a"])
+
+        cache.put_many(["d"], [[4.0]])
+
+        expected_size = 3
+        assert len(cache) == expected_size
+        assert cache.get_many(["b"]) == [None]
+        assert [v.tolist() for v in cache.get_many(["a", "c", "d"])] == [
+            [1.0],
+            [3.0],
+            [4.0],
+        ]
+
+    def test_cache_is_persistent(self, cache, cache_config):
+        """Test that a new cache reads the vectors stored on disk"""
+        cache.put_many(["a"], [[1.0, 2.0]])
+        cache.flush()
+
+        reopened = EmbeddingCache(config=cache_config)
+
+        assert len(reopened) == 1
+        assert reopened.get_many(["a"])[0].tolist() == [1.0, 2.0]
+
+    def test_cache_is_discarded_when_size_changes(self, cache, cache_config):
+        """Test that cache files of a different size are not reused"""
+        cache.put_many(["a"], [[1.0]])
+        cache.flush()
+        cache_config.cache_max_entries = 10
+
+        reopened = EmbeddingCache(config=cache_config)
+
+        assert len(reopened) == 0
+
+    def test_slot_reused_by_another_process_is_a_miss(self, cache, cache_config):
+        """Test that a slot overwritten by another cache on the same files is not
+        returned for the key it held before
+        """
+        cache.put_many(["a"], [[1.0, 2.0]])
+        cache.flush()
+        other = EmbeddingCache(config=cache_config)
+        other.put_many(["b", "c", "d"], [[3.0, 4.0], [5.0, 6.0], [7.0, 8.0]])
+        other.flush()
+
+        assert cache.get_many(["a"]) == [None]
+        cache.put_many(["a"], [[1.0, 2.0]])
+        assert cache.get_many(["a"])[0].tolist() == [1.0, 2.0]
@@ -0,0 +1,116 @@
+import pytest
+
+from insightvault.models.config import DatabaseConfig
+from insightvault.models.document import Document
+from insightvault.services.keyword_index import (
+    KeywordIndexService,
+    reciprocal_rank_fusion,
+)
+
+
+class TestKeywordIndexService:
+    @pytest.fixture
+    def keyword_service(self, tmp_path):
+        """Create a keyword index below a temporary directory"""
+        service = KeywordIndexService(config=DatabaseConfig(path=str(tmp_path / "db")))
+        yield service
+        service.close()
+
+    @pytest.fixture
+    def documents(self):
+        """Create documents mentioning error codes"""
+        return [
+            Document(id="1", title="A", content="The pump failed with ERR-1234."),
+            Document(id="2", title="B", content="Error ERR-9999 means a full disk."),
+            Document(id="3", title="C", content="The pump was replaced."),
+        ]
+
+    def test_search_matches_identifiers(self, keyword_service, documents):
+        """Test that an identifier only matches the document that contains it"""
+        keyword_service.add_documents(documents)
+
+        assert keyword_service.search("ERR-1234", limit=5) == ["1"]
+        assert keyword_service.search("what is err-9999?", limit=5) == ["2"]
+
+    def test_search_ranks_by_bm25(self, keyword_service, documents):
+        """Test that documents matching more query terms rank first"""
+        keyword_service.add_documents(documents)
+
+        results = keyword_service.search("pump replaced", limit=5)
+
+        assert results == ["3", "1"]
+
+    def test_search_without_index(self, keyword_service):
+        """Test that searching before anything was indexed creates no file"""
+        assert keyword_service.search("ERR-1234", limit=5) == []
+        assert not keyword_service.path.exists()
+
+    def test_add_documents_reindexes_existing_ids(self, keyword_service, documents):
+        """Test that re-adding a document replaces its indexed terms"""
+        keyword_service.add_documents(documents)
+
+        keyword_service.add_documents(
+            [Document(id="1", title="A", content="Now it reports ERR-4321.")]
+        )
+
+        assert keyword_service.search("ERR-1234", limit=5) == []
+        assert keyword_service.search("ERR-4321", limit=5) == ["1"]
+
+    def test_delete_documents(self, keyword_service, documents):
+        """Test that deleted documents are no longer found"""
+        keyword_service.add_documents(documents)
+
+        keyword_service.delete_documents(["1"])
+
+        assert keyword_service.search("pump", limit=5) == ["3"]
+
+    def test_collections_are_separate(self, keyword_service, documents):
+        """Test that searches and deletes are scoped to a collection"""
+        keyword_service.add_documents(documents)
+        keyword_service.add_documents(documents[:1], collection_name="other")
+
+        keyword_service.delete_collection()
+
+        assert keyword_service.search("ERR-1234", limit=5) == []
+        assert keyword_service.search("ERR-1234", limit=5, collection_name="other") == [
+            "1"
+        ]
+
+    def test_index_is_persisted(self, keyword_service, documents, tmp_path):
+        """Test that a new service finds the documents indexed by another"""
+        keyword_service.add_documents(documents)
+        keyword_service.close()
+
+        reopened = KeywordIndexService(config=DatabaseConfig(path=str(tmp_path / "db")))
+
+        assert reopened.search("ERR-9999", limit=5) == ["2"]
+        reopened.close()
+
+    def test_contents_are_not_stored(self, keyword_service, documents):
+        """Test that the FTS5 table keeps no copy of the contents"""
+        keyword_service.add_documents(documents)
+
+        tables = {
+            name
+            for (name,) in keyword_service._connect().execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+        }
+
+        assert "terms" in tables
+        assert "terms_content" not in tables
+
+    def test_is_empty(self, keyword_service, documents):
+        """Test that emptiness is tracked per collection"""
+        assert keyword_service.is_empty()
+
+        keyword_service.add_documents(documents, collection_name="other")
+
+        assert keyword_service.is_empty()
+        assert not keyword_service.is_empty("other")
+
+    def test_reciprocal_rank_fusion(self):
+        """Test that ids ranked high in several rankings come first"""
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["b"]], k=1)
+
+        assert fused == ["b", "a", "c"]
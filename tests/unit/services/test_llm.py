@@ -1,7 +1,8 @@
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, Mock
 
 import pytest
 
+from insightvault.models.config import LlmConfig
 from insightvault.services.llm import OllamaLLMService
 
 
@@ -21,7 +22,7 @@ class TestOllamaLLMService:
     @pytest.fixture
     async def llm_service(self):
         """Create LLM service with mocked client"""
-        service = OllamaLLMService(model_name="test-model")
+        service = OllamaLLMService(LlmConfig(model="test-model"))
         service.client = AsyncMock()
         service.client.chat.side_effect = [None]
         return service
@@ -38,6 +39,8 @@ class TestOllamaLLMService:
         service.client.chat.assert_called_once_with(
             model="test-model",
             messages=[{"role": "user", "content": "Test prompt"}],
+            options={"num_ctx": 8192},
+            keep_alive="30m",
         )
 
     @pytest.mark.asyncio
@@ -86,10 +89,69 @@ class TestOllamaLLMService:
         assert service.chat_history[0]["content"] == "First prompt"
         assert service.chat_history[2]["content"] == "Second prompt"
 
+    @pytest.mark.asyncio
+    async def test_chat_sends_history(self, llm_service, mock_chat_response):
+        """Test that the previous turns are sent along with the prompt"""
+        service = await llm_service
+        service.client.chat.side_effect = [mock_chat_response, mock_chat_response]
+
+        await service.chat("First prompt")
+        await service.chat("Second prompt")
+
+        assert service.client.chat.call_args.kwargs["messages"] == [
+            {"role": "user", "content": "First prompt"},
+            {"role": "assistant", "content": "This is a mock response"},
+            {"role": "user", "content": "Second prompt"},
+        ]
+
+    def test_trimmed_history_drops_oldest_turns(self):
+        """Test that the history is cut to the token budget by whole turns"""
+        service = OllamaLLMService(LlmConfig(model="test-model", history_max_tokens=10))
+        service.chat_history = [
+            {"role": "user", "content": "a" * 16},
+            {"role": "assistant", "content": "b" * 16},
+            {"role": "user", "content": "c" * 8},
+            {"role": "assistant", "content": "d" * 8},
+        ]
+
+        assert service.trimmed_history() == service.chat_history[2:]
+
+    @pytest.mark.asyncio
+    async def test_stream_chat_records_history_prompt(self, llm_service):
+        """Test that the streamed turn is recorded with the history prompt"""
+        service = await llm_service
+        service.chat_history = [
+            {"role": "user", "content": "Earlier question"},
+            {"role": "assistant", "content": "Earlier answer"},
+        ]
+
+        async def stream():
+            for content in ["Streamed ", "answer"]:
+                yield Mock(message=Mock(content=content))
+
+        service.client.chat.side_effect = [stream()]
+
+        tokens = [
+            token
+            async for token in service.stream_chat(
+                "Context and question", history_prompt="Question"
+            )
+        ]
+
+        assert tokens == ["Streamed ", "answer"]
+        assert service.client.chat.call_args.kwargs["messages"][-1] == {
+            "role": "user",
+            "content": "Context and question",
+        }
+        assert service.chat_history[-2:] == [
+            {"role": "user", "content": "Question"},
+            {"role": "assistant", "content": "Streamed answer"},
+        ]
+
     @pytest.mark.asyncio
     async def test_query_with_different_model(self, mock_chat_response):
         """Test query with a different model"""
-        service = OllamaLLMService(model_name="different-model")
+        service = OllamaLLMService(LlmConfig(model="different-model"))
         service.client = AsyncMock()
         service.client.chat.return_value = mock_chat_response
 
@@ -98,4 +160,74 @@ class TestOllamaLLMService:
         service.client.chat.assert_called_once_with(
             model="different-model",
             messages=[{"role": "user", "content": "Test prompt"}],
+            options={"num_ctx": 8192},
+            keep_alive="30m",
         )
+
+    @pytest.mark.asyncio
+    async def test_stream_query_yields_tokens(self, llm_service):
+        """Test that stream_query yields the content of each streamed part"""
+        service = await llm_service
+
+        def part(content):
+            message = Mock(content=content)
+            return Mock(message=message)
+
+        async def stream():
+            for content in ["This ", "", "is ", "streamed"]:
+                yield part(content)
+
+        service.client.chat.side_effect = [stream()]
+
+        tokens = [token async for token in service.stream_query("Test prompt")]
+
+        assert tokens == ["This ", "is ", "streamed"]
+        assert service.time_to_first_token is not None
+        service.client.chat.assert_called_once_with(
+            model="test-model",
+            messages=[{"role": "user", "content": "Test prompt"}],
+            options={"num_ctx": 8192},
+            keep_alive="30m",
+            stream=True,
+        )
+
+    @pytest.mark.asyncio
+    async def test_query_sends_system_prompt_and_options(self, mock_chat_response):
+        """Test that the system prompt comes first and the options are configured"""
+        service = OllamaLLMService(
+            LlmConfig(
+                model="test-model",
+                keep_alive=-1,
+                num_ctx=4096,
+                options={"temperature": 0.1},
+            )
+        )
+        service.client = AsyncMock()
+        service.client.chat.return_value = mock_chat_response
+
+        await service.query("Test prompt", system="System prompt")
+
+        service.client.chat.assert_called_once_with(
+            model="test-model",
+            messages=[
+                {"role": "system", "content": "System prompt"},
+                {"role": "user", "content": "Test prompt"},
+            ],
+            options={"temperature": 0.1, "num_ctx": 4096},
+            keep_alive=-1,
+        )
+
+    def test_options_without_context_size(self):
+        """Test that no options are sent when none are configured"""
+        service = OllamaLLMService(LlmConfig(num_ctx=None))
+
+        assert service.options == {}
+        assert service._request_args([])["options"] is None
+
+    @pytest.mark.asyncio
+    async def test_stream_query_without_client(self):
+        """Test that streaming without a loaded client raises an error"""
+        service = OllamaLLMService(LlmConfig(model="test-model"))
+
+        with pytest.raises(RuntimeError, match="LLM client is not loaded"):
+            await anext(service.stream_query("Test prompt"))
@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from insightvault.models.config import DatabaseConfig
+from insightvault.models.ingestion import ManifestEntry
+from insightvault.services.manifest import ManifestService
+
+
+class TestManifestService:
+    @pytest.fixture
+    def manifest_service(self, tmp_path):
+        """Create a manifest service next to a temporary database path"""
+        return ManifestService(config=DatabaseConfig(path=str(tmp_path / "db")))
+
+    def test_manifest_is_stored_next_to_database(self, manifest_service, tmp_path):
+        """Test that the manifest file is a sibling of the database path"""
+        assert manifest_service.path == tmp_path / "db.manifest.json"
+
+    def test_get_unknown_source_returns_none(self, manifest_service):
+        """Test that unknown sources have no entry"""
+        assert manifest_service.get("unknown") is None
+
+    def test_save_and_reload(self, manifest_service, tmp_path):
+        """Test that saved entries are read back by a new service"""
+        entry = ManifestEntry(fingerprint="abc", chunk_ids=["1", "2"])
+        manifest_service.set("source", entry)
+        manifest_service.save()
+
+        reloaded = ManifestService(config=DatabaseConfig(path=str(tmp_path / "db")))
+
+        assert reloaded.get("source") == entry
+
+    def test_entries_are_scoped_by_collection(self, manifest_service):
+        """Test that entries of different collections do not collide"""
+        entry = ManifestEntry(fingerprint="abc")
+        manifest_service.set("source", entry, collection_name="other")
+
+        assert manifest_service.get("source") is None
+        assert manifest_service.get("source", collection_name="other") == entry
+
+    def test_delete_collection(self, manifest_service, tmp_path):
+        """Test that deleting a collection removes its entries from disk"""
+        manifest_service.set("source", ManifestEntry(fingerprint="abc"))
+        manifest_service.save()
+
+        manifest_service.delete_collection()
+        reloaded = ManifestService(config=DatabaseConfig(path=str(tmp_path / "db")))
+
+        assert manifest_service.get("source") is None
+        assert reloaded.get("source") is None
+
+    def test_concurrent_saves(self, manifest_service, tmp_path):
+        """Test that saves from several threads leave a complete manifest"""
+        expected_num_saves = 20
+
+        def set_and_save(i):
+            manifest_service.set(f"source-{i}", ManifestEntry(fingerprint=str(i)))
+            manifest_service.save()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(set_and_save, range(expected_num_saves)))
+
+        reloaded = ManifestService(config=DatabaseConfig(path=str(tmp_path / "db")))
+        assert all(
+            reloaded.get(f"source-{i}") is not None for i in range(expected_num_saves)
+        )
+        assert not list(tmp_path.glob("*.tmp"))
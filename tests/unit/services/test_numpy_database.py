@@ -0,0 +1,360 @@
+import json
+
+import numpy as np
+import pytest
+
+from insightvault.models.config import DatabaseConfig
+from insightvault.models.database import QueryFilter
+from insightvault.models.document import Document
+from insightvault.services import numpy_database
+from insightvault.services.numpy_database import NumpyDatabaseService
+from tests.unit import BaseTest
+
+
+class TestNumpyDatabaseService(BaseTest):
+    @pytest.fixture
+    def database_config(self, tmp_path):
+        """Create a database config below a temporary directory"""
+        return DatabaseConfig(
+            backend="numpy",
+            path=str(tmp_path / "db"),
+            result_threshold=0.5,
+            max_num_results=2,
+        )
+
+    @pytest.fixture
+    def db_service(self, database_config):
+        """Create a NumPy database service"""
+        return NumpyDatabaseService(config=database_config)
+
+    @pytest.fixture
+    def documents(self):
+        """Create documents with orthogonal embeddings"""
+        return [
+            Document(
+                id="x",
+                title="X",
+                content="Along x",
+                metadata={"title": "X", "source": "a"},
+                embedding=[1.0, 0.0, 0.0],
+            ),
+            Document(
+                id="y",
+                title="Y",
+                content="Along y",
+                metadata={"title": "Y", "source": "b"},
+                embedding=np.array([0.0, 2.0, 0.0], dtype=np.float32),
+            ),
+            Document(
+                id="z",
+                title="Z",
+                content="Along z",
+                metadata={"title": "Z", "source": "c"},
+                embedding=[0.0, 0.0, 3.0],
+            ),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_query_returns_nearest_documents(self, db_service, documents):
+        """Test that a query returns the nearest documents, nearest first"""
+        await db_service.add_documents(documents)
+
+        results = await db_service.query([0.9, 0.5, 0.0], filter_docs=False)
+
+        assert [doc.id for doc in results] == ["x", "y"]
+        assert results[0].content == "Along x"
+        assert results[0].title == "X"
+        assert results[0].metadata == {"title": "X", "source": "a"}
+
+    @pytest.mark.asyncio
+    async def test_query_filters_by_distance(self, db_service, documents):
+        """Test that documents above the distance threshold are dropped"""
+        await db_service.add_documents(documents)
+
+        results = await db_service.query([0.9, 0.5, 0.0])
+
+        assert [doc.id for doc in results] == ["x"]
+
+    @pytest.mark.asyncio
+    async def test_query_many_returns_documents_per_query(self, db_service, documents):
+        """Test that each query gets its own nearest documents, in query order"""
+        await db_service.add_documents(documents)
+
+        results = await db_service.query_many(
+            [[0.0, 0.0, 1.0], [0.9, 0.5, 0.0], [-1.0, 0.0, 0.0]]
+        )
+
+        assert [[doc.id for doc in docs] for docs in results] == [["z"], ["x"], []]
+
+    @pytest.mark.asyncio
+    async def test_query_with_filter(self, db_service, documents):
+        """Test that only documents matching the query filter are searched"""
+        await db_service.add_documents(documents)
+
+        by_source = await db_service.query(
+            [1.0, 0.0, 0.0], filter_docs=False, query_filter=QueryFilter(source="c")
+        )
+        by_content = await db_service.query(
+            [1.0, 0.0, 0.0],
+            filter_docs=False,
+            query_filter=QueryFilter(contains="along y"),
+        )
+
+        assert [doc.id for doc in by_source] == ["z"]
+        assert by_content == []
+
+    @pytest.mark.asyncio
+    async def test_get_documents_by_ids(self, db_service, documents):
+        """Test that documents are returned in the order of the ids"""
+        await db_service.add_documents(documents)
+
+        found = await db_service.get_documents_by_ids(["z", "missing", "x"])
+
+        assert [doc.id for doc in found] == ["z", "x"]
+
+    @pytest.mark.asyncio
+    async def test_iter_documents_with_limit_and_offset(self, db_service, documents):
+        """Test listing a page of documents without their contents"""
+        await db_service.add_documents(documents)
+
+        page = [
+            doc
+            async for doc in db_service.iter_documents(
+                limit=1, offset=1, include=("metadatas",)
+            )
+        ]
+
+        assert [doc.id for doc in page] == ["y"]
+        assert page[0].content == ""
+        assert page[0].metadata == {"title": "Y", "source": "b"}
+
+    @pytest.mark.asyncio
+    async def test_query_empty_collection(self, db_service):
+        """Test that querying a missing collection returns no documents"""
+        assert await db_service.query([1.0, 0.0, 0.0]) == []
+        assert await db_service.get_documents() == []
+
+    @pytest.mark.asyncio
+    async def test_add_documents_replaces_existing_ids(self, db_service, documents):
+        """Test that documents with an existing id are replaced"""
+        await db_service.add_documents(documents)
+        replacement = Document(
+            id="x",
+            title="X",
+            content="Now along z",
+            metadata={"title": "X"},
+            embedding=[0.0, 0.0, 1.0],
+        )
+
+        await db_service.add_documents([replacement])
+
+        stored = await db_service.get_documents()
+        assert [doc.id for doc in stored] == ["y", "z", "x"]
+        assert stored[-1].content == "Now along z"
+        results = await db_service.query([0.0, 0.0, 1.0], filter_docs=False)
+        assert {doc.id for doc in results} == {"x", "z"}
+
+    @pytest.mark.asyncio
+    async def test_add_documents_rejects_other_dimensions(self, db_service, documents):
+        """Test that embeddings of a different dimension are rejected"""
+        await db_service.add_documents(documents)
+        other = Document(title="Other", content="Other", embedding=[1.0, 0.0])
+
+        with pytest.raises(ValueError, match="dimension"):
+            await db_service.add_documents([other])
+
+    @pytest.mark.asyncio
+    async def test_collections_are_persisted(
+        self, db_service, database_config, documents
+    ):
+        """Test that a new service instance loads the stored collection"""
+        await db_service.add_documents(documents)
+
+        reopened = NumpyDatabaseService(config=database_config)
+        results = await reopened.query([0.0, 1.0, 0.0])
+
+        assert [doc.id for doc in results] == ["y"]
+        assert isinstance(reopened._collections["default"].index.vectors, np.memmap)
+
+    @pytest.mark.asyncio
+    async def test_delete_documents(self, db_service, documents):
+        """Test deleting documents by id"""
+        await db_service.add_documents(documents)
+
+        await db_service.delete_documents(["x", "unknown"])
+
+        stored = await db_service.get_documents()
+        assert [doc.id for doc in stored] == ["y", "z"]
+        results = await db_service.query([1.0, 0.0, 0.0], filter_docs=False)
+        assert "x" not in {doc.id for doc in results}
+
+    @pytest.mark.asyncio
+    async def test_update_metadata(self, db_service, database_config, documents):
+        """Test that metadatas are replaced and persisted, vectors are kept"""
+        await db_service.add_documents(documents)
+
+        await db_service.update_metadata({"x": {"title": "New"}, "unknown": {}})
+
+        reopened = NumpyDatabaseService(config=database_config)
+        [stored] = await reopened.get_documents_by_ids(["x"])
+        assert stored.metadata == {"title": "New"}
+        results = await reopened.query([1.0, 0.0, 0.0])
+        assert results[0].id == "x"
+
+    @pytest.mark.asyncio
+    async def test_delete_all_documents(self, db_service, database_config, documents):
+        """Test that deleting all documents removes the collection files"""
+        await db_service.add_documents(documents)
+
+        await db_service.delete_all_documents()
+
+        assert await db_service.get_documents() == []
+        assert not (db_service.path / "default").exists()
+
+    @pytest.mark.asyncio
+    async def test_collection_names_cannot_leave_the_database(self, db_service):
+        """Test that a collection name cannot point to another directory"""
+        victim = db_service.path.parent.parent / "victim"
+        victim.mkdir(parents=True)
+
+        with pytest.raises(ValueError, match="Invalid collection name"):
+            await db_service.delete_all_documents(
+                collection_name="../" * 2 + victim.name
+            )
+
+        assert victim.exists()
+
+    @pytest.mark.asyncio
+    async def test_collections_are_separate(self, db_service, documents):
+        """Test that collections do not share documents"""
+        await db_service.add_documents(documents[:1], collection_name="first")
+        await db_service.add_documents(documents[1:], collection_name="second")
+
+        first = await db_service.get_documents(collection_name="first")
+        second = await db_service.get_documents(collection_name="second")
+
+        assert [doc.id for doc in first] == ["x"]
+        assert [doc.id for doc in second] == ["y", "z"]
+
+    @pytest.mark.asyncio
+    async def test_ivf_index_is_built_for_large_collections(
+        self, db_service, documents
+    ):
+        """Test that the IVF index is built once a collection is large enough"""
+        db_service.config.index = "ivf"
+        db_service.config.ivf_min_size = len(documents)
+        db_service.config.ivf_num_lists = 2
+        db_service.config.ivf_num_probes = 2
+        await db_service.add_documents(documents)
+
+        results = await db_service.query([1.0, 0.0, 0.0])
+
+        assert [doc.id for doc in results] == ["x"]
+        assert db_service._collections["default"].index.ivf is not None
+
+    @pytest.mark.asyncio
+    async def test_quantized_collection_stores_codes(self, database_config, documents):
+        """Test that quantized codes are persisted and used for queries"""
+        config = database_config.model_copy(update={"quantization": "binary"})
+        await NumpyDatabaseService(config=config).add_documents(documents)
+        directory = NumpyDatabaseService(config=config).path / "default"
+
+        service = NumpyDatabaseService(config=config)
+        results = await service.query([0.9, 0.5, 0.0])
+
+        assert [doc.id for doc in results] == ["x"]
+        codes = service._collections["default"].index.codes
+        assert codes.codes.dtype == np.uint8
+        assert (directory / "codes-0.bin").stat().st_size == codes.codes.nbytes
+
+    @pytest.mark.asyncio
+    async def test_changed_quantization_rebuilds_codes(
+        self, db_service, database_config, documents
+    ):
+        """Test that loading with another quantization replaces the codes"""
+        await db_service.add_documents(documents)
+        directory = db_service.path / "default"
+        assert not list(directory.glob("codes-*"))
+
+        config = database_config.model_copy(update={"quantization": "int8"})
+        service = NumpyDatabaseService(config=config)
+        results = await service.query([0.9, 0.5, 0.0])
+
+        assert [doc.id for doc in results] == ["x"]
+        assert service._collections["default"].index.codes.codes.dtype == np.int8
+        assert sorted(path.name for path in directory.iterdir()) == [
+            "codes-1.bin",
+            "collection.json",
+            "rows-0.jsonl",
+            "scales-1.f32",
+            "vectors-0.f32",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_add_documents_appends_rows(self, db_service, documents):
+        """Test that adding documents appends to the files instead of rewriting"""
+        await db_service.add_documents(documents[:2])
+        directory = db_service.path / "default"
+        log = (directory / "rows-0.jsonl").read_bytes()
+
+        await db_service.add_documents(documents[2:])
+
+        assert (directory / "rows-0.jsonl").read_bytes().startswith(log)
+        assert (directory / "vectors-0.f32").stat().st_size == 3 * 3 * 4
+        header = json.loads((directory / "collection.json").read_text())
+        assert header["num_rows"] == len(documents)
+
+    @pytest.mark.asyncio
+    async def test_failed_write_is_truncated(
+        self, db_service, database_config, documents
+    ):
+        """Test that bytes written after the last committed header are dropped"""
+        await db_service.add_documents(documents)
+        directory = db_service.path / "default"
+        with open(directory / "vectors-0.f32", "ab") as file:
+            file.write(b"\0" * 12)
+        with open(directory / "rows-0.jsonl", "a", encoding="utf-8") as file:
+            file.write('{"id": "partial", "con')
+
+        reopened = NumpyDatabaseService(config=database_config)
+        stored = await reopened.get_documents()
+
+        assert [doc.id for doc in stored] == ["x", "y", "z"]
+        assert (directory / "vectors-0.f32").stat().st_size == 3 * 3 * 4
+
+    @pytest.mark.asyncio
+    async def test_deleted_rows_are_compacted(
+        self, db_service, database_config, documents, monkeypatch
+    ):
+        """Test that the files are rewritten once deleted rows outnumber live rows"""
+        monkeypatch.setattr(numpy_database, "COMPACT_MIN_DELETED", 2)
+        await db_service.add_documents(documents)
+
+        await db_service.delete_documents(["x", "y"])
+
+        directory = db_service.path / "default"
+        assert (directory / "vectors-1.f32").stat().st_size == 3 * 4
+        assert not (directory / "vectors-0.f32").exists()
+        reopened = NumpyDatabaseService(config=database_config)
+        results = await reopened.query([0.0, 0.0, 1.0])
+        assert [doc.id for doc in results] == ["z"]
+
+    @pytest.mark.asyncio
+    async def test_ivf_index_is_extended_with_new_rows(self, db_service, documents):
+        """Test that added rows are assigned to the lists of the IVF index"""
+        db_service.config.index = "ivf"
+        db_service.config.ivf_min_size = 2
+        db_service.config.ivf_num_lists = 2
+        db_service.config.ivf_num_probes = 2
+        await db_service.add_documents(documents[:2])
+        await db_service.query([1.0, 0.0, 0.0])
+        ivf = db_service._collections["default"].index.ivf
+
+        await db_service.add_documents(documents[2:])
+
+        index = db_service._collections["default"].index
+        assert index.ivf is not ivf
+        assert index.ivf.centroids is ivf.centroids
+        assert sorted(np.concatenate(index.ivf.lists).tolist()) == [0, 1, 2]
+        results = await db_service.query([0.0, 0.0, 1.0])
+        assert [doc.id for doc in results] == ["z"]
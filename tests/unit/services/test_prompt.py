@@ -30,6 +30,28 @@ class TestPromptService:
         assert "Question:" in prompt
         assert "Context:" in prompt
 
+    def test_rag_prompt_ends_with_question(self, prompt_service):
+        """Test that the question follows the context, and the instructions are
+        a separate system prompt"""
+        prompt = prompt_service.get_prompt(
+            "rag_context", {"question": "What is Python?", "context": "Python."}
+        )
+
+        assert prompt.index("Python.") < prompt.index("What is Python?")
+        assert prompt.endswith("What is Python?")
+        assert "answer the question" in prompt_service.get_system_prompt("rag_context")
+
+    def test_system_prompt_missing(self, prompt_service):
+        assert prompt_service.get_system_prompt("summarize_text") is None
+
+    def test_get_prompt_merge_summaries(self, prompt_service):
+        """Test getting merge summaries prompt with context"""
+        context = {"summaries": "First part.\n\nSecond part."}
+        prompt = prompt_service.get_prompt("merge_summaries", context)
+
+        assert "First part.\n\nSecond part." in prompt
+        assert "Summaries to combine:" in prompt
+
     def test_get_prompt_without_context(self, prompt_service):
         """Test getting prompt without context"""
         prompt = prompt_service.get_prompt("summarize_text")
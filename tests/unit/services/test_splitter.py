@@ -4,6 +4,7 @@ import pytest
 
 from insightvault.models.document import Document
 from insightvault.services.splitter import SplitterService
+from insightvault.utils.hashing import content_hash
 from tests.unit import BaseTest
 
 
@@ -36,11 +37,13 @@ class TestSplitterService(BaseTest):
         assert all(isinstance(chunk, Document) for chunk in chunks)
 
     def test_splitter_initialization(self, mock_splitter, mock_splitter_config):
-        """Test splitter initialization with custom parameters"""
+        """Test that the sentence splitter is created on first use"""
         mock_splitter_config.chunk_size = 100
         mock_splitter_config.chunk_overlap = 20
-        _ = SplitterService(config=mock_splitter_config)
+        service = SplitterService(config=mock_splitter_config)
 
+        mock_splitter.assert_not_called()
+        assert service.text_splitter is service.text_splitter
         mock_splitter.assert_called_once_with(chunk_size=100, chunk_overlap=20)
 
     def test_split_document_preserves_metadata(
@@ -100,3 +103,32 @@ class TestSplitterService(BaseTest):
         mock_splitter_service.text_splitter.split_text.assert_called_once_with(
             sample_document.content
         )
+
+    def test_split_document_uses_content_addressed_ids(
+        self, mock_splitter_service, sample_document
+    ):
+        """Test that chunk ids only depend on the source and the chunk text"""
+        first = mock_splitter_service.split(sample_document)
+        second = mock_splitter_service.split(sample_document.model_copy())
+
+        assert [chunk.id for chunk in first] == [chunk.id for chunk in second]
+        assert first[0].id == content_hash("test", "First chunk of text.")
+
+    def test_split_document_keeps_repeated_chunks(self, mock_splitter_service):
+        """Test that repeated passages are kept with distinct ids"""
+        document = Document(title="Doc", content="Repeated", metadata={})
+
+        with patch.object(
+            mock_splitter_service.text_splitter,
+            "split_text",
+            return_value=["Same text.", "Same text.", "Other text."],
+        ):
+            chunks = mock_splitter_service.split(document)
+
+        assert [chunk.content for chunk in chunks] == [
+            "Same text.",
+            "Same text.",
+            "Other text.",
+        ]
+        assert len({chunk.id for chunk in chunks}) == len(chunks)
+        assert chunks[0].id == content_hash("Doc", "Same text.")
@@ -0,0 +1,174 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from insightvault.services.vector_index import (
+    POPCOUNT,
+    IVFIndex,
+    QuantizedVectors,
+    VectorIndex,
+    kmeans,
+    normalize,
+    popcount,
+    top_k,
+)
+
+
+class TestVectorIndex:
+    @pytest.fixture
+    def clustered_vectors(self):
+        """Create unit vectors grouped around a few random directions"""
+        rng = np.random.default_rng(42)
+        centers = rng.normal(size=(8, 16))
+        labels = rng.integers(0, len(centers), size=2000)
+        vectors = centers[labels] + 0.1 * rng.normal(size=(len(labels), 16))
+        return normalize(vectors)
+
+    def test_normalize_keeps_zero_vectors(self):
+        """Test that rows are scaled to unit length and zero rows stay zero"""
+        vectors = normalize([[3.0, 4.0], [0.0, 0.0]])
+
+        assert vectors.dtype == np.float32
+        np.testing.assert_allclose(vectors, [[0.6, 0.8], [0.0, 0.0]])
+
+    def test_top_k_returns_highest_scores_first(self):
+        """Test that top_k returns the indices of the highest scores in order"""
+        scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+
+        assert top_k(scores, 3).tolist() == [1, 3, 2]
+        assert top_k(scores, 10).tolist() == [1, 3, 2, 0]
+        assert top_k(scores, 0).tolist() == []
+
+    def test_kmeans_returns_unit_centroids(self, clustered_vectors):
+        """Test that k-means returns one unit length centroid per cluster"""
+        num_clusters = 8
+        centroids = kmeans(clustered_vectors, num_clusters)
+
+        assert centroids.shape == (num_clusters, clustered_vectors.shape[1])
+        np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, rtol=1e-5)
+
+    def test_ivf_lists_partition_all_rows(self, clustered_vectors):
+        """Test that every row belongs to exactly one list"""
+        ivf = IVFIndex(clustered_vectors, num_lists=8)
+
+        rows = np.concatenate(ivf.lists)
+        assert sorted(rows.tolist()) == list(range(len(clustered_vectors)))
+
+    def test_extended_ivf_assigns_new_rows(self, clustered_vectors):
+        """Test that new rows are added to the lists without changing the index"""
+        half = len(clustered_vectors) // 2
+        ivf = IVFIndex(clustered_vectors[:half], num_lists=8)
+
+        extended = ivf.extended(clustered_vectors[half:], first_row=half)
+
+        rows = np.concatenate(extended.lists)
+        assert sorted(rows.tolist()) == list(range(len(clustered_vectors)))
+        assert sum(len(rows) for rows in ivf.lists) == half
+        np.testing.assert_array_equal(extended.centroids, ivf.centroids)
+
+    def test_exact_search_returns_nearest_rows(self):
+        """Test that exact search returns rows sorted by cosine distance"""
+        index = VectorIndex(normalize([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]]))
+
+        rows, distances = index.search([1.0, 0.1], k=2)
+
+        assert rows.tolist() == [0, 2]
+        assert distances[0] < distances[1]
+
+    def test_ivf_search_matches_exact_search(self, clustered_vectors):
+        """Test that IVF search finds the exact neighbours of most queries"""
+        rng = np.random.default_rng(0)
+        queries = clustered_vectors[rng.choice(len(clustered_vectors), 50)]
+        exact = VectorIndex(clustered_vectors)
+        approximate = VectorIndex(clustered_vectors)
+        approximate.build_ivf(num_lists=16)
+        k = 10
+
+        recalls = []
+        for query in queries:
+            exact_rows, _ = exact.search(query, k=k)
+            rows, distances = approximate.search(query, k=k, num_probes=4)
+            recalls.append(len(set(rows.tolist()) & set(exact_rows.tolist())) / k)
+            assert np.all(np.diff(distances) >= 0)
+
+        expected_min_recall = 0.9
+        assert np.mean(recalls) >= expected_min_recall
+
+    def test_ivf_search_with_all_probes_is_exact(self, clustered_vectors):
+        """Test that probing every list gives the exact result"""
+        index = VectorIndex(clustered_vectors)
+        exact_rows, _ = index.search(clustered_vectors[0], k=5)
+        num_lists = 16
+        index.build_ivf(num_lists=num_lists)
+
+        rows, _ = index.search(clustered_vectors[0], k=5, num_probes=num_lists)
+
+        assert rows.tolist() == exact_rows.tolist()
+
+    def test_search_many_matches_single_searches(self, clustered_vectors):
+        """Test that batched search gives the same results as one search per query"""
+        index = VectorIndex(clustered_vectors)
+        queries = clustered_vectors[:20]
+        allowed = np.arange(len(clustered_vectors)) % 2 == 0
+
+        with patch("insightvault.services.vector_index.SCORE_BLOCK_SIZE", 10_000):
+            results = index.search_many(queries, k=5, allowed=allowed)
+
+        assert len(results) == len(queries)
+        for query, (rows, distances) in zip(queries, results, strict=True):
+            expected_rows, expected_distances = index.search(
+                query, k=5, allowed=allowed
+            )
+            assert rows.tolist() == expected_rows.tolist()
+            np.testing.assert_allclose(distances, expected_distances, atol=1e-6)
+
+    def test_popcount_counts_set_bits_per_row(self):
+        """Test that popcount matches the lookup table for any row width"""
+        rng = np.random.default_rng(0)
+        for width in (3, 16):
+            bits = rng.integers(0, 256, size=(10, width), dtype=np.uint8)
+
+            assert popcount(bits).tolist() == POPCOUNT[bits].sum(axis=1).tolist()
+
+    @pytest.mark.parametrize(
+        ("kind", "expected_bytes_per_row"), [("int8", 16), ("binary", 2)]
+    )
+    def test_quantized_codes_are_compact(
+        self, clustered_vectors, kind, expected_bytes_per_row
+    ):
+        """Test that codes take 1/4 (int8) or 1/32 (binary) of the float32 size"""
+        codes = QuantizedVectors.encode(clustered_vectors, kind)
+
+        assert codes.codes.shape == (len(clustered_vectors), expected_bytes_per_row)
+        scores = codes.scores(clustered_vectors[0])
+        exact = clustered_vectors @ clustered_vectors[0]
+        expected_min_correlation = 0.8
+        assert np.corrcoef(scores, exact)[0, 1] > expected_min_correlation
+
+    @pytest.mark.parametrize("kind", ["int8", "binary"])
+    def test_quantized_search_reranks_with_full_precision(
+        self, clustered_vectors, kind
+    ):
+        """Test that quantized search returns exact distances of allowed rows and
+        is exact when every candidate is re-scored
+        """
+        codes = QuantizedVectors.encode(clustered_vectors, kind)
+        exact = VectorIndex(clustered_vectors)
+        index = VectorIndex(clustered_vectors, codes=codes)
+        full_rerank = VectorIndex(
+            clustered_vectors, codes=codes, rerank_factor=len(clustered_vectors)
+        )
+        allowed = np.arange(len(clustered_vectors)) % 2 == 0
+        k = 5
+
+        for query in clustered_vectors[:10]:
+            rows, distances = index.search(query, k=k, allowed=allowed)
+            exact_rows, _ = exact.search(query, k=k, allowed=allowed)
+            full_rows, _ = full_rerank.search(query, k=k, allowed=allowed)
+
+            assert np.all(allowed[rows])
+            np.testing.assert_allclose(
+                distances, 1 - clustered_vectors[rows] @ query, atol=1e-6
+            )
+            assert full_rows.tolist() == exact_rows.tolist()
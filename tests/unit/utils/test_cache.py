@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+from insightvault.utils.cache import TTLCache
+
+
+class TestTTLCache:
+    def test_get_missing_key(self):
+        """Test that missing keys are counted as misses"""
+        cache: TTLCache[str, int] = TTLCache(max_size=2)
+
+        assert cache.get("a") is None
+        assert cache.misses == 1
+
+    def test_set_and_get(self):
+        """Test that stored values are returned and counted as hits"""
+        cache: TTLCache[str, int] = TTLCache(max_size=2)
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.hits == 1
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the oldest entry is evicted when the cache is full"""
+        cache: TTLCache[str, int] = TTLCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+
+        cache.set("c", 3)
+
+        expected_value = 3
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == expected_value
+
+    def test_entries_expire(self):
+        """Test that entries are dropped after the time-to-live"""
+        cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=10.0)
+        with patch("insightvault.utils.cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("insightvault.utils.cache.time.monotonic", return_value=111.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_zero_size_disables_cache(self):
+        """Test that a cache of size zero stores nothing"""
+        cache: TTLCache[str, int] = TTLCache(max_size=0)
+        cache.set("a", 1)
+
+        assert cache.get("a") is None
+
+    def test_clear(self):
+        """Test that clear removes all entries"""
+        cache: TTLCache[str, int] = TTLCache(max_size=2)
+        cache.set("a", 1)
+
+        cache.clear()
+
+        assert len(cache) == 0
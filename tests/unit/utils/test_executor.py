@@ -0,0 +1,51 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from insightvault.utils.executor import BlockingExecutor
+
+
+class TestBlockingExecutor:
+    @pytest.mark.asyncio
+    async def test_run_returns_result_from_pool_thread(self):
+        """Test that the call runs on a thread of the pool"""
+        executor = BlockingExecutor(max_workers=1, name="test-pool")
+
+        result = await executor.run(lambda x: (x, threading.current_thread().name), 1)
+
+        assert result[0] == 1
+        assert result[1].startswith("test-pool")
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_run_passes_keyword_arguments(self):
+        """Test that keyword arguments are forwarded to the call"""
+        executor = BlockingExecutor(max_workers=1)
+
+        result = await executor.run(sorted, [3, 1, 2], reverse=True)
+
+        assert result == [3, 2, 1]
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_run_raises_on_timeout(self):
+        """Test that a call exceeding the timeout raises TimeoutError"""
+        executor = BlockingExecutor(max_workers=1, timeout=0.01)
+
+        with pytest.raises(TimeoutError):
+            await executor.run(time.sleep, 0.2)
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_calls_do_not_block_event_loop(self):
+        """Test that concurrent calls overlap instead of running in sequence"""
+        executor = BlockingExecutor(max_workers=4)
+        start = time.perf_counter()
+
+        await asyncio.gather(*(executor.run(time.sleep, 0.1) for _ in range(4)))
+
+        max_duration = 0.3
+        assert time.perf_counter() - start < max_duration
+        executor.shutdown()
@@ -0,0 +1,45 @@
+import sys
+import types
+
+import pytest
+
+from insightvault.utils.lazy import LazyImport, lazy_attributes
+
+
+class TestLazyImport:
+    def test_module_is_imported_on_first_attribute_access(self):
+        """Test that the module is only imported when it is used"""
+        lazy_json = LazyImport("json")
+
+        assert lazy_json._target is None
+        assert lazy_json.dumps([1]) == "[1]"
+        assert lazy_json.load() is sys.modules["json"]
+
+    def test_attribute_is_imported_on_call(self):
+        """Test that calling the stand-in calls the imported attribute"""
+        ordered_dict = LazyImport("collections", "OrderedDict")
+
+        assert ordered_dict(a=1) == {"a": 1}
+        assert ordered_dict.load().__name__ == "OrderedDict"
+
+    def test_missing_module_raises_on_use(self):
+        """Test that a missing module fails when it is used, not when it is named"""
+        missing = LazyImport("insightvault_missing_module")
+
+        with pytest.raises(ModuleNotFoundError):
+            missing()
+
+
+class TestLazyAttributes:
+    def test_attribute_is_imported_and_stored(self, monkeypatch):
+        """Test that the imported attribute is stored in the module"""
+        module = types.ModuleType("lazy_test_module")
+        module.__getattr__ = lazy_attributes(
+            module.__name__, {"OrderedDict": "collections"}
+        )
+        monkeypatch.setitem(sys.modules, module.__name__, module)
+
+        assert module.OrderedDict.__name__ == "OrderedDict"
+        assert "OrderedDict" in vars(module)
+        with pytest.raises(AttributeError):
+            _ = module.Missing
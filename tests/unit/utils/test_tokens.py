@@ -0,0 +1,12 @@
+from insightvault.utils.tokens import estimate_tokens
+
+
+class TestEstimateTokens:
+    def test_empty_text(self):
+        assert estimate_tokens("") == 0
+
+    def test_estimate_rounds_up(self):
+        """Test that partial tokens are counted as whole tokens"""
+        expected_tokens = 3
+
+        assert estimate_tokens("Hello world") == expected_tokens